@@ -17,17 +17,21 @@ import re
 import time
 import uuid
 import json
+import bisect
 import subprocess
 import shutil
 import smtplib
 import secrets
+import socket
 import threading
+import atexit
 import urllib.parse
 import urllib.request
+import urllib.error
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_from_directory, g
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, send_from_directory, send_file, g
 from werkzeug.utils import secure_filename
 from functools import wraps
 import logging
@@ -35,11 +39,27 @@ from logging.handlers import RotatingFileHandler
 from io import BytesIO
 from flask import Response, stream_with_context
 
+# Streaming multipart transfers to S3/B2 and parallel ranged downloads
+from s3_transfer import multipart_upload_fileobj, multipart_upload_file, download_to_file, USER_AGENT
+
+# Venue edge cache (optional read-through cache for B2/CDN videos)
+from edge_cache import (EDGE_CACHE_ENABLED, get_cached_path, fetch_to_cache, start_fetch, partial_size, read_partial,
+                        invalidate_cache, get_cache_stats)
+from backfill import new_backfill_status, run_backfill, url_host
+
+# Resized WebP/JPEG variants of thumbnails, team photos and formation drawings
+from image_variants import build_image_variants, image_content_type, parse_variants, variants_srcset
+
+# Disk cache of frames captured for OCR
+from frame_cache import (
+    FRAME_CACHE_DIR, frame_cache_key, get_cached_frame, store_frame, invalidate_frames, evict_frame_cache
+)
+
 # pCloud Storage Integration
 from pcloud_storage import (
     USE_PCLOUD, upload_to_pcloud, upload_to_pcloud_from_data,
     delete_from_pcloud, get_pcloud_file_stream, get_pcloud_file_size,
-    PCLOUD_BASE_FOLDER
+    get_pcloud_range_stream, PCLOUD_BASE_FOLDER
 )
 
 # Setup upload failure logging
@@ -76,6 +96,8 @@ def log_upload_failure(reason, filename=None, user=None, file_size=None, content
 conversion_jobs = {}  # In-memory cache for quick access
 conversion_lock = threading.Lock()
 MAX_CONCURRENT_CONVERSIONS = 1  # Limit to prevent server overload
+CONVERSION_SAVE_INTERVAL = float(os.environ.get('CONVERSION_SAVE_INTERVAL', '1'))  # Seconds between progress saves
+conversion_saved_at = {}  # job_id -> time of the last save, for throttling progress pushes
 
 def save_conversion_job(job):
     """Save conversion job to database for persistence."""
@@ -103,19 +125,53 @@ def save_conversion_job(job):
             supabase.table('conversion_jobs').insert(data).execute()
     except Exception as e:
         print(f"Error saving conversion job: {e}")
+    publish_conversion_job(job)
+
+# Fields pushed to clients on every conversion progress/state change
+CONVERSION_PUSH_FIELDS = ('job_id', 'video_id', 'filename', 'title', 'status', 'progress',
+                          'error', 'created_at', 'completed_at')
+
+def conversion_room(session_id):
+    """Socket.IO room that receives conversion updates for one upload session."""
+    return f'conversions:{session_id}'
+
+def publish_conversion_job(job):
+    """Push a job's progress to its session's Socket.IO room (via the Redis queue)."""
+    if not SOCKETIO_ENABLED or not job.get('session_id'):
+        return
+    try:
+        socketio.emit('conversion_update', {k: job.get(k) for k in CONVERSION_PUSH_FIELDS},
+                      room=conversion_room(job['session_id']))
+    except Exception as e:
+        print(f"[CONVERSION] Error publishing job {job.get('job_id')}: {e}")
 
 def update_conversion_job(job_id, **updates):
-    """Update conversion job in both memory and database."""
+    """Update conversion job in both memory and database.
+
+    The job is saved (and pushed to clients) after conversion_lock is
+    released. Progress-only updates are throttled to one save per
+    CONVERSION_SAVE_INTERVAL seconds per job; any other change saves at once.
+    """
     with conversion_lock:
-        if job_id in conversion_jobs:
-            conversion_jobs[job_id].update(updates)
-            save_conversion_job(conversion_jobs[job_id])
-        else:
-            # Job not in memory, update database directly
-            try:
-                supabase.table('conversion_jobs').update(updates).eq('job_id', job_id).execute()
-            except Exception as e:
-                print(f"Error updating conversion job: {e}")
+        job = conversion_jobs.get(job_id)
+        if job is not None:
+            job.update(updates)
+            now = time.time()
+            if set(updates) <= {'progress'} and now - conversion_saved_at.get(job_id, 0) < CONVERSION_SAVE_INTERVAL:
+                return
+            if job.get('status') in ('completed', 'failed'):
+                conversion_saved_at.pop(job_id, None)
+            else:
+                conversion_saved_at[job_id] = now
+            job = dict(job)
+    if job is None:
+        # Job not in memory, update database directly
+        try:
+            supabase.table('conversion_jobs').update(updates).eq('job_id', job_id).execute()
+        except Exception as e:
+            print(f"Error updating conversion job: {e}")
+        return
+    save_conversion_job(job)
 
 def get_conversion_job(job_id):
     """Get conversion job from memory or database."""
@@ -245,6 +301,10 @@ except ImportError:
 # Cloudflare CDN cache purge config
 CLOUDFLARE_ZONE_ID = os.environ.get('CLOUDFLARE_ZONE_ID')
 CLOUDFLARE_API_TOKEN = os.environ.get('CLOUDFLARE_API_TOKEN')
+CLOUDFLARE_PURGE_BATCH = 30  # Max files per Cloudflare purge_cache call
+CLOUDFLARE_PURGE_COALESCE = float(os.environ.get('CLOUDFLARE_PURGE_COALESCE', '5'))  # Seconds to gather URLs
+CLOUDFLARE_PURGE_RETRIES = int(os.environ.get('CLOUDFLARE_PURGE_RETRIES', '5'))
+CLOUDFLARE_PURGE_MIN_INTERVAL = float(os.environ.get('CLOUDFLARE_PURGE_MIN_INTERVAL', '1'))
 
 
 def normalize_b2_url(url):
@@ -280,41 +340,141 @@ def get_b2_key_from_url(url):
 
 
 def upload_to_s3_key(file_path, s3_key, content_type='video/mp4'):
-    """Upload file to a specific S3/B2 key (overwrite)."""
-    s3_client.upload_file(file_path, AWS_S3_BUCKET, s3_key, ExtraArgs={'ContentType': content_type})
+    """Upload file to a specific S3/B2 key (overwrite) with a streaming multipart upload."""
+    result = multipart_upload_file(s3_client, AWS_S3_BUCKET, s3_key, file_path, content_type)
+    print(f"[S3] Uploaded {s3_key} ({result['size']} bytes, {result['parts']} parts, sha256={result['sha256'][:12]})")
     return f"https://cdn.kd-evolution.com/file/{AWS_S3_BUCKET}/{s3_key}"
 
 
+# Background purge queue: handlers enqueue URLs and return; a single worker
+# thread coalesces them into batches of up to 30 and backs off on 429s.
+purge_queue = {}  # Pending URLs in insertion order {url: attempts}
+purge_cond = threading.Condition()
+purge_stats = {
+    'sent_batches': 0, 'sent_urls': 0, 'failed_urls': 0, 'skipped_urls': 0,
+    'in_flight': 0, 'last_error': None, 'last_success_at': None, 'backoff_until': None
+}
+_purge_worker = None
+
+
 def purge_cloudflare_cache(urls):
-    """Purge specific URLs from Cloudflare CDN cache."""
+    """Queue URLs for purging from the Cloudflare CDN cache. Returns immediately."""
+    global _purge_worker
+    urls = [u for u in (urls if isinstance(urls, list) else [urls]) if u]
+    if not urls:
+        return True
     if not CLOUDFLARE_ZONE_ID or not CLOUDFLARE_API_TOKEN:
-        print("[CLOUDFLARE] Cache purge skipped - not configured")
+        with purge_cond:
+            if not purge_stats['skipped_urls']:
+                print("[CLOUDFLARE] Cache purge skipped - not configured (CLOUDFLARE_ZONE_ID/CLOUDFLARE_API_TOKEN)")
+            purge_stats['skipped_urls'] += len(urls)
         return False
+
+    with purge_cond:
+        for url in urls:
+            purge_queue.setdefault(url, 0)
+        if _purge_worker is None or not _purge_worker.is_alive():
+            _purge_worker = threading.Thread(target=cloudflare_purge_worker, daemon=True)
+            _purge_worker.start()
+        purge_cond.notify()
+    return True
+
+
+def send_cloudflare_purge(urls):
+    """POST one purge_cache call. Returns (ok, retry_after_seconds or None, error)."""
+    req = urllib.request.Request(
+        f"https://api.cloudflare.com/client/v4/zones/{CLOUDFLARE_ZONE_ID}/purge_cache",
+        data=json.dumps({'files': urls}).encode(),
+        headers={
+            'Authorization': f'Bearer {CLOUDFLARE_API_TOKEN}',
+            'Content-Type': 'application/json'
+        },
+        method='POST'
+    )
     try:
-        import requests
-        resp = requests.post(
-            f"https://api.cloudflare.com/client/v4/zones/{CLOUDFLARE_ZONE_ID}/purge_cache",
-            headers={
-                'Authorization': f'Bearer {CLOUDFLARE_API_TOKEN}',
-                'Content-Type': 'application/json'
-            },
-            json={'files': urls if isinstance(urls, list) else [urls]},
-            timeout=15
-        )
-        result = resp.json()
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            result = json.loads(resp.read() or b'{}')
         if result.get('success'):
-            print(f"[CLOUDFLARE] Cache purged for {len(urls) if isinstance(urls, list) else 1} URL(s)")
-            return True
-        else:
-            print(f"[CLOUDFLARE] Cache purge failed: {result.get('errors')}")
-            return False
+            return True, None, None
+        return False, None, str(result.get('errors'))
+    except urllib.error.HTTPError as e:
+        retry_after = None
+        if e.code == 429:
+            try:
+                retry_after = float(e.headers.get('Retry-After', ''))
+            except ValueError:
+                retry_after = None
+        return False, retry_after, f"HTTP {e.code}"
     except Exception as e:
-        print(f"[CLOUDFLARE] Cache purge error: {e}")
-        return False
+        return False, None, str(e)
+
+
+def cloudflare_purge_worker():
+    """Drain purge_queue: wait up to CLOUDFLARE_PURGE_COALESCE seconds or 30 URLs, then send."""
+    backoff = 0
+    while True:
+        with purge_cond:
+            while not purge_queue:
+                purge_cond.wait()
+            # Coalesce: give other requests a chance to add URLs to this batch
+            deadline = time.time() + CLOUDFLARE_PURGE_COALESCE
+            while len(purge_queue) < CLOUDFLARE_PURGE_BATCH and time.time() < deadline:
+                purge_cond.wait(deadline - time.time())
+            batch = list(purge_queue)[:CLOUDFLARE_PURGE_BATCH]
+            attempts = {u: purge_queue.pop(u) for u in batch}
+            purge_stats['in_flight'] = len(batch)
+
+        ok, retry_after, error = send_cloudflare_purge(batch)
+
+        with purge_cond:
+            purge_stats['in_flight'] = 0
+            if ok:
+                backoff = 0
+                purge_stats['sent_batches'] += 1
+                purge_stats['sent_urls'] += len(batch)
+                purge_stats['last_success_at'] = datetime.now().isoformat()
+                purge_stats['backoff_until'] = None
+                print(f"[CLOUDFLARE] Cache purged for {len(batch)} URL(s), {len(purge_queue)} queued")
+            else:
+                purge_stats['last_error'] = error
+                retry = {u: n + 1 for u, n in attempts.items() if n + 1 < CLOUDFLARE_PURGE_RETRIES}
+                purge_stats['failed_urls'] += len(batch) - len(retry)
+                # Retried URLs go back to the front, ahead of anything queued since
+                pending = dict(purge_queue)
+                purge_queue.clear()
+                purge_queue.update(retry)
+                for url, n in pending.items():
+                    purge_queue.setdefault(url, n)
+                requeued = len(retry)
+                backoff = retry_after or min(max(backoff * 2, 2), 300)
+                purge_stats['backoff_until'] = (datetime.now() + timedelta(seconds=backoff)).isoformat()
+                print(f"[CLOUDFLARE] Cache purge failed ({error}), retrying {requeued} URL(s) in {backoff:.1f}s")
+
+        time.sleep(backoff if not ok else CLOUDFLARE_PURGE_MIN_INTERVAL)
+
+
+def get_purge_queue_status():
+    with purge_cond:
+        return dict(purge_stats, queued=len(purge_queue),
+                    configured=bool(CLOUDFLARE_ZONE_ID and CLOUDFLARE_API_TOKEN))
+
+
+def get_s3_public_url(s3_key):
+    """Public URL for an object key (CloudFront if configured, otherwise direct storage URL)."""
+    if AWS_CLOUDFRONT_DOMAIN:
+        return f"https://{AWS_CLOUDFRONT_DOMAIN}/{s3_key}"
+    elif STORAGE_PROVIDER == 'b2':
+        # Backblaze B2 friendly URL format
+        return f"https://cdn.kd-evolution.com/file/{AWS_S3_BUCKET}/{s3_key}"
+    return f"https://{AWS_S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
 
 
 def upload_to_s3(file_data, filename, content_type='video/mp4', folder='videos'):
-    """Upload a file to AWS S3 and return the public URL."""
+    """Upload bytes or a readable file object to S3/B2 and return the public URL.
+
+    Uses a streaming multipart upload, so passing an open file keeps memory
+    bounded at a few parts no matter how large the file is.
+    """
     if not USE_S3 or not s3_client:
         return None
 
@@ -322,27 +482,15 @@ def upload_to_s3(file_data, filename, content_type='video/mp4', folder='videos')
         # Create S3 key (path)
         s3_key = f"{folder}/{filename}" if folder else filename
 
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=AWS_S3_BUCKET,
-            Key=s3_key,
-            Body=file_data,
-            ContentType=content_type
-        )
-
-        # Return URL (CloudFront if configured, otherwise direct storage URL)
-        if AWS_CLOUDFRONT_DOMAIN:
-            url = f"https://{AWS_CLOUDFRONT_DOMAIN}/{s3_key}"
-        elif STORAGE_PROVIDER == 'b2':
-            # Backblaze B2 friendly URL format
-            url = f"https://cdn.kd-evolution.com/file/{AWS_S3_BUCKET}/{s3_key}"
-        else:
-            url = f"https://{AWS_S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+        fileobj = BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data
+        result = multipart_upload_fileobj(s3_client, AWS_S3_BUCKET, s3_key, fileobj, content_type)
+        if result['parts'] > 1:
+            print(f"[S3] Uploaded {s3_key} ({result['size']} bytes, {result['parts']} parts, sha256={result['sha256'][:12]})")
 
-        return url
+        return get_s3_public_url(s3_key)
     except Exception as e:
-        log_upload_failure('s3_upload_failed', filename=filename,
-                          file_size=len(file_data) if file_data else None,
+        file_size = len(file_data) if isinstance(file_data, (bytes, bytearray)) else None
+        log_upload_failure('s3_upload_failed', filename=filename, file_size=file_size,
                           extra={'folder': folder, 'error': str(e)})
         print(f"S3 upload error: {e}")
         return None
@@ -365,14 +513,13 @@ def upload_to_s3_from_path(file_path, folder='videos'):
             '.jpg': 'image/jpeg',
             '.jpeg': 'image/jpeg',
             '.png': 'image/png',
-            '.csv': 'text/csv'
+            '.csv': 'text/csv',
+            '.json': 'application/json'
         }
         content_type = content_types.get(ext, 'application/octet-stream')
 
         with open(file_path, 'rb') as f:
-            file_data = f.read()
-
-        return upload_to_s3(file_data, filename, content_type, folder)
+            return upload_to_s3(f, filename, content_type, folder)
     except Exception as e:
         log_upload_failure('s3_upload_from_path_failed', filename=os.path.basename(file_path),
                           file_size=os.path.getsize(file_path) if os.path.exists(file_path) else None,
@@ -394,42 +541,145 @@ def delete_from_s3(s3_key):
         return False
 
 
-def get_s3_presigned_url(s3_key, expires_in=3600):
-    """Generate a presigned URL for private S3 objects."""
+# Presigned URL cache. A signed URL is reused until it is within
+# PRESIGN_REFRESH_MARGIN seconds of expiry, so repeat views get the same URL
+# (and browser/CDN cache hits). Entries are shared across workers via Redis.
+S3_PRIVATE_BUCKET = os.environ.get('S3_PRIVATE_BUCKET', 'false').lower() == 'true'
+PRESIGN_EXPIRES = int(os.environ.get('PRESIGN_EXPIRES', '21600'))
+PRESIGN_REFRESH_MARGIN = int(os.environ.get('PRESIGN_REFRESH_MARGIN', '600'))
+PRESIGN_CACHE_MAX = 20000
+presigned_url_cache = {}  # {(s3_key, operation, content_type, expires_in): (url, expires_at)}
+presigned_url_lock = threading.Lock()
+
+
+def _presign(s3_key, operation, expires_in):
+    # Don't include ContentType in upload signatures - makes them more flexible
+    return s3_client.generate_presigned_url(
+        operation,
+        Params={'Bucket': AWS_S3_BUCKET, 'Key': s3_key},
+        ExpiresIn=expires_in
+    )
+
+
+def get_cached_presigned_urls(s3_keys, operation='get_object', content_type='', expires_in=None):
+    """Sign many keys at once, reusing cached URLs. Returns {s3_key: url}.
+
+    Upload URLs are never cached: each upload gets a fresh signature.
+    """
     if not USE_S3 or not s3_client:
-        return None
+        return {}
+    expires_in = expires_in or PRESIGN_EXPIRES
+    if operation == 'put_object':
+        urls = {}
+        for key in dict.fromkeys(s3_keys):
+            try:
+                urls[key] = _presign(key, operation, expires_in)
+            except Exception as e:
+                print(f"S3 presigned URL error: {e}")
+        return urls
+    now = time.time()
+    urls = {}
+    misses = []
+
+    with presigned_url_lock:
+        for key in dict.fromkeys(s3_keys):
+            hit = presigned_url_cache.get((key, operation, content_type, expires_in))
+            if hit and hit[1] - PRESIGN_REFRESH_MARGIN > now:
+                urls[key] = hit[0]
+            else:
+                misses.append(key)
 
-    try:
-        url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': AWS_S3_BUCKET, 'Key': s3_key},
-            ExpiresIn=expires_in
-        )
-        return url
-    except Exception as e:
-        print(f"S3 presigned URL error: {e}")
-        return None
+    # Another worker may already have signed it
+    if misses and REDIS_AVAILABLE and redis_client:
+        try:
+            values = redis_client.mget([f'presign:{operation}:{content_type}:{expires_in}:{k}' for k in misses])
+            still_missing = []
+            for key, value in zip(misses, values):
+                entry = json.loads(value) if value else None
+                if entry and entry['expires_at'] - PRESIGN_REFRESH_MARGIN > now:
+                    urls[key] = entry['url']
+                    with presigned_url_lock:
+                        presigned_url_cache[(key, operation, content_type, expires_in)] = (entry['url'], entry['expires_at'])
+                else:
+                    still_missing.append(key)
+            misses = still_missing
+        except Exception as e:
+            print(f"[PRESIGN] Redis read error: {e}")
+
+    signed = {}
+    for key in misses:
+        try:
+            signed[key] = _presign(key, operation, expires_in)
+        except Exception as e:
+            print(f"S3 presigned URL error: {e}")
+    if not signed:
+        return urls
+
+    expires_at = now + expires_in
+    with presigned_url_lock:
+        if len(presigned_url_cache) > PRESIGN_CACHE_MAX:
+            for k in [k for k, v in presigned_url_cache.items() if v[1] - PRESIGN_REFRESH_MARGIN <= now]:
+                del presigned_url_cache[k]
+        for key, url in signed.items():
+            presigned_url_cache[(key, operation, content_type, expires_in)] = (url, expires_at)
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            ttl = max(expires_in - PRESIGN_REFRESH_MARGIN, 1)
+            for key, url in signed.items():
+                pipe.set(f'presign:{operation}:{content_type}:{expires_in}:{key}',
+                         json.dumps({'url': url, 'expires_at': expires_at}), ex=ttl)
+            pipe.execute()
+        except Exception as e:
+            print(f"[PRESIGN] Redis write error: {e}")
+
+    urls.update(signed)
+    return urls
+
+
+def get_s3_presigned_url(s3_key, expires_in=None):
+    """Presigned URL for a private S3 object (cached until close to expiry)."""
+    return get_cached_presigned_urls([s3_key], 'get_object', expires_in=expires_in).get(s3_key)
 
 
 def get_s3_presigned_upload_url(s3_key, content_type='video/mp4', expires_in=3600):
-    """Generate a presigned URL for uploading directly to S3."""
-    if not USE_S3 or not s3_client:
-        return None
+    """Presigned URL for uploading directly to S3 (signed fresh on every call)."""
+    return get_cached_presigned_urls([s3_key], 'put_object', content_type, expires_in).get(s3_key)
 
-    try:
-        # Don't include ContentType in signature - makes it more flexible
-        url = s3_client.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': AWS_S3_BUCKET,
-                'Key': s3_key
-            },
-            ExpiresIn=expires_in
-        )
-        return url
-    except Exception as e:
-        print(f"S3 presigned upload URL error: {e}")
-        return None
+
+def sign_video_urls(videos):
+    """For private buckets, swap video, thumbnail and thumbnail variant URLs for presigned ones in one batch."""
+    if not S3_PRIVATE_BUCKET or not videos:
+        return videos
+    keys = {}
+    for video in videos:
+        for field in ('url', 'thumbnail'):
+            key = get_b2_key_from_url(video.get(field) or '')
+            if key:
+                keys[(video['id'], field)] = key
+        for fmt, entries in parse_variants(video.get('thumbnail_variants')).items():
+            for width, url in entries:
+                key = get_b2_key_from_url(url or '')
+                if key:
+                    keys[(video['id'], fmt, width)] = key
+    signed = get_cached_presigned_urls(list(keys.values()))
+    for video in videos:
+        for field in ('url', 'thumbnail'):
+            key = keys.get((video['id'], field))
+            if key and key in signed:
+                video[field] = signed[key]
+        variants = parse_variants(video.get('thumbnail_variants'))
+        if variants:
+            signed_variants = {}
+            for fmt, entries in variants.items():
+                signed_variants[fmt] = []
+                for width, url in entries:
+                    key = keys.get((video['id'], fmt, width))
+                    if key and key not in signed:
+                        continue  # An unsigned bucket URL would 403, so leave it out of the srcset
+                    signed_variants[fmt].append([width, signed[key] if key else url])
+            video['thumbnail_variants'] = signed_variants
+    return videos
 
 
 
@@ -575,6 +825,18 @@ if REDIS_URL:
         redis_client = None
         print(f"[REDIS] Connection failed ({e}), using in-memory fallback", flush=True)
 
+# Optional msgpack wire format for Socket.IO packets (smaller, faster to
+# parse than JSON for the high-frequency scoring/sync events). Applies to the
+# whole server, so templates switch to the socket.io.msgpack client bundle.
+# Opt-in extra: `pip install msgpack` and set SOCKETIO_MSGPACK=true.
+SOCKETIO_MSGPACK = os.environ.get('SOCKETIO_MSGPACK', 'false').lower() == 'true'
+if SOCKETIO_MSGPACK:
+    try:
+        import msgpack  # noqa: F401 - required by the msgpack serializer
+    except ImportError:
+        SOCKETIO_MSGPACK = False
+        print("[SOCKETIO] SOCKETIO_MSGPACK set but msgpack is not installed, using JSON", flush=True)
+
 # SocketIO for real-time sync viewing
 try:
     from flask_socketio import SocketIO, emit, join_room, leave_room
@@ -586,20 +848,119 @@ try:
         cors_allowed_origins="*",
         async_mode=_async_mode,
         message_queue=REDIS_URL if REDIS_AVAILABLE else None,
+        serializer='msgpack' if SOCKETIO_MSGPACK else 'default',
         ping_timeout=60,
         ping_interval=25,
         logger=False,
         engineio_logger=False
     )
     SOCKETIO_ENABLED = True
-    print(f"[SOCKETIO] Enabled (async_mode={_async_mode}, redis={'yes' if REDIS_AVAILABLE else 'no'})", flush=True)
+    print(f"[SOCKETIO] Enabled (async_mode={_async_mode}, redis={'yes' if REDIS_AVAILABLE else 'no'}, "
+          f"msgpack={'yes' if SOCKETIO_MSGPACK else 'no'})", flush=True)
 except ImportError:
     SOCKETIO_ENABLED = False
     socketio = None
 
-# Sync rooms for synchronized video viewing
-# Structure: {room_id: {'video_id': str, 'event_judge': str, 'judges': {username: {'ready': bool, 'start_time': float}}, 'state': 'waiting'|'playing'|'syncing'}}
-sync_rooms = {}
+
+@app.context_processor
+def inject_socketio_client():
+    """Templates load the Socket.IO client bundle that matches the server serializer."""
+    return {'socketio_bundle': 'socket.io.msgpack.min.js' if SOCKETIO_MSGPACK else 'socket.io.min.js'}
+
+# Shared state for sync rooms and panel sessions. Stored in Redis as JSON under
+# "<kind>:<key>" so every gunicorn worker sees the same room; updates run as
+# WATCH/MULTI transactions and each write refreshes a TTL so abandoned
+# sessions expire. Without Redis it falls back to a per-process dict.
+#
+# sync_room:     {'video_id', 'event_judge', 'judges': {username: {'ready', 'start_time'}},
+#                 'state': 'waiting'|'playing'|'syncing', 'play_time', ...}
+# panel_session: {'video_id', 'panel_size', 'event_judge', 'judges': {judge_num: {...}},
+#                 'x_presses': {judge_num: press_time}, 'scores': [...], 'state', ...}
+SHARED_STATE_TTL = int(os.environ.get('SHARED_STATE_TTL', '21600'))  # 6 hours
+_shared_state_memory = {}  # "<kind>:<key>" -> (expires_at, state)
+_shared_state_lock = threading.Lock()
+
+
+def _get_memory_state(rkey):
+    entry = _shared_state_memory.get(rkey)
+    if entry and entry[0] < time.time():
+        _shared_state_memory.pop(rkey, None)
+        return None
+    return entry[1] if entry else None
+
+
+def get_shared_state(kind, key):
+    """Return a sync room / panel session dict, or None if missing or expired."""
+    rkey = f'{kind}:{key}'
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            raw = redis_client.get(rkey)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            print(f"[REDIS] Error reading {rkey}: {e}")
+    with _shared_state_lock:
+        return _get_memory_state(rkey)
+
+
+def set_shared_state(kind, key, state):
+    rkey = f'{kind}:{key}'
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.set(rkey, json.dumps(state, default=str), ex=SHARED_STATE_TTL)
+            return
+        except Exception as e:
+            print(f"[REDIS] Error writing {rkey}: {e}")
+    with _shared_state_lock:
+        _shared_state_memory[rkey] = (time.time() + SHARED_STATE_TTL, state)
+
+
+def update_shared_state(kind, key, fn):
+    """Atomically apply fn(state) to a stored state and save it.
+
+    fn mutates the state in place and may return a value; it can run more
+    than once if another worker writes concurrently, so it must not have
+    side effects (emit after this returns). Returns (state, fn's result),
+    or (None, None) if the state does not exist.
+    """
+    rkey = f'{kind}:{key}'
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            out = [None, None]
+
+            def txn(pipe):
+                raw = pipe.get(rkey)
+                out[:] = [None, None]
+                if not raw:
+                    return
+                state = json.loads(raw)
+                result = fn(state)
+                pipe.multi()
+                pipe.set(rkey, json.dumps(state, default=str), ex=SHARED_STATE_TTL)
+                out[:] = [state, result]
+
+            redis_client.transaction(txn, rkey)
+            return out[0], out[1]
+        except Exception as e:
+            print(f"[REDIS] Error updating {rkey}: {e}")
+    with _shared_state_lock:
+        state = _get_memory_state(rkey)
+        if state is None:
+            return None, None
+        result = fn(state)
+        _shared_state_memory[rkey] = (time.time() + SHARED_STATE_TTL, state)
+        return state, result
+
+
+def delete_shared_state(kind, key):
+    rkey = f'{kind}:{key}'
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.delete(rkey)
+            return
+        except Exception as e:
+            print(f"[REDIS] Error deleting {rkey}: {e}")
+    with _shared_state_lock:
+        _shared_state_memory.pop(rkey, None)
 
 # Email configuration for password reset
 SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
@@ -1367,9 +1728,24 @@ def init_postgres_schema():
             start_time REAL DEFAULT 0,
             draw TEXT,
             trimmed BOOLEAN,
-            category_auto BOOLEAN
+            category_auto BOOLEAN,
+            keyframe_index TEXT,
+            title_pattern TEXT,
+            preview_vtt TEXT,
+            thumbnail_variants TEXT
         )
     ''')
+    # Columns added after the initial schema
+    cur.execute('ALTER TABLE videos ADD COLUMN IF NOT EXISTS keyframe_index TEXT')
+    cur.execute('ALTER TABLE videos ADD COLUMN IF NOT EXISTS title_pattern TEXT')
+    cur.execute('ALTER TABLE videos ADD COLUMN IF NOT EXISTS preview_vtt TEXT')
+    cur.execute('ALTER TABLE videos ADD COLUMN IF NOT EXISTS thumbnail_variants TEXT')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_videos_title_pattern ON videos (title_pattern, category)')
+    # Partial indexes so backfills can page through just the rows missing a value
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_videos_missing_thumbnail ON videos (id) WHERE thumbnail IS NULL OR thumbnail = ''")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_videos_missing_duration ON videos (id) WHERE duration IS NULL OR duration = ''")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_videos_missing_thumbnail_variants ON videos (id) "
+                "WHERE thumbnail_variants IS NULL AND thumbnail > ''")
     cur.execute('''
         CREATE TABLE IF NOT EXISTS users (
             username TEXT PRIMARY KEY,
@@ -1418,9 +1794,11 @@ def init_postgres_schema():
             event TEXT,
             photo TEXT,
             created_at TEXT NOT NULL,
-            display_order INTEGER DEFAULT 0
+            display_order INTEGER DEFAULT 0,
+            photo_variants TEXT
         )
     ''')
+    cur.execute('ALTER TABLE competition_teams ADD COLUMN IF NOT EXISTS photo_variants TEXT')
     cur.execute('''
         CREATE TABLE IF NOT EXISTS competition_scores (
             id TEXT PRIMARY KEY,
@@ -1615,14 +1993,28 @@ def save_video(video_data):
     # Filter to only include core Supabase columns (start_time/draw handled separately)
     known_columns = {'id', 'title', 'description', 'url', 'thumbnail', 'category',
                     'subcategory', 'tags', 'duration', 'created_at', 'views',
-                    'video_type', 'local_file', 'event', 'team', 'round_num', 'jump_num'}
+                    'video_type', 'local_file', 'event', 'team', 'round_num', 'jump_num',
+                    'keyframe_index', 'preview_vtt', 'thumbnail_variants'}
     filtered_data = {k: v for k, v in video_data.items() if k in known_columns}
-
-    existing = supabase.table('videos').select('id').eq('id', video_data['id']).execute()
+    # Keep the indexed similar-title key in step with the title
+    if 'title' in filtered_data:
+        filtered_data['title_pattern'] = extract_title_pattern(filtered_data['title'] or '')
+
+    existing = supabase.table('videos').select('id, thumbnail').eq('id', video_data['id']).execute()
+    # A new thumbnail invalidates its resized variants; rebuild them in the background
+    thumbnail = filtered_data.get('thumbnail')
+    thumbnail_changed = 'thumbnail' in filtered_data and 'thumbnail_variants' not in filtered_data and \
+        (not existing.data or existing.data[0].get('thumbnail') != thumbnail)
+    if thumbnail_changed:
+        filtered_data['thumbnail_variants'] = None
     if existing.data:
         supabase.table('videos').update(filtered_data).eq('id', video_data['id']).execute()
     else:
         supabase.table('videos').insert(filtered_data).execute()
+    if thumbnail_changed and thumbnail:
+        thread = threading.Thread(target=refresh_thumbnail_variants, args=(video_data['id'], thumbnail))
+        thread.daemon = True
+        thread.start()
 def delete_video_db(video_id):
     """Delete a video from database."""
     supabase.table('videos').delete().eq('id', video_id).execute()
@@ -2183,6 +2575,47 @@ def get_video_embed_url(url):
     return url
 
 
+def edge_cache_key(video):
+    """Cache file name for a video: <id><ext>, so all files for a video share the id prefix."""
+    ext = os.path.splitext(urllib.parse.urlparse(video.get('url', '')).path)[1].lower()
+    return f"{video['id']}{ext if ext in BROWSER_PLAYABLE_FORMATS else '.mp4'}"
+
+
+def resolve_video_src(video):
+    """Set video_src/embed_url and the is_local/is_direct_url flags for playback.
+
+    pCloud files go through the streaming proxy, direct video URLs are played
+    as-is (or through /cache/video/<id> when the venue edge cache is enabled),
+    local files are served from /static/videos and anything else is embedded.
+    """
+    if video.get('video_type') == 'pcloud' and video.get('local_file'):
+        video['video_src'] = f'/pcloud/stream/{video["local_file"]}'
+        video['is_local'] = False
+        video['is_direct_url'] = True
+    elif video.get('url') and is_direct_video_url(video.get('url', '')):
+        video['video_src'] = video['url']
+        if EDGE_CACHE_ENABLED and video['url'].startswith(('http://', 'https://')):
+            video['video_src'] = f'/cache/video/{video["id"]}'
+        elif S3_PRIVATE_BUCKET and get_b2_key_from_url(video['url']):
+            video['video_src'] = get_s3_presigned_url(get_b2_key_from_url(video['url'])) or video['url']
+        video['is_local'] = False
+        video['is_direct_url'] = True
+    elif video.get('video_type') == 'local' and video.get('local_file'):
+        video['video_src'] = f'/static/videos/{video["local_file"]}'
+        video['is_local'] = True
+        video['is_direct_url'] = True  # Playable by <video>, same as direct URLs for the scoring rooms
+    elif video.get('url'):
+        video['embed_url'] = get_video_embed_url(video.get('url', ''))
+        video['is_local'] = False
+        video['is_direct_url'] = False
+    else:
+        # No valid video source
+        video['video_src'] = ''
+        video['is_local'] = False
+        video['is_direct_url'] = False
+    return video
+
+
 def get_video_thumbnail(url):
     """Get thumbnail URL from video URL."""
     if not url:
@@ -2247,79 +2680,40 @@ def get_video_duration_from_url(url):
     return None
 
 
-# Duration scan status tracking
-duration_scan_status = {
-    'running': False,
-    'updated': 0,
-    'failed': 0,
-    'skipped': 0,
-    'total': 0,
-    'current': 0,
-    'current_video': ''
-}
-
-
-def scan_and_update_video_durations_background():
-    """Scan all videos and update their durations (runs in background)."""
-    global duration_scan_status
-
-    duration_scan_status['running'] = True
-    duration_scan_status['updated'] = 0
-    duration_scan_status['failed'] = 0
-    duration_scan_status['skipped'] = 0
-    duration_scan_status['current'] = 0
-
-    videos = get_all_videos()
-    duration_scan_status['total'] = len(videos)
-
-    for i, video in enumerate(videos):
-        duration_scan_status['current'] = i + 1
-        duration_scan_status['current_video'] = video.get('title', '')[:50]
-
-        # Skip if already has duration
-        if video.get('duration') and video['duration'].strip():
-            duration_scan_status['skipped'] += 1
-            continue
+def probe_video_duration(video):
+    """Find a video's duration from its local file or direct URL, or None."""
+    duration = None
 
-        duration = None
+    # Try local file first
+    local_file = video.get('local_file')
+    if local_file:
+        local_path = os.path.join(VIDEOS_FOLDER, local_file)
+        if os.path.exists(local_path):
+            duration = get_video_duration(local_path)
 
-        # Try local file first
-        local_file = video.get('local_file')
-        if local_file:
-            local_path = os.path.join(VIDEOS_FOLDER, local_file)
-            if os.path.exists(local_path):
-                duration = get_video_duration(local_path)
+    # Try URL if no local file or local didn't work
+    if not duration and video.get('url'):
+        url = video['url']
+        # Only try ffprobe on direct video URLs (S3, etc), not YouTube/Vimeo
+        if url and not any(x in url for x in ['youtube.com', 'youtu.be', 'vimeo.com']):
+            duration = get_video_duration_from_url(url)
 
-        # Try URL if no local file or local didn't work
-        if not duration and video.get('url'):
-            url = video['url']
-            # Only try ffprobe on direct video URLs (S3, etc), not YouTube/Vimeo
-            if url and not any(x in url for x in ['youtube.com', 'youtu.be', 'vimeo.com']):
-                duration = get_video_duration_from_url(url)
+    return duration
 
-        if duration:
-            video['duration'] = duration
-            save_video(video)
-            duration_scan_status['updated'] += 1
-            print(f"[DURATION] Updated {video['title']}: {duration}")
-        else:
-            duration_scan_status['failed'] += 1
 
-    duration_scan_status['running'] = False
-    print(f"[DURATION] Scan complete: {duration_scan_status['updated']} updated, {duration_scan_status['skipped']} skipped, {duration_scan_status['failed']} failed")
+def backfill_video_duration(video):
+    """Backfill step: probe and store a missing duration."""
+    duration = probe_video_duration(video)
+    if not duration:
+        raise ValueError('duration not found')
+    supabase.table('videos').update({'duration': duration}).eq('id', video['id']).execute()
+    print(f"[DURATION] Updated {video.get('title', '')}: {duration}")
+    return True
 
 
 def scan_and_update_video_durations():
-    """Start background duration scan."""
-    import threading
-    if duration_scan_status['running']:
-        return {'error': 'Scan already running'}
-
-    thread = threading.Thread(target=scan_and_update_video_durations_background)
-    thread.daemon = True
-    thread.start()
-
-    return {'started': True, 'total': len(get_all_videos())}
+    """Start the background duration backfill."""
+    return start_backfill('durations')
 
 
 import re
@@ -2621,10 +3015,218 @@ def generate_thumbnail(video_path, thumbnail_path):
         return False
 
 
+# Responsive images: resized WebP/JPEG variants (see image_variants.py) with
+# content-hashed names, stored in S3/B2 under images/ or in static/images, and
+# served with immutable cache headers. Templates offer them through srcset.
+IMAGES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'images')
+FORMATIONS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'formations')
+FORMATION_WIDTHS = [96, 192]  # Formations are shown at 40-80 CSS px
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def image_source(url):
+    """Local path for a /static/ image URL, the URL itself otherwise."""
+    if url.startswith('/static/'):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), url.lstrip('/'))
+    return url
+
+
+def store_image_variants(src, base_name, widths=None, formats=None, remote=None):
+    """Build the variants of an image and store them (S3/B2 if configured, else static/images).
+
+    Returns the variants dict ({format: [[width, url], ...]}), {} on failure.
+    """
+    remote = USE_S3 and s3_client if remote is None else remote
+    temp_dir, outputs = build_image_variants(src, base_name, widths, formats,
+                                             ffmpeg=get_ffmpeg_path(), ffprobe=get_ffprobe_path())
+    variants = {}
+    try:
+        for fmt, width, filename, path in outputs:
+            if remote:
+                s3_key = f"images/{filename}"
+                with open(path, 'rb') as f:
+                    s3_client.put_object(Bucket=AWS_S3_BUCKET, Key=s3_key, Body=f,
+                                         ContentType=image_content_type(fmt), CacheControl=IMMUTABLE_CACHE_CONTROL)
+                url = get_s3_public_url(s3_key)
+            else:
+                os.makedirs(IMAGES_FOLDER, exist_ok=True)
+                shutil.move(path, os.path.join(IMAGES_FOLDER, filename))
+                url = f"/static/images/{filename}"
+            variants.setdefault(fmt, []).append([width, url])
+    except Exception as e:
+        print(f"[IMAGES] Error storing variants of {base_name}: {e}")
+        return {}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return variants
+
+
+def refresh_thumbnail_variants(video_id, thumbnail):
+    """Build and save the variants of a video thumbnail. Returns True if saved."""
+    variants = store_image_variants(image_source(thumbnail), f"thumb-{video_id}")
+    if not variants:
+        return False
+    # Only if the thumbnail has not been replaced in the meantime
+    supabase.table('videos').update({'thumbnail_variants': json.dumps(variants)}) \
+        .eq('id', video_id).eq('thumbnail', thumbnail).execute()
+    return True
+
+
+@app.after_request
+def immutable_image_headers(response):
+    """Variant file names change with their content, so browsers may cache them forever."""
+    if request.path.startswith('/static/images/') and response.status_code == 200:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+@app.template_filter('srcset')
+def srcset_filter(variants, fmt):
+    """srcset for one format of a stored variants dict, e.g. video.thumbnail_variants|srcset('webp')."""
+    return variants_srcset(variants, fmt)
+
+
+# Formation drawings are static files, so their variants are built once per
+# change of the source PNG and listed in static/images/formations.json, keyed
+# by the drawing's URL. The first request for the list starts the build.
+FORMATION_MANIFEST = os.path.join(IMAGES_FOLDER, 'formations.json')
+formation_variants_lock = threading.Lock()
+formation_variants_building = False
+
+
+def formation_versions():
+    """{url: "mtime:size"} of the formation drawings on disk, to spot new or changed files."""
+    versions = {}
+    for name in sorted(os.listdir(FORMATIONS_FOLDER)):
+        if name.endswith('.png'):
+            st = os.stat(os.path.join(FORMATIONS_FOLDER, name))
+            versions[f"/static/formations/{name}"] = f"{int(st.st_mtime)}:{st.st_size}"
+    return versions
+
+
+def build_formation_variants():
+    global formation_variants_building
+    try:
+        try:
+            with open(FORMATION_MANIFEST) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        built = 0
+        for url, version in formation_versions().items():
+            if manifest.get(url, {}).get('version') == version:
+                continue
+            name = os.path.basename(url)
+            variants = store_image_variants(os.path.join(FORMATIONS_FOLDER, name),
+                                            f"formation-{os.path.splitext(name)[0]}",
+                                            FORMATION_WIDTHS, ['webp'], remote=False)
+            if variants:
+                manifest[url] = {'version': version, 'variants': variants}
+                built += 1
+        if built:
+            os.makedirs(IMAGES_FOLDER, exist_ok=True)
+            with open(FORMATION_MANIFEST + '.tmp', 'w') as f:
+                json.dump(manifest, f, separators=(',', ':'))
+            os.replace(FORMATION_MANIFEST + '.tmp', FORMATION_MANIFEST)
+            print(f"[IMAGES] Built variants for {built} formation drawings")
+    finally:
+        with formation_variants_lock:
+            formation_variants_building = False
+
+
+@app.route('/api/formation-images')
+def formation_images():
+    """Variants of the formation drawings: {"/static/formations/<name>.png": {format: [[width, url], ...]}}."""
+    global formation_variants_building
+    try:
+        with open(FORMATION_MANIFEST) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    stale = any(manifest.get(url, {}).get('version') != version for url, version in formation_versions().items())
+    with formation_variants_lock:
+        start = stale and not formation_variants_building
+        if start:
+            formation_variants_building = True
+    if start:
+        thread = threading.Thread(target=build_formation_variants)
+        thread.daemon = True
+        thread.start()
+
+    return jsonify({url: entry['variants'] for url, entry in manifest.items()}), 200, \
+        {'Cache-Control': 'public, max-age=300'}
+
+
+# Filename detection rules, compiled once at import for detect_category_from_filename().
+# Indoor keywords - VFS (Vertical Formation Skydiving) is typically indoor/tunnel
+INDOOR_DETECT_PATTERNS = ['indoor', 'wind tunnel', 'windtunnel', 'ifly', 'tunnel']
+
+# Category detection patterns (order matters - more specific first)
+CATEGORY_DETECT_PATTERNS = {
+    'cp': ['canopy piloting', '_cp_', '-cp-', ' cp ', 'cp_', '_cp', 'canopypiloting', 'swooping'],
+    'cf': ['canopy formation', '_cf_', '-cf-', ' cf ', 'cf_', '_cf', 'canopyformation', 'crw'],
+    'fs': ['formation skydiving', '_fs_', '-fs-', ' fs ', 'fs_', '_fs', 'formationskydiving', 'rw', 'vfs'],
+    'ae': ['artistic', '_ae_', '-ae-', ' ae ', 'ae_', '_ae', 'freestyle', 'freefly'],
+    'ws': ['wingsuit', '_ws_', '-ws-', ' ws ', 'ws_', '_ws'],
+}
+
+# Subcategory detection patterns (order matters - more specific first)
+SUBCATEGORY_DETECT_PATTERNS = {
+    'cp': {
+        'freestyle': ['cp freestyle', 'cp_freestyle', 'cpfreestyle'],
+        'speed': ['speed run', 'speedrun'],
+        'distance': ['distance'],
+        'zone_accuracy': ['zone', 'pond swoop']
+    },
+    'fs': {
+        '4way_vfs': ['vfs', 'vertical'],
+        '4way_fs': ['4way', '4-way', '4 way'],
+        '2way_mfs': ['2way', '2-way', '2 way', 'mfs'],
+        '8way': ['8way', '8-way', '8 way'],
+        '10way': ['10way', '10-way', '10 way'],
+        '16way': ['16way', '16-way', '16 way']
+    },
+    'cf': {
+        '4way_rot': ['4way rot', '4-way rot', 'rotation'],
+        '4way_seq': ['4way seq', '4-way seq', 'sequential'],
+        '2way': ['2way', '2-way', '2 way']
+    },
+    'ae': {
+        'freefly': ['freefly', 'free fly'],
+        'freestyle': ['freestyle', 'free style']
+    },
+    'ws': {
+        'performance': ['performance', 'perf'],
+        'acrobatic': ['acrobatic', 'acro']
+    }
+}
+
+# Event name patterns (common competition names)
+EVENT_DETECT_PATTERNS = [(re.compile(pattern), replacement) for pattern, replacement in [
+    # Nationals patterns
+    (r'(\d{4})\s*nationals?', r'\1 Nationals'),
+    (r'nationals?\s*(\d{4})', r'\1 Nationals'),
+    (r'uspa\s*nationals?\s*(\d{4})', r'USPA Nationals \1'),
+    (r'(\d{4})\s*uspa\s*nationals?', r'USPA Nationals \1'),
+    # World patterns
+    (r'(\d{4})\s*worlds?', r'\1 World Championships'),
+    (r'worlds?\s*(\d{4})', r'\1 World Championships'),
+    (r'world\s*championships?\s*(\d{4})', r'\1 World Championships'),
+    # Regional patterns
+    (r'(\d{4})\s*regionals?', r'\1 Regionals'),
+    (r'regionals?\s*(\d{4})', r'\1 Regionals'),
+    # Other common events
+    (r'(\d{4})\s*indoor\s*nationals?', r'\1 Indoor Nationals'),
+    (r'pops\s*(\d{4})', r'POPs \1'),
+    (r'(\d{4})\s*pops', r'POPs \1'),
+    # Generic year-based event detection
+    (r'([a-z\s]+)\s*(\d{4})', None),  # Will be handled specially
+]]
+
+
 def detect_category_from_filename(filename):
     """Auto-detect category, subcategory, and event name from filename."""
-    import re
-
     if not filename:
         return None, None, None
 
@@ -2647,18 +3249,9 @@ def detect_category_from_filename(filename):
 
     # Check custom mappings (simple substring match for manually added patterns)
     try:
-        custom_mappings = []
-        try:
-            result = supabase.table('category_mappings').select('*').execute()
-            custom_mappings = result.data or []
-        except:
-            pass
-        for mapping in custom_mappings:
-            pattern = mapping.get('pattern', '').lower()
-            # Skip patterns with placeholders (already handled by match_learned_patterns)
-            if '{N}' in pattern or '{YEAR}' in pattern or re.search(r'\{[a-z]+-', pattern):
-                continue
-            if pattern and pattern in name_lower:
+        # Patterns with placeholders are already handled by match_learned_patterns
+        for pattern, mapping in get_learned_matcher()['substrings']:
+            if pattern in name_lower:
                 detected_category = mapping.get('category')
                 detected_subcategory = mapping.get('subcategory')
                 # Return early if we found a custom mapping
@@ -2668,78 +3261,14 @@ def detect_category_from_filename(filename):
         pass  # Continue with built-in patterns if custom mappings fail
 
     # Check for "indoor" first - it takes priority as main category
-    # VFS (Vertical Formation Skydiving) is typically indoor/tunnel
-    indoor_patterns = ['indoor', 'wind tunnel', 'windtunnel', 'ifly', 'tunnel']
-    is_indoor = any(pattern in name_lower for pattern in indoor_patterns)
+    is_indoor = any(pattern in name_lower for pattern in INDOOR_DETECT_PATTERNS)
 
     if is_indoor:
         detected_category = 'fs'  # Indoor is now under FS
 
-    # Category detection patterns (order matters - more specific first)
-    category_patterns = {
-        'cp': ['canopy piloting', '_cp_', '-cp-', ' cp ', 'cp_', '_cp', 'canopypiloting', 'swooping'],
-        'cf': ['canopy formation', '_cf_', '-cf-', ' cf ', 'cf_', '_cf', 'canopyformation', 'crw'],
-        'fs': ['formation skydiving', '_fs_', '-fs-', ' fs ', 'fs_', '_fs', 'formationskydiving', 'rw', 'vfs'],
-        'ae': ['artistic', '_ae_', '-ae-', ' ae ', 'ae_', '_ae', 'freestyle', 'freefly'],
-        'ws': ['wingsuit', '_ws_', '-ws-', ' ws ', 'ws_', '_ws'],
-    }
-
-    # Subcategory detection patterns (order matters - more specific first)
-    subcategory_patterns = {
-        'cp': {
-            'freestyle': ['cp freestyle', 'cp_freestyle', 'cpfreestyle'],
-            'speed': ['speed run', 'speedrun'],
-            'distance': ['distance'],
-            'zone_accuracy': ['zone', 'pond swoop']
-        },
-        'fs': {
-            '4way_vfs': ['vfs', 'vertical'],
-            '4way_fs': ['4way', '4-way', '4 way'],
-            '2way_mfs': ['2way', '2-way', '2 way', 'mfs'],
-            '8way': ['8way', '8-way', '8 way'],
-            '10way': ['10way', '10-way', '10 way'],
-            '16way': ['16way', '16-way', '16 way']
-        },
-        'cf': {
-            '4way_rot': ['4way rot', '4-way rot', 'rotation'],
-            '4way_seq': ['4way seq', '4-way seq', 'sequential'],
-            '2way': ['2way', '2-way', '2 way']
-        },
-        'ae': {
-            'freefly': ['freefly', 'free fly'],
-            'freestyle': ['freestyle', 'free style']
-        },
-        'ws': {
-            'performance': ['performance', 'perf'],
-            'acrobatic': ['acrobatic', 'acro']
-        }
-    }
-
-    # Event name patterns (common competition names)
-    event_patterns = [
-        # Nationals patterns
-        (r'(\d{4})\s*nationals?', r'\1 Nationals'),
-        (r'nationals?\s*(\d{4})', r'\1 Nationals'),
-        (r'uspa\s*nationals?\s*(\d{4})', r'USPA Nationals \1'),
-        (r'(\d{4})\s*uspa\s*nationals?', r'USPA Nationals \1'),
-        # World patterns
-        (r'(\d{4})\s*worlds?', r'\1 World Championships'),
-        (r'worlds?\s*(\d{4})', r'\1 World Championships'),
-        (r'world\s*championships?\s*(\d{4})', r'\1 World Championships'),
-        # Regional patterns
-        (r'(\d{4})\s*regionals?', r'\1 Regionals'),
-        (r'regionals?\s*(\d{4})', r'\1 Regionals'),
-        # Other common events
-        (r'(\d{4})\s*indoor\s*nationals?', r'\1 Indoor Nationals'),
-        (r'pops\s*(\d{4})', r'POPs \1'),
-        (r'(\d{4})\s*pops', r'POPs \1'),
-        # Generic year-based event detection
-        (r'([a-z\s]+)\s*(\d{4})', None),  # Will be handled specially
-    ]
-
     # Detect category (only if not already detected)
     if not detected_category:
-        for cat_id, patterns in category_patterns.items():
+        for cat_id, patterns in CATEGORY_DETECT_PATTERNS.items():
             for pattern in patterns:
                 if pattern in name_lower:
                     detected_category = cat_id
@@ -2748,8 +3277,8 @@ def detect_category_from_filename(filename):
                 break
 
     # Detect subcategory if category was found
-    if detected_category and detected_category in subcategory_patterns:
-        for sub_id, patterns in subcategory_patterns[detected_category].items():
+    if detected_category and detected_category in SUBCATEGORY_DETECT_PATTERNS:
+        for sub_id, patterns in SUBCATEGORY_DETECT_PATTERNS[detected_category].items():
             for pattern in patterns:
                 if pattern in name_lower:
                     detected_subcategory = sub_id
@@ -2767,11 +3296,11 @@ def detect_category_from_filename(filename):
             detected_category = 'indoor'
 
     # Detect event name
-    for pattern, replacement in event_patterns:
-        match = re.search(pattern, name_lower)
+    for pattern, replacement in EVENT_DETECT_PATTERNS:
+        match = pattern.search(name_lower)
         if match:
             if replacement:
-                detected_event = re.sub(pattern, replacement, match.group(0))
+                detected_event = pattern.sub(replacement, match.group(0))
                 # Capitalize properly
                 detected_event = ' '.join(word.capitalize() for word in detected_event.split())
             else:
@@ -2789,22 +3318,242 @@ def detect_category_from_filename(filename):
     return detected_category, detected_subcategory, detected_event
 
 
+# Encode profiles for MP4 conversion.
+# 'judging' forces a short, fixed, closed GOP (no scene-cut keyframes) so that
+# backward seeks and frame stepping in the judging player only ever decode
+# JUDGING_GOP_SECONDS of video. 'standard' is libx264's default GOP.
+VIDEO_ENCODE_PROFILE = os.environ.get('VIDEO_ENCODE_PROFILE', 'judging')
+JUDGING_GOP_SECONDS = float(os.environ.get('JUDGING_GOP_SECONDS', '0.5'))
+
+
+def get_encode_args(profile=None):
+    """Get ffmpeg output encoding args for an encode profile ('judging' or 'standard')."""
+    profile = profile or VIDEO_ENCODE_PROFILE
+    args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23']
+    if profile == 'judging':
+        args += [
+            '-force_key_frames', f'expr:gte(t,n_forced*{JUDGING_GOP_SECONDS})',
+            '-sc_threshold', '0',
+            '-flags', '+cgop',
+        ]
+    args += [
+        '-c:a', 'aac', '-b:a', '128k',
+        '-movflags', '+faststart',
+    ]
+    return args
+
+
 def convert_video_to_mp4(input_path, output_path):
     """Convert video to MP4 using ffmpeg."""
     try:
-        subprocess.run([
-            'ffmpeg', '-y', '-i', input_path,
-            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-            '-c:a', 'aac', '-b:a', '128k',
-            '-movflags', '+faststart',
-            output_path
-        ], capture_output=True, check=True)
+        subprocess.run(
+            ['ffmpeg', '-y', '-i', input_path] + get_encode_args() + [output_path],
+            capture_output=True, check=True
+        )
         return True
     except Exception as e:
         print(f"Conversion error: {e}")
         return False
 
 
+def build_keyframe_index(video_path):
+    """Build the keyframe and frame-timestamp index for a video file.
+
+    Returns a dict with sorted presentation timestamps (seconds) of every
+    video frame and of every keyframe, or None if ffprobe fails.
+    """
+    try:
+        result = subprocess.run(
+            [get_ffprobe_path(), '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path],
+            capture_output=True, text=True, timeout=300
+        )
+        if result.returncode != 0:
+            print(f"[KEYFRAMES] ffprobe failed: {result.stderr[-200:]}")
+            return None
+
+        frames = []
+        keyframes = []
+        for line in result.stdout.splitlines():
+            parts = line.strip().split(',')
+            if len(parts) < 2 or parts[0] in ('', 'N/A'):
+                continue
+            try:
+                pts = round(float(parts[0]), 4)
+            except ValueError:
+                continue
+            frames.append(pts)
+            if 'K' in parts[1]:
+                keyframes.append(pts)
+
+        if not frames:
+            return None
+        # Packets are listed in decode order; the player needs presentation order
+        frames.sort()
+        keyframes.sort()
+
+        fps = None
+        if len(frames) > 1 and frames[-1] > frames[0]:
+            fps = round((len(frames) - 1) / (frames[-1] - frames[0]), 3)
+
+        return {
+            'version': 1,
+            'fps': fps,
+            'duration': frames[-1],
+            'keyframes': keyframes,
+            'frames': frames,
+        }
+    except Exception as e:
+        print(f"[KEYFRAMES] Error building index for {video_path}: {e}")
+        return None
+
+
+def store_video_sidecar(data, filename, content_type):
+    """Store a sidecar file next to the video: S3/B2 when configured, else the local videos folder."""
+    if USE_S3:
+        return upload_to_s3(data, filename, content_type, folder='videos')
+
+    with open(os.path.join(VIDEOS_FOLDER, filename), 'wb') as f:
+        f.write(data)
+    return f"/static/videos/{filename}"
+
+
+def delete_video_sidecar(sidecar_url):
+    """Delete a stored sidecar file from S3/B2 or the local videos folder."""
+    if sidecar_url.startswith('/static/videos/'):
+        try:
+            os.remove(os.path.join(VIDEOS_FOLDER, os.path.basename(sidecar_url)))
+        except OSError:
+            pass
+        return
+    key = get_b2_key_from_url(normalize_b2_url(sidecar_url))
+    if key:
+        delete_from_s3(key)
+
+
+def generate_keyframe_sidecar(video_path, video_id, index=None):
+    """Generate the keyframe index sidecar and store it next to the video.
+
+    Stored as `videos/<video_id>.keyframes.json`. Returns its URL or None.
+    """
+    index = index or build_keyframe_index(video_path)
+    if not index:
+        return None
+
+    sidecar_data = json.dumps(index, separators=(',', ':')).encode('utf-8')
+    return store_video_sidecar(sidecar_data, f"{video_id}.keyframes.json", 'application/json')
+
+
+# Scrub previews: one small frame every PREVIEW_INTERVAL seconds, tiled into
+# JPEG sprite sheets, plus a WebVTT track mapping each interval to its tile
+# (`<sheet url>#xywh=x,y,w,h`). The player shows hover/scrub previews from the
+# sheets instead of seeking the video. When keyframes are at least as dense as
+# the interval (the judging encode profile), only keyframes are decoded.
+PREVIEW_INTERVAL = float(os.environ.get('PREVIEW_INTERVAL', '1'))
+PREVIEW_MAX_FRAMES = int(os.environ.get('PREVIEW_MAX_FRAMES', '600'))
+PREVIEW_TILE_WIDTH = 160
+PREVIEW_TILE_HEIGHT = 90
+PREVIEW_COLUMNS = 10
+PREVIEW_ROWS = 10
+SHOWINFO_PTS_RE = re.compile(r'Parsed_showinfo.*\bn:\s*\d+.*\bpts_time:\s*(-?[\d.]+)')
+
+
+def format_vtt_time(seconds):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}"
+
+
+def generate_preview_sprites(video_path, video_id, index=None):
+    """Generate the scrub preview sprite sheets and WebVTT track for a video.
+
+    Stored next to the video as `<video_id>.sprite-<n>.<hash>.jpg` and
+    `<video_id>.preview.<hash>.vtt`, so a regenerated track never shares a
+    URL with the one it replaces. Returns (vtt_url, all stored URLs), or
+    (None, []) if ffmpeg fails.
+    """
+    import hashlib
+    import tempfile
+
+    duration = (index or {}).get('duration') or get_video_duration_seconds(video_path)
+    if not duration:
+        return None, []
+    interval = max(PREVIEW_INTERVAL, duration / PREVIEW_MAX_FRAMES)
+
+    keyframes = (index or {}).get('keyframes') or []
+    gaps = [b - a for a, b in zip(keyframes, keyframes[1:])]
+    skip = ['-skip_frame', 'nokey'] if gaps and max(gaps) <= interval else []
+
+    w, h = PREVIEW_TILE_WIDTH, PREVIEW_TILE_HEIGHT
+    filters = (f"fps={1 / interval:.6f},showinfo,"
+               f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,"
+               f"tile={PREVIEW_COLUMNS}x{PREVIEW_ROWS}")
+    temp_dir = tempfile.mkdtemp(prefix='sprites_')
+    try:
+        started = time.time()
+        result = subprocess.run(
+            [get_ffmpeg_path(), '-hide_banner', '-y'] + skip + ['-i', video_path, '-an',
+             '-vf', filters, '-q:v', '5', os.path.join(temp_dir, 'sprite-%03d.jpg')],
+            capture_output=True, timeout=600
+        )
+        stderr = result.stderr.decode(errors='replace')
+        frames = len(SHOWINFO_PTS_RE.findall(stderr))
+        if result.returncode != 0 or not frames:
+            print(f"[PREVIEW] ffmpeg failed for {video_id}: {stderr[-200:]}")
+            return None, []
+
+        per_sheet = PREVIEW_COLUMNS * PREVIEW_ROWS
+        sheet_urls = []
+        for n in range((frames + per_sheet - 1) // per_sheet):
+            with open(os.path.join(temp_dir, f'sprite-{n + 1:03d}.jpg'), 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            url = store_video_sidecar(data, f"{video_id}.sprite-{n}.{digest}.jpg", 'image/jpeg')
+            if not url:
+                return None, []
+            sheet_urls.append(url)
+
+        cues = ['WEBVTT', '']
+        for n in range(frames):
+            start = n * interval
+            end = max(min((n + 1) * interval, duration), start + 0.001)
+            tile = n % per_sheet
+            x, y = (tile % PREVIEW_COLUMNS) * w, (tile // PREVIEW_COLUMNS) * h
+            cues += [f"{format_vtt_time(start)} --> {format_vtt_time(end)}",
+                     f"{sheet_urls[n // per_sheet]}#xywh={x},{y},{w},{h}", '']
+        vtt_data = '\n'.join(cues).encode('utf-8')
+        digest = hashlib.sha256(vtt_data).hexdigest()[:10]
+        vtt_url = store_video_sidecar(vtt_data, f"{video_id}.preview.{digest}.vtt", 'text/vtt')
+        if not vtt_url:
+            return None, []
+        print(f"[PREVIEW] {video_id}: {frames} frames in {len(sheet_urls)} sheet(s) "
+              f"({time.time() - started:.1f}s{', keyframes only' if skip else ''})")
+        return vtt_url, sheet_urls + [vtt_url]
+    except Exception as e:
+        print(f"[PREVIEW] Error generating sprites for {video_id}: {e}")
+        return None, []
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def generate_video_sidecars(video_path, video_id, video_data):
+    """Generate the keyframe index and scrub previews, setting their URLs on video_data.
+
+    Returns every stored URL (for CDN purges).
+    """
+    index = build_keyframe_index(video_path)
+    urls = []
+    keyframe_index_url = generate_keyframe_sidecar(video_path, video_id, index)
+    if keyframe_index_url:
+        video_data['keyframe_index'] = keyframe_index_url
+        urls.append(keyframe_index_url)
+    preview_vtt_url, preview_urls = generate_preview_sprites(video_path, video_id, index)
+    if preview_vtt_url:
+        video_data['preview_vtt'] = preview_vtt_url
+        urls += preview_urls
+    return urls
+
+
 def get_video_duration_seconds(file_path):
     """Get video duration in seconds using ffprobe."""
     try:
@@ -2822,44 +3571,34 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
     """Run video conversion in background thread with real-time progress."""
     try:
         # Wait in queue if too many conversions are running
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'queued'
-            conversion_jobs[job_id]['progress'] = 0
-            conversion_jobs[job_id]['input_path'] = input_path
-            conversion_jobs[job_id]['output_path'] = output_path
-            conversion_jobs[job_id]['video_data'] = video_data
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='queued', progress=0, input_path=input_path,
+                              output_path=output_path, video_data=video_data)
 
         while True:
             with conversion_lock:
                 active_count = sum(1 for j in conversion_jobs.values()
                                    if j.get('status') == 'converting')
-                if active_count < MAX_CONCURRENT_CONVERSIONS:
+                claimed = active_count < MAX_CONCURRENT_CONVERSIONS
+                if claimed:
                     conversion_jobs[job_id]['status'] = 'converting'
-                    save_conversion_job(conversion_jobs[job_id])
-                    break
+            if claimed:
+                update_conversion_job(job_id, status='converting')
+                break
             time.sleep(2)  # Check every 2 seconds
 
         # Get input video duration for progress calculation
         total_duration = get_video_duration_seconds(input_path)
 
         # Run ffmpeg with progress output (stderr to DEVNULL to prevent blocking)
-        process = subprocess.Popen([
-            'ffmpeg', '-y', '-i', input_path,
-            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-            '-c:a', 'aac', '-b:a', '128k',
-            '-movflags', '+faststart',
-            '-progress', 'pipe:1',
-            '-nostats',
-            output_path
-        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        process = subprocess.Popen(
+            ['ffmpeg', '-y', '-i', input_path] + get_encode_args() +
+            ['-progress', 'pipe:1', '-nostats', output_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
 
         # Store PID for recovery after restart
-        with conversion_lock:
-            conversion_jobs[job_id]['pid'] = process.pid
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, pid=process.pid)
 
-        last_db_update = time.time()
         # Parse progress output in real-time
         for line in process.stdout:
             line = line.strip()
@@ -2871,12 +3610,7 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
                     if total_duration and total_duration > 0:
                         # Progress 0-65% for conversion (leave room for thumbnail/upload)
                         progress = min(65, int((current_time / total_duration) * 65))
-                        with conversion_lock:
-                            conversion_jobs[job_id]['progress'] = progress
-                        # Save to database every 5 seconds
-                        if time.time() - last_db_update > 5:
-                            save_conversion_job(conversion_jobs[job_id])
-                            last_db_update = time.time()
+                        update_conversion_job(job_id, progress=progress)
                 except:
                     pass
             elif line.startswith('out_time=') and not line.startswith('out_time_us'):
@@ -2891,12 +3625,7 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
                         current_time = hours * 3600 + minutes * 60 + seconds
                         if total_duration and total_duration > 0:
                             progress = min(65, int((current_time / total_duration) * 65))
-                            with conversion_lock:
-                                conversion_jobs[job_id]['progress'] = progress
-                            # Save to database every 5 seconds
-                            if time.time() - last_db_update > 5:
-                                save_conversion_job(conversion_jobs[job_id])
-                                last_db_update = time.time()
+                            update_conversion_job(job_id, progress=progress)
                 except:
                     pass
             elif line.startswith('progress=end'):
@@ -2909,17 +3638,12 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
                               filename=video_data.get('title'),
                               extra={'job_id': job_id, 'video_id': video_data.get('id'),
                                      'input_path': input_path, 'return_code': process.returncode})
-            with conversion_lock:
-                conversion_jobs[job_id]['status'] = 'failed'
-                conversion_jobs[job_id]['error'] = 'FFmpeg conversion failed'
-                save_conversion_job(conversion_jobs[job_id])
+            update_conversion_job(job_id, status='failed', error='FFmpeg conversion failed')
             if temp_file and os.path.exists(temp_file):
                 os.remove(temp_file)
             return
 
-        with conversion_lock:
-            conversion_jobs[job_id]['progress'] = 70
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, progress=70)
 
         # Clean up temp file
         if temp_file and os.path.exists(temp_file):
@@ -2930,9 +3654,7 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
         thumbnail_filename = f"{video_id}_thumb.jpg"
         thumbnail_path = os.path.join(VIDEOS_FOLDER, thumbnail_filename)
 
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'generating_thumbnail'
-            conversion_jobs[job_id]['progress'] = 80
+        update_conversion_job(job_id, status='generating_thumbnail', progress=80)
 
         if generate_thumbnail(output_path, thumbnail_path):
             video_data['thumbnail'] = f"/static/videos/{thumbnail_filename}"
@@ -2942,13 +3664,14 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
         if duration:
             video_data['duration'] = duration
 
-        with conversion_lock:
-            conversion_jobs[job_id]['progress'] = 90
+        # Keyframe/frame-timestamp index for precise seeking and scrub previews for the player
+        generate_video_sidecars(output_path, video_id, video_data)
+
+        update_conversion_job(job_id, progress=90)
 
         # Upload to cloud storage (prefer S3 over Supabase)
         if USE_S3:
-            with conversion_lock:
-                conversion_jobs[job_id]['status'] = 'uploading'
+            update_conversion_job(job_id, status='uploading')
 
             # Upload video file to S3
             video_filename = os.path.basename(output_path)
@@ -2974,23 +3697,15 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
         # Save video to database
         save_video(video_data)
 
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'completed'
-            conversion_jobs[job_id]['progress'] = 100
-            conversion_jobs[job_id]['video_id'] = video_id
-            conversion_jobs[job_id]['completed_at'] = datetime.now().isoformat()
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='completed', progress=100, video_id=video_id,
+                              completed_at=datetime.now().isoformat())
 
     except Exception as e:
         import traceback
         log_upload_failure('background_conversion_exception',
                           filename=video_data.get('title') if video_data else None,
                           extra={'job_id': job_id, 'error': str(e), 'traceback': traceback.format_exc()})
-        with conversion_lock:
-            if job_id in conversion_jobs:
-                conversion_jobs[job_id]['status'] = 'failed'
-                conversion_jobs[job_id]['error'] = str(e)
-                save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='failed', error=str(e))
         if temp_file and os.path.exists(temp_file):
             os.remove(temp_file)
 
@@ -2998,18 +3713,12 @@ def background_convert_video(job_id, input_path, output_path, video_data, temp_f
 def background_upload_to_s3(job_id, file_path, video_data):
     """Upload video to S3 in background thread (for files that don't need conversion)."""
     try:
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'processing'
-            conversion_jobs[job_id]['progress'] = 10
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='processing', progress=10)
 
         video_id = video_data['id']
 
         # Generate thumbnail
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'generating_thumbnail'
-            conversion_jobs[job_id]['progress'] = 30
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='generating_thumbnail', progress=30)
 
         thumbnail_filename = f"{video_id}_thumb.jpg"
         thumbnail_path = os.path.join(VIDEOS_FOLDER, thumbnail_filename)
@@ -3017,19 +3726,17 @@ def background_upload_to_s3(job_id, file_path, video_data):
             video_data['thumbnail'] = f"/static/videos/{thumbnail_filename}"
 
         # Get duration
-        with conversion_lock:
-            conversion_jobs[job_id]['progress'] = 50
+        update_conversion_job(job_id, progress=50)
 
         duration = get_video_duration(file_path)
         if duration:
             video_data['duration'] = duration
 
+        generate_video_sidecars(file_path, video_id, video_data)
+
         # Upload to S3
         if USE_S3:
-            with conversion_lock:
-                conversion_jobs[job_id]['status'] = 'uploading'
-                conversion_jobs[job_id]['progress'] = 60
-                save_conversion_job(conversion_jobs[job_id])
+            update_conversion_job(job_id, status='uploading', progress=60)
 
             video_url = upload_to_s3_from_path(file_path, folder='videos')
             if video_url:
@@ -3049,106 +3756,93 @@ def background_upload_to_s3(job_id, file_path, video_data):
                     os.remove(thumbnail_path)
 
         # Save to database
-        with conversion_lock:
-            conversion_jobs[job_id]['progress'] = 90
+        update_conversion_job(job_id, progress=90)
 
         save_video(video_data)
 
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'completed'
-            conversion_jobs[job_id]['progress'] = 100
-            conversion_jobs[job_id]['video_id'] = video_id
-            conversion_jobs[job_id]['completed_at'] = datetime.now().isoformat()
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='completed', progress=100, video_id=video_id,
+                              completed_at=datetime.now().isoformat())
 
     except Exception as e:
         import traceback
         log_upload_failure('background_upload_exception',
                           filename=video_data.get('title') if video_data else None,
                           extra={'job_id': job_id, 'error': str(e), 'traceback': traceback.format_exc()})
-        with conversion_lock:
-            if job_id in conversion_jobs:
-                conversion_jobs[job_id]['status'] = 'failed'
-                conversion_jobs[job_id]['error'] = str(e)
-                save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='failed', error=str(e))
         if os.path.exists(file_path):
             os.remove(file_path)
 
 
 def background_convert_s3_video(job_id, video_id, s3_key, original_url, video_data):
-    """Download video from S3, convert to MP4, re-upload, and update database."""
-    import urllib.request
+    """Convert a video already on S3 to MP4, re-upload, and update database.
+
+    ffmpeg reads the source URL directly (seeking with HTTP range requests);
+    the file is only copied to local disk if reading it remotely fails.
+    """
     import tempfile
     temp_input = None
     temp_output = None
 
     try:
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'downloading'
-            conversion_jobs[job_id]['progress'] = 5
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='converting', progress=5)
 
-        # Download from S3
         ext = os.path.splitext(s3_key)[1].lower()
-        temp_input = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
-        temp_input.close()
+        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        temp_output.close()
 
-        req = urllib.request.Request(original_url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req) as resp, open(temp_input.name, 'wb') as f:
-            f.write(resp.read())
+        def run_conversion(source, start_progress):
+            """Run ffmpeg on source, reporting progress from start_progress to 70%."""
+            total_duration = get_video_duration_seconds(source)
+            span = 70 - start_progress
+            process = subprocess.Popen(
+                ['ffmpeg', '-y'] + ffmpeg_input_args(source) + get_encode_args() +
+                ['-progress', 'pipe:1', '-nostats', temp_output.name],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+            for line in process.stdout:
+                line = line.strip()
+                if line.startswith('out_time_us='):
+                    try:
+                        time_us = int(line.split('=')[1])
+                        current_time = time_us / 1000000.0
+                        if total_duration and total_duration > 0:
+                            progress = start_progress + min(span, int((current_time / total_duration) * span))
+                            update_conversion_job(job_id, progress=progress)
+                    except:
+                        pass
+                elif line.startswith('progress=end'):
+                    break
+            process.wait()
+            return process.returncode
 
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'converting'
-            conversion_jobs[job_id]['progress'] = 20
-            save_conversion_job(conversion_jobs[job_id])
+        returncode = run_conversion(original_url, 5)
 
-        # Get input duration for progress
-        total_duration = get_video_duration_seconds(temp_input.name)
+        if returncode != 0:
+            # Some containers can't be read remotely - fall back to a local copy
+            print(f"[CONVERT] Direct URL read failed for {video_id}, downloading source first")
+            update_conversion_job(job_id, status='downloading', progress=5)
 
-        # Convert to MP4
-        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-        temp_output.close()
+            # Stable path per video, so a retried conversion resumes the download
+            temp_input = os.path.join(tempfile.gettempdir(), f"{video_id}_source{ext}")
 
-        process = subprocess.Popen([
-            'ffmpeg', '-y', '-i', temp_input.name,
-            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-            '-c:a', 'aac', '-b:a', '128k',
-            '-movflags', '+faststart',
-            '-progress', 'pipe:1',
-            '-nostats',
-            temp_output.name
-        ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
-
-        # Parse progress
-        for line in process.stdout:
-            line = line.strip()
-            if line.startswith('out_time_us='):
-                try:
-                    time_us = int(line.split('=')[1])
-                    current_time = time_us / 1000000.0
-                    if total_duration and total_duration > 0:
-                        # Progress 20-70% for conversion
-                        progress = 20 + min(50, int((current_time / total_duration) * 50))
-                        with conversion_lock:
-                            conversion_jobs[job_id]['progress'] = progress
-                except:
-                    pass
-            elif line.startswith('progress=end'):
-                break
+            def on_download_progress(done, total):
+                update_conversion_job(job_id, progress=5 + int(15 * done / total) if total else 5)
 
-        process.wait()
+            download_to_file(original_url, temp_input, progress_callback=on_download_progress)
 
-        if process.returncode != 0:
+            update_conversion_job(job_id, status='converting', progress=20)
+
+            returncode = run_conversion(temp_input, 20)
+
+        if returncode != 0:
             raise Exception('FFmpeg conversion failed')
 
         # Clean up input file
-        os.remove(temp_input.name)
-        temp_input = None
+        if temp_input:
+            os.remove(temp_input)
+            temp_input = None
 
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'uploading'
-            conversion_jobs[job_id]['progress'] = 75
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='uploading', progress=75)
 
         # Upload converted MP4 to S3
         new_s3_key = f"videos/{video_id}.mp4"
@@ -3157,13 +3851,13 @@ def background_convert_s3_video(job_id, video_id, s3_key, original_url, video_da
         if not new_url:
             raise Exception('Failed to upload converted video to S3')
 
+        generate_video_sidecars(temp_output.name, video_id, video_data)
+
         # Clean up output file
         os.remove(temp_output.name)
         temp_output = None
 
-        with conversion_lock:
-            conversion_jobs[job_id]['progress'] = 90
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, progress=90)
 
         # Delete original file from S3
         try:
@@ -3186,27 +3880,20 @@ def background_convert_s3_video(job_id, video_id, s3_key, original_url, video_da
         # Save to database
         save_video(video_data)
 
-        with conversion_lock:
-            conversion_jobs[job_id]['status'] = 'completed'
-            conversion_jobs[job_id]['progress'] = 100
-            conversion_jobs[job_id]['video_id'] = video_id
-            conversion_jobs[job_id]['completed_at'] = datetime.now().isoformat()
-            save_conversion_job(conversion_jobs[job_id])
+        update_conversion_job(job_id, status='completed', progress=100, video_id=video_id,
+                              completed_at=datetime.now().isoformat())
 
     except Exception as e:
         import traceback
         log_upload_failure('s3_conversion_exception',
                           filename=video_data.get('title') if video_data else None,
                           extra={'job_id': job_id, 'error': str(e), 'traceback': traceback.format_exc()})
-        with conversion_lock:
-            if job_id in conversion_jobs:
-                conversion_jobs[job_id]['status'] = 'failed'
-                conversion_jobs[job_id]['error'] = str(e)
-                save_conversion_job(conversion_jobs[job_id])
-
-        # Clean up temp files
-        if temp_input and os.path.exists(temp_input.name):
-            os.remove(temp_input.name)
+        update_conversion_job(job_id, status='failed', error=str(e))
+
+        # Clean up temp files, keeping an interrupted download (it has a
+        # .ranges checkpoint) for the next attempt to resume
+        if temp_input and os.path.exists(temp_input) and not os.path.exists(temp_input + '.ranges'):
+            os.remove(temp_input)
         if temp_output and os.path.exists(temp_output.name):
             os.remove(temp_output.name)
 
@@ -3255,6 +3942,21 @@ def all_conversions():
     return jsonify(jobs)
 
 
+if SOCKETIO_ENABLED:
+    @socketio.on('conversion_subscribe')
+    def on_conversion_subscribe(data=None):
+        """Join this session's conversion room and send the current jobs."""
+        session_id = session.get('_id', request.remote_addr)
+        join_room(conversion_room(session_id))
+        with conversion_lock:
+            jobs = {
+                jid: {k: job.get(k) for k in CONVERSION_PUSH_FIELDS}
+                for jid, job in conversion_jobs.items()
+                if job.get('session_id') == session_id
+            }
+        emit('conversion_snapshot', jobs)
+
+
 @app.route('/conversion/clear-completed', methods=['POST'])
 def clear_completed_conversions():
     """Clear completed/failed conversion jobs from the list."""
@@ -3347,6 +4049,7 @@ def index():
     # Get assigned categories for the current user (for filtering)
     assigned_categories = get_user_assigned_categories(username)
 
+    sign_video_urls(recent_videos)
     return render_template('index.html',
                          categories=CATEGORIES,
                          category_counts=category_counts,
@@ -3436,6 +4139,7 @@ def category(cat_id):
                     'total_videos': total_videos
                 })
 
+    sign_video_urls(videos)
     return render_template('category.html',
                          category=cat,
                          cat_id=cat_id,
@@ -3473,29 +4177,7 @@ def video(video_id):
             return "You don't have access to this video.", 403
 
     # Determine video source
-    # Check pCloud first
-    if video.get('video_type') == 'pcloud' and video.get('local_file'):
-        video['video_src'] = f'/pcloud/stream/{video["local_file"]}'
-        video['is_local'] = False
-        video['is_direct_url'] = True
-    # Check URL (Supabase Storage, Dropbox, direct video URLs)
-    elif video.get('url') and is_direct_video_url(video.get('url', '')):
-        video['video_src'] = video['url']
-        video['is_local'] = False
-        video['is_direct_url'] = True
-    elif video.get('video_type') == 'local' and video.get('local_file'):
-        video['video_src'] = f'/static/videos/{video["local_file"]}'
-        video['is_local'] = True
-        video['is_direct_url'] = False
-    elif video.get('url'):
-        video['embed_url'] = get_video_embed_url(video.get('url', ''))
-        video['is_local'] = False
-        video['is_direct_url'] = False
-    else:
-        # No valid video source
-        video['video_src'] = ''
-        video['is_local'] = False
-        video['is_direct_url'] = False
+    resolve_video_src(video)
 
     # Increment view count
     increment_views(video_id)
@@ -4460,7 +5142,6 @@ def submit_assignment_score(assignment_id):
 
 def download_and_convert_video(url, video_id):
     """Download video from URL and convert to MP4 if needed."""
-    import urllib.request
     import tempfile
 
     # Check if it's a video format that needs conversion
@@ -4485,9 +5166,7 @@ def download_and_convert_video(url, video_id):
         temp_input = os.path.join(temp_dir, f"{video_id}_input{ext}")
 
         print(f"Downloading {url}...")
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req) as resp, open(temp_input, 'wb') as f:
-            f.write(resp.read())
+        download_to_file(url, temp_input)
 
         # Convert to MP4
         output_filename = f"{video_id}.mp4"
@@ -4787,8 +5466,7 @@ def export_urls():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
-# Chunked upload storage
-chunked_uploads = {}
+# Chunked upload storage (local-storage fallback; S3 uploads use /admin/multipart/*)
 CHUNK_UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'chunk_uploads')
 os.makedirs(CHUNK_UPLOAD_DIR, exist_ok=True)
 
@@ -4800,7 +5478,6 @@ def upload_chunk():
     upload_id = request.form.get('upload_id')
     chunk_index = int(request.form.get('chunk_index', 0))
     total_chunks = int(request.form.get('total_chunks', 1))
-    filename = request.form.get('filename', 'unknown')
 
     if 'chunk' not in request.files:
         return jsonify({'error': 'No chunk data'}), 400
@@ -4815,17 +5492,8 @@ def upload_chunk():
     chunk_path = os.path.join(upload_dir, f'chunk_{chunk_index:05d}')
     chunk.save(chunk_path)
 
-    # Track progress
-    if upload_id not in chunked_uploads:
-        chunked_uploads[upload_id] = {
-            'filename': filename,
-            'total_chunks': total_chunks,
-            'received_chunks': set(),
-            'created_at': datetime.now().isoformat()
-        }
-
-    chunked_uploads[upload_id]['received_chunks'].add(chunk_index)
-    received = len(chunked_uploads[upload_id]['received_chunks'])
+    # Count chunks on disk so progress is correct whichever worker handles the request
+    received = len([f for f in os.listdir(upload_dir) if f.startswith('chunk_')])
 
     return jsonify({
         'success': True,
@@ -4873,16 +5541,12 @@ def upload_chunk_complete():
             for chunk_file in chunk_files:
                 chunk_path = os.path.join(upload_dir, chunk_file)
                 with open(chunk_path, 'rb') as infile:
-                    outfile.write(infile.read())
+                    shutil.copyfileobj(infile, outfile, 1024 * 1024)
                 os.remove(chunk_path)  # Clean up chunk
 
         # Remove upload directory
         os.rmdir(upload_dir)
 
-        # Clean up tracking
-        if upload_id in chunked_uploads:
-            del chunked_uploads[upload_id]
-
     except Exception as e:
         return jsonify({'error': f'Failed to assemble file: {str(e)}'}), 500
 
@@ -5256,9 +5920,13 @@ def upload_to_s3_endpoint():
             if detected_event and not event:
                 event = detected_event
 
+    import tempfile
+    temp_video = None
     try:
-        # Read file data
-        file_data = file.read()
+        # Spool the upload to disk so it never has to fit in memory
+        temp_video = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
+        temp_video.close()
+        file.save(temp_video.name)
 
         # Determine content type
         content_types = {
@@ -5276,7 +5944,8 @@ def upload_to_s3_endpoint():
         s3_folder = f"{category}/{subcategory}" if subcategory else category
 
         # Upload to S3
-        video_url = upload_to_s3(file_data, s3_filename, content_type, s3_folder)
+        with open(temp_video.name, 'rb') as f:
+            video_url = upload_to_s3(f, s3_filename, content_type, s3_folder)
 
         if not video_url:
             return jsonify({'error': 'Failed to upload to S3'}), 500
@@ -5284,13 +5953,7 @@ def upload_to_s3_endpoint():
         # Generate thumbnail from the uploaded video
         thumbnail_url = ''
         try:
-            import tempfile
-
-            # Save video to temp file for thumbnail generation
-            temp_video = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
             temp_thumb = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-            temp_video.write(file_data)
-            temp_video.close()
             temp_thumb.close()
 
             # Generate thumbnail with ffmpeg
@@ -5301,9 +5964,8 @@ def upload_to_s3_endpoint():
                 thumb_filename = f"{video_id}_thumb.jpg"
                 thumbnail_url = upload_to_s3(thumb_data, thumb_filename, 'image/jpeg', 'thumbnails')
 
-            # Clean up temp files
+            # Clean up temp thumbnail
             try:
-                os.unlink(temp_video.name)
                 os.unlink(temp_thumb.name)
             except:
                 pass
@@ -5339,6 +6001,9 @@ def upload_to_s3_endpoint():
 
     except Exception as e:
         return jsonify({'error': f'S3 upload failed: {str(e)}'}), 500
+    finally:
+        if temp_video and os.path.exists(temp_video.name):
+            os.unlink(temp_video.name)
 
 
 @app.route('/admin/s3-status', methods=['GET'])
@@ -5386,12 +6051,7 @@ def get_presigned_upload_url():
         return jsonify({'error': 'Failed to generate presigned URL'}), 500
 
     # Generate the final URL (what the video will be accessible at)
-    if AWS_CLOUDFRONT_DOMAIN:
-        final_url = f"https://{AWS_CLOUDFRONT_DOMAIN}/{s3_key}"
-    elif STORAGE_PROVIDER == 'b2':
-        final_url = f"https://cdn.kd-evolution.com/file/{AWS_S3_BUCKET}/{s3_key}"
-    else:
-        final_url = f"https://{AWS_S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+    final_url = get_s3_public_url(s3_key)
 
     return jsonify({
         'success': True,
@@ -5402,24 +6062,13 @@ def get_presigned_upload_url():
     })
 
 
-@app.route('/admin/s3-upload-complete', methods=['POST'])
-@admin_required
-def s3_upload_complete():
-    """Called after direct S3 upload completes to create database entry."""
-    data = request.get_json()
-    video_id = data.get('video_id')
-    s3_key = data.get('s3_key')
-    final_url = data.get('final_url')
-    filename = data.get('filename', '')
-    title = data.get('title', '')
-    category = data.get('category', 'uncategorized')
-    subcategory = data.get('subcategory', '')
-    event = data.get('event', '')
-    needs_conversion = data.get('needs_conversion', False)
-
-    if not video_id or not final_url:
-        return jsonify({'error': 'Missing required fields'}), 400
+def register_s3_upload(video_id, s3_key, final_url, filename, title='', category='uncategorized',
+                       subcategory='', event='', needs_conversion=False, session_id=None):
+    """Create the database entry for a video already uploaded to S3.
 
+    Videos that need conversion are handed to background_convert_s3_video;
+    everything else is saved immediately. Returns the JSON payload for the client.
+    """
     # Auto-detect category from filename if uncategorized
     category_auto = False
     if category == 'uncategorized' or not category:
@@ -5458,7 +6107,6 @@ def s3_upload_complete():
     if needs_conversion:
         # Create conversion job
         job_id = str(uuid.uuid4())[:8]
-        session_id = session.get('_id', request.remote_addr)
 
         with conversion_lock:
             conversion_jobs[job_id] = {
@@ -5481,155 +6129,625 @@ def s3_upload_complete():
         thread.daemon = True
         thread.start()
 
-        return jsonify({
+        return {
             'success': True,
             'converting': True,
             'job_id': job_id,
             'video_id': video_id,
             'message': 'Video uploaded - conversion started'
-        })
+        }
 
     # No conversion needed - save directly
     save_video(video_data)
 
-    return jsonify({
+    return {
         'success': True,
         'video_id': video_id,
         'message': 'Video saved successfully'
-    })
+    }
 
 
-@app.route('/admin/migrate-to-s3', methods=['POST'])
+@app.route('/admin/s3-upload-complete', methods=['POST'])
 @admin_required
-def migrate_to_s3():
-    """Migrate existing videos to AWS S3."""
-    if not USE_S3:
-        return jsonify({'error': 'S3 is not configured'}), 400
-
-    import requests
-    import socket
-
-    videos = get_all_videos()
+def s3_upload_complete():
+    """Called after direct S3 upload completes to create database entry."""
+    data = request.get_json()
+    video_id = data.get('video_id')
+    final_url = data.get('final_url')
 
-    # Filter videos that need migration (not already on S3, have a valid URL)
-    to_migrate = []
-    for v in videos:
-        video_type = v.get('video_type', 'url')
-        url = v.get('url', '')
+    if not video_id or not final_url:
+        return jsonify({'error': 'Missing required fields'}), 400
 
-        # Skip if already on S3
-        if video_type == 's3':
-            continue
+    return jsonify(register_s3_upload(
+        video_id, data.get('s3_key'), final_url,
+        filename=data.get('filename', ''),
+        title=data.get('title', ''),
+        category=data.get('category', 'uncategorized'),
+        subcategory=data.get('subcategory', ''),
+        event=data.get('event', ''),
+        needs_conversion=data.get('needs_conversion', False),
+        session_id=session.get('_id', request.remote_addr)
+    ))
+
+
+# Browser-to-S3 multipart uploads. The server only creates the upload, signs
+# part URLs and completes it; video bytes go straight from the browser to the
+# bucket. Upload state lives in Redis (mpu:<video_id>) so any gunicorn worker
+# can serve any step and an upload can be resumed after a page reload.
+MULTIPART_PART_SIZE = max(5, int(os.environ.get('MULTIPART_PART_SIZE_MB', '16'))) * 1024 * 1024
+MULTIPART_UPLOAD_TTL = int(os.environ.get('MULTIPART_UPLOAD_TTL', str(48 * 3600)))
+MULTIPART_SIGN_EXPIRES = int(os.environ.get('MULTIPART_SIGN_EXPIRES', '3600'))
+MULTIPART_MAX_PARTS = 10000
+multipart_uploads = {}  # In-memory fallback when Redis is unavailable
+
+
+def get_multipart_state(video_id):
+    """Load multipart upload state from Redis (or the in-memory fallback)."""
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            data = redis_client.get(f'mpu:{video_id}')
+            return json.loads(data) if data else None
+        except Exception as e:
+            print(f"[MULTIPART] Redis get error: {e}", flush=True)
+    return multipart_uploads.get(video_id)
 
-        # Skip if already pointing to our S3 bucket
-        if AWS_S3_BUCKET and AWS_S3_BUCKET in url:
-            continue
 
-        # Skip local files and invalid URLs
-        if video_type == 'local' or not url or not url.startswith('http'):
-            continue
+def save_multipart_state(state):
+    """Persist multipart upload state with a TTL so abandoned uploads expire."""
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.set(f"mpu:{state['video_id']}", json.dumps(state), ex=MULTIPART_UPLOAD_TTL)
+            return
+        except Exception as e:
+            print(f"[MULTIPART] Redis set error: {e}", flush=True)
+    multipart_uploads[state['video_id']] = state
 
-        to_migrate.append(v)
 
-    if not to_migrate:
-        return jsonify({'success': True, 'message': 'No videos to migrate', 'migrated': 0, 'failed': 0})
+def delete_multipart_state(video_id):
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.delete(f'mpu:{video_id}')
+        except Exception as e:
+            print(f"[MULTIPART] Redis delete error: {e}", flush=True)
+    multipart_uploads.pop(video_id, None)
 
-    migrated = 0
-    failed = 0
-    errors = []
 
-    # Set a shorter timeout for downloads
-    old_timeout = socket.getdefaulttimeout()
-    socket.setdefaulttimeout(30)
+def list_multipart_parts(state):
+    """Return the parts S3 has received for an upload as {part_number: {etag, size}}."""
+    parts = {}
+    kwargs = {'Bucket': AWS_S3_BUCKET, 'Key': state['s3_key'], 'UploadId': state['upload_id']}
+    while True:
+        resp = s3_client.list_parts(**kwargs)
+        for p in resp.get('Parts', []):
+            parts[p['PartNumber']] = {'etag': p['ETag'], 'size': p['Size']}
+        if not resp.get('IsTruncated'):
+            break
+        kwargs['PartNumberMarker'] = resp['NextPartNumberMarker']
+    return parts
 
-    try:
-        for video in to_migrate:
-            video_id = video.get('id')
-            url = video.get('url', '')
-            title = video.get('title', '')
-            category = video.get('category', 'uncategorized')
-            subcategory = video.get('subcategory', '')
 
-            try:
-                # Download video from URL
-                print(f"[S3 MIGRATE] Downloading: {title} ({video_id})")
+def expected_part_size(state, part_number):
+    if part_number < state['total_parts']:
+        return state['part_size']
+    return state['size'] - state['part_size'] * (state['total_parts'] - 1)
 
-                # Skip streaming service URLs that can't be downloaded
-                if 'vimeo.com' in url or 'youtube.com' in url or 'youtu.be' in url:
-                    errors.append(f"{title}: Streaming service videos cannot be migrated")
-                    failed += 1
-                    continue
 
-                # Download the video
-                response = requests.get(download_url, timeout=60, stream=True)
-                response.raise_for_status()
+@app.route('/admin/multipart/create', methods=['POST'])
+@admin_required
+def multipart_create():
+    """Start a multipart upload and return the part layout for the browser."""
+    if not USE_S3 or not s3_client:
+        return jsonify({'error': 'S3 is not configured'}), 400
 
-                # Check content type
-                content_type = response.headers.get('Content-Type', 'video/mp4')
-                if 'video' not in content_type and 'octet-stream' not in content_type:
-                    errors.append(f"{title}: Not a video file (content-type: {content_type})")
-                    failed += 1
-                    continue
+    data = request.get_json() or {}
+    filename = data.get('filename', '')
+    size = int(data.get('size') or 0)
+    content_type = data.get('content_type') or 'video/mp4'
 
-                # Read file data
-                file_data = response.content
-
-                # Determine file extension
-                ext = '.mp4'
-                if 'webm' in content_type:
-                    ext = '.webm'
-                elif 'quicktime' in content_type or 'mov' in url.lower():
-                    ext = '.mov'
-                elif '.mov' in url.lower():
-                    ext = '.mov'
-                elif '.webm' in url.lower():
-                    ext = '.webm'
-
-                # Create S3 filename
-                s3_filename = f"{video_id}{ext}"
-                s3_folder = f"{category}/{subcategory}" if subcategory else category
-
-                # Upload to S3
-                print(f"[S3 MIGRATE] Uploading to S3: {s3_folder}/{s3_filename}")
-                new_url = upload_to_s3(file_data, s3_filename, content_type if 'video' in content_type else 'video/mp4', s3_folder)
-
-                if not new_url:
-                    errors.append(f"{title}: S3 upload failed")
-                    failed += 1
-                    continue
+    if not filename or size <= 0:
+        return jsonify({'error': 'Filename and size are required'}), 400
 
-                # Update database
-                video['url'] = new_url
-                video['video_type'] = 's3'
-                save_video(video)
+    # Grow the part size for very large files to stay under the S3 part limit
+    part_size = MULTIPART_PART_SIZE
+    while (size + part_size - 1) // part_size > MULTIPART_MAX_PARTS:
+        part_size *= 2
+    total_parts = max(1, (size + part_size - 1) // part_size)
 
-                print(f"[S3 MIGRATE] Success: {title}")
-                migrated += 1
+    video_id = str(uuid.uuid4())[:8]
+    ext = os.path.splitext(filename)[1].lower()
+    s3_key = f"videos/{video_id}{ext}"
 
-            except requests.exceptions.Timeout:
-                errors.append(f"{title}: Download timeout")
-                failed += 1
-            except requests.exceptions.RequestException as e:
-                errors.append(f"{title}: Download failed - {str(e)}")
-                failed += 1
-            except Exception as e:
-                errors.append(f"{title}: {str(e)}")
-                failed += 1
+    try:
+        resp = s3_client.create_multipart_upload(
+            Bucket=AWS_S3_BUCKET, Key=s3_key, ContentType=content_type,
+            CacheControl='public, max-age=31536000'
+        )
+    except Exception as e:
+        print(f"[MULTIPART] Create failed for {filename}: {e}", flush=True)
+        return jsonify({'error': f'Failed to start upload: {e}'}), 500
 
-    finally:
-        socket.setdefaulttimeout(old_timeout)
+    state = {
+        'video_id': video_id,
+        'upload_id': resp['UploadId'],
+        's3_key': s3_key,
+        'filename': filename,
+        'size': size,
+        'part_size': part_size,
+        'total_parts': total_parts,
+        'title': data.get('title', ''),
+        'category': data.get('category', ''),
+        'subcategory': data.get('subcategory', ''),
+        'event': data.get('event', ''),
+        'created_by': session.get('username'),
+        'created_at': datetime.now().isoformat()
+    }
+    save_multipart_state(state)
+    print(f"[MULTIPART] Started {s3_key} ({size / 1024 / 1024:.1f} MB, {total_parts} parts)", flush=True)
 
     return jsonify({
         'success': True,
-        'message': f'Migration complete: {migrated} migrated, {failed} failed',
-        'migrated': migrated,
-        'failed': failed,
-        'total': len(to_migrate),
-        'errors': errors[:20]  # Limit errors returned
+        'video_id': video_id,
+        's3_key': s3_key,
+        'part_size': part_size,
+        'total_parts': total_parts
     })
 
 
-@app.route('/admin/scan-durations', methods=['POST'])
+@app.route('/admin/multipart/sign-parts', methods=['POST'])
+@admin_required
+def multipart_sign_parts():
+    """Return presigned PUT URLs for a batch of part numbers."""
+    data = request.get_json() or {}
+    state = get_multipart_state(data.get('video_id', ''))
+    if not state:
+        return jsonify({'error': 'Upload not found or expired'}), 404
+
+    urls = {}
+    for n in data.get('part_numbers', []):
+        n = int(n)
+        if n < 1 or n > state['total_parts']:
+            return jsonify({'error': f'Invalid part number {n}'}), 400
+        urls[n] = s3_client.generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': AWS_S3_BUCKET, 'Key': state['s3_key'],
+                    'UploadId': state['upload_id'], 'PartNumber': n},
+            ExpiresIn=MULTIPART_SIGN_EXPIRES
+        )
+
+    # Touch the state so active uploads don't expire mid-transfer
+    save_multipart_state(state)
+    return jsonify({'success': True, 'urls': urls})
+
+
+@app.route('/admin/multipart/status/<video_id>')
+@admin_required
+def multipart_status(video_id):
+    """Report which parts S3 already has so the browser can resume an upload."""
+    state = get_multipart_state(video_id)
+    if not state:
+        return jsonify({'error': 'Upload not found or expired'}), 404
+
+    try:
+        parts = list_multipart_parts(state)
+    except Exception as e:
+        # The upload was completed or aborted on the S3 side
+        print(f"[MULTIPART] list_parts failed for {video_id}: {e}", flush=True)
+        delete_multipart_state(video_id)
+        return jsonify({'error': 'Upload no longer exists'}), 404
+
+    done = sorted(n for n, p in parts.items() if p['size'] == expected_part_size(state, n))
+    return jsonify({
+        'success': True,
+        'video_id': video_id,
+        'filename': state['filename'],
+        'size': state['size'],
+        'part_size': state['part_size'],
+        'total_parts': state['total_parts'],
+        'completed_parts': done,
+        'uploaded_bytes': sum(parts[n]['size'] for n in done)
+    })
+
+
+@app.route('/admin/multipart/complete', methods=['POST'])
+@admin_required
+def multipart_complete():
+    """Complete the multipart upload and queue post-processing."""
+    data = request.get_json() or {}
+    video_id = data.get('video_id', '')
+    state = get_multipart_state(video_id)
+    if not state:
+        return jsonify({'error': 'Upload not found or expired'}), 404
+
+    try:
+        # ETags come from S3 rather than the browser (B2 CORS may hide the header)
+        parts = list_multipart_parts(state)
+        missing = [n for n in range(1, state['total_parts'] + 1)
+                   if n not in parts or parts[n]['size'] != expected_part_size(state, n)]
+        if missing:
+            return jsonify({'error': 'Upload incomplete', 'missing_parts': missing[:50]}), 409
+
+        s3_client.complete_multipart_upload(
+            Bucket=AWS_S3_BUCKET, Key=state['s3_key'], UploadId=state['upload_id'],
+            MultipartUpload={'Parts': [{'PartNumber': n, 'ETag': parts[n]['etag']}
+                                       for n in range(1, state['total_parts'] + 1)]}
+        )
+    except Exception as e:
+        print(f"[MULTIPART] Complete failed for {video_id}: {e}", flush=True)
+        return jsonify({'error': f'Failed to complete upload: {e}'}), 500
+
+    delete_multipart_state(video_id)
+    print(f"[MULTIPART] Completed {state['s3_key']}", flush=True)
+
+    ext = os.path.splitext(state['filename'])[1].lower()
+    return jsonify(register_s3_upload(
+        video_id, state['s3_key'], get_s3_public_url(state['s3_key']),
+        filename=state['filename'],
+        title=state['title'],
+        category=state['category'] or 'uncategorized',
+        subcategory=state['subcategory'],
+        event=state['event'],
+        needs_conversion=ext in CONVERSION_FORMATS,
+        session_id=session.get('_id', request.remote_addr)
+    ))
+
+
+@app.route('/admin/multipart/abort', methods=['POST'])
+@admin_required
+def multipart_abort():
+    """Abort a multipart upload and discard its uploaded parts."""
+    data = request.get_json() or {}
+    video_id = data.get('video_id', '')
+    state = get_multipart_state(video_id)
+    if not state:
+        return jsonify({'success': True})
+
+    try:
+        s3_client.abort_multipart_upload(
+            Bucket=AWS_S3_BUCKET, Key=state['s3_key'], UploadId=state['upload_id']
+        )
+    except Exception as e:
+        print(f"[MULTIPART] Abort failed for {video_id}: {e}", flush=True)
+    delete_multipart_state(video_id)
+    return jsonify({'success': True})
+
+
+# Background migration of external videos (Dropbox links etc.) into the bucket.
+# Each transfer pipes the source response straight into a multipart upload, so
+# nothing is written to local disk. Per-video results are checkpointed in Redis
+# (migrate:checkpoint) so a restarted run skips videos that already finished.
+MIGRATE_CONCURRENCY = max(1, int(os.environ.get('MIGRATE_CONCURRENCY', '4')))
+MIGRATE_TIMEOUT = int(os.environ.get('MIGRATE_TIMEOUT', '60'))  # Socket timeout per source request
+MIGRATE_CHECKPOINT_KEY = 'migrate:checkpoint'
+MIGRATE_STATUS_KEY = 'migrate:status'
+MIGRATE_LOCK_KEY = 'migrate:lock'
+MIGRATE_LOCK_TTL = 60  # Seconds; the running migration refreshes the lock every third of this
+MIGRATE_LOCK_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+migration_checkpoints = {}  # In-memory fallback when Redis is unavailable
+migration_lock = threading.Lock()
+migration_status = {
+    'running': False,
+    'total': 0,
+    'migrated': 0,
+    'failed': 0,
+    'skipped': 0,
+    'bytes': 0,
+    'throughput_mbps': 0,
+    'started_at': None,
+    'finished_at': None,
+    'current': {},
+    'errors': []
+}
+
+
+# KEYS: lock. ARGV: owner, ttl. Refreshes the lock only while this worker holds it.
+_MIGRATE_LUA_REFRESH = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: lock. ARGV: owner. Releases the lock only if this worker holds it.
+_MIGRATE_LUA_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_migrate_scripts = {}
+if REDIS_AVAILABLE and redis_client:
+    _migrate_scripts = {
+        'refresh': redis_client.register_script(_MIGRATE_LUA_REFRESH),
+        'release': redis_client.register_script(_MIGRATE_LUA_RELEASE),
+    }
+
+
+def acquire_migration_lock():
+    """Take the cross-worker migration lock. Without Redis only the local running flag guards."""
+    if not (REDIS_AVAILABLE and redis_client):
+        return True
+    try:
+        return bool(redis_client.set(MIGRATE_LOCK_KEY, MIGRATE_LOCK_OWNER, nx=True, ex=MIGRATE_LOCK_TTL))
+    except Exception as e:
+        print(f"[S3 MIGRATE] Redis lock error: {e}", flush=True)
+        return True
+
+
+def release_migration_lock():
+    if _migrate_scripts:
+        try:
+            _migrate_scripts['release'](keys=[MIGRATE_LOCK_KEY], args=[MIGRATE_LOCK_OWNER])
+        except Exception as e:
+            print(f"[S3 MIGRATE] Redis lock release error: {e}", flush=True)
+
+
+def refresh_migration_lock(stop):
+    """Keep the migration lock alive until stop is set (runs in its own thread)."""
+    while not stop.wait(MIGRATE_LOCK_TTL / 3):
+        try:
+            if not _migrate_scripts['refresh'](keys=[MIGRATE_LOCK_KEY], args=[MIGRATE_LOCK_OWNER, MIGRATE_LOCK_TTL]):
+                print("[S3 MIGRATE] Lost the migration lock", flush=True)
+        except Exception as e:
+            print(f"[S3 MIGRATE] Redis lock refresh error: {e}", flush=True)
+
+
+def get_migration_checkpoints():
+    """Return {video_id: checkpoint} for every video the migration has touched."""
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            return {vid: json.loads(data) for vid, data in redis_client.hgetall(MIGRATE_CHECKPOINT_KEY).items()}
+        except Exception as e:
+            print(f"[S3 MIGRATE] Redis checkpoint read error: {e}", flush=True)
+    return dict(migration_checkpoints)
+
+
+def save_migration_checkpoint(video_id, state, **fields):
+    checkpoint = {'state': state, 'updated_at': datetime.now().isoformat(), **fields}
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.hset(MIGRATE_CHECKPOINT_KEY, video_id, json.dumps(checkpoint))
+            return
+        except Exception as e:
+            print(f"[S3 MIGRATE] Redis checkpoint write error: {e}", flush=True)
+    migration_checkpoints[video_id] = checkpoint
+
+
+def publish_migration_status():
+    """Share progress through Redis so the status poll works on any worker."""
+    with migration_lock:
+        elapsed = time.time() - migration_status['started_at'] if migration_status['started_at'] else 0
+        if elapsed > 0:
+            migration_status['throughput_mbps'] = round(migration_status['bytes'] * 8 / elapsed / 1_000_000, 1)
+        snapshot = json.loads(json.dumps(migration_status))
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.set(MIGRATE_STATUS_KEY, json.dumps(snapshot), ex=24 * 3600)
+        except Exception as e:
+            print(f"[S3 MIGRATE] Redis status write error: {e}", flush=True)
+    return snapshot
+
+
+def get_migration_status():
+    if not migration_status['running'] and REDIS_AVAILABLE and redis_client:
+        try:
+            data = redis_client.get(MIGRATE_STATUS_KEY)
+            if data:
+                return json.loads(data)
+        except Exception as e:
+            print(f"[S3 MIGRATE] Redis status read error: {e}", flush=True)
+    return publish_migration_status()
+
+
+def find_videos_to_migrate():
+    """Videos with an external http(s) URL that are not in our bucket yet."""
+    to_migrate = []
+    for v in get_all_videos():
+        video_type = v.get('video_type', 'url')
+        url = v.get('url', '')
+
+        # Skip if already on S3
+        if video_type == 's3':
+            continue
+
+        # Skip if already pointing to our S3 bucket
+        if AWS_S3_BUCKET and AWS_S3_BUCKET in url:
+            continue
+
+        # Skip local files and invalid URLs
+        if video_type == 'local' or not url or not url.startswith('http'):
+            continue
+
+        to_migrate.append(v)
+    return to_migrate
+
+
+def migration_extension(content_type, url):
+    url = url.lower()
+    if 'webm' in content_type or '.webm' in url:
+        return '.webm'
+    if 'quicktime' in content_type or '.mov' in url:
+        return '.mov'
+    return '.mp4'
+
+
+def migrate_video_to_s3(video, checkpoint=None):
+    """Stream one video from its source URL into the bucket and repoint it.
+
+    Returns the new URL. Raises on any failure.
+    """
+    video_id = video['id']
+    url = video.get('url', '')
+
+    if 'vimeo.com' in url or 'youtube.com' in url or 'youtu.be' in url:
+        raise ValueError('Streaming service videos cannot be migrated')
+
+    # Uploaded on a previous run but the database update did not happen
+    if checkpoint and checkpoint.get('state') == 'uploaded' and checkpoint.get('url'):
+        new_url = checkpoint['url']
+    else:
+        download_url = convert_dropbox_url_for_streaming(url)
+        req = urllib.request.Request(download_url, headers={'User-Agent': USER_AGENT})
+        with urllib.request.urlopen(req, timeout=MIGRATE_TIMEOUT) as resp:
+            content_type = resp.headers.get('Content-Type', '') or 'video/mp4'
+            if 'video' not in content_type and 'octet-stream' not in content_type:
+                raise ValueError(f'Not a video file (content-type: {content_type})')
+            expected = resp.headers.get('Content-Length')
+
+            category = video.get('category', 'uncategorized')
+            subcategory = video.get('subcategory', '')
+            s3_folder = f"{category}/{subcategory}" if subcategory else category
+            s3_key = f"{s3_folder}/{video_id}{migration_extension(content_type, url)}"
+
+            reported = {'bytes': 0}
+
+            def on_progress(uploaded):
+                with migration_lock:
+                    migration_status['bytes'] += uploaded - reported['bytes']
+                    migration_status['current'][video_id] = uploaded
+                reported['bytes'] = uploaded
+
+            print(f"[S3 MIGRATE] Streaming {video.get('title', '')} ({video_id}) -> {s3_key}", flush=True)
+            save_migration_checkpoint(video_id, 'uploading', key=s3_key)
+            result = multipart_upload_fileobj(
+                s3_client, AWS_S3_BUCKET, s3_key, resp,
+                content_type if 'video' in content_type else 'video/mp4',
+                progress_callback=on_progress
+            )
+        if expected and int(expected) != result['size']:
+            raise IOError(f"short read: got {result['size']} of {expected} bytes")
+
+        new_url = get_s3_public_url(s3_key)
+        save_migration_checkpoint(video_id, 'uploaded', key=s3_key, url=new_url, size=result['size'])
+
+    video['url'] = new_url
+    video['video_type'] = 's3'
+    save_video(video)
+    save_migration_checkpoint(video_id, 'done', url=new_url)
+    return new_url
+
+
+def migrate_to_s3_background(videos, checkpoints):
+    """Run the migration with MIGRATE_CONCURRENCY transfers in flight."""
+    pending = list(videos)
+    stop_refresh = threading.Event()
+    if _migrate_scripts:
+        threading.Thread(target=refresh_migration_lock, args=(stop_refresh,), daemon=True).start()
+
+    def worker():
+        while True:
+            with migration_lock:
+                if not pending:
+                    return
+                video = pending.pop(0)
+            video_id = video['id']
+            title = video.get('title', '')
+            try:
+                migrate_video_to_s3(video, checkpoints.get(video_id))
+                with migration_lock:
+                    migration_status['migrated'] += 1
+                print(f"[S3 MIGRATE] Success: {title}", flush=True)
+            except Exception as e:
+                save_migration_checkpoint(video_id, 'failed', error=str(e))
+                with migration_lock:
+                    migration_status['failed'] += 1
+                    migration_status['errors'] = (migration_status['errors'] + [f"{title}: {e}"])[-20:]
+                print(f"[S3 MIGRATE] Failed: {title}: {e}", flush=True)
+            finally:
+                with migration_lock:
+                    migration_status['current'].pop(video_id, None)
+                publish_migration_status()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(min(MIGRATE_CONCURRENCY, len(pending)))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with migration_lock:
+        migration_status['running'] = False
+        migration_status['finished_at'] = datetime.now().isoformat()
+    status = publish_migration_status()
+    stop_refresh.set()
+    release_migration_lock()
+    print(f"[S3 MIGRATE] Complete: {status['migrated']} migrated, {status['failed']} failed, "
+          f"{status['bytes'] / 1024 / 1024:.0f} MB at {status['throughput_mbps']} Mbit/s", flush=True)
+
+
+def start_migration_to_s3(limit=None):
+    """Start the background migration, resuming from the stored checkpoints."""
+    with migration_lock:
+        if migration_status['running']:
+            return {'error': 'Migration already running'}
+        if not acquire_migration_lock():
+            return {'error': 'Migration already running on another worker'}
+        migration_status['running'] = True
+
+    checkpoints = get_migration_checkpoints()
+    videos = find_videos_to_migrate()
+    # Videos checkpointed as done are already repointed and drop out of the
+    # list above; anything else (failed, interrupted) is tried again.
+    skipped = sum(1 for c in checkpoints.values() if c.get('state') == 'done')
+    if limit:
+        videos = videos[:limit]
+
+    with migration_lock:
+        migration_status.update({
+            'total': len(videos), 'migrated': 0, 'failed': 0, 'skipped': skipped,
+            'bytes': 0, 'throughput_mbps': 0, 'started_at': time.time(),
+            'finished_at': None, 'current': {}, 'errors': []
+        })
+        if not videos:
+            migration_status['running'] = False
+    publish_migration_status()
+    if not videos:
+        release_migration_lock()
+
+    if videos:
+        thread = threading.Thread(target=migrate_to_s3_background, args=(videos, checkpoints))
+        thread.daemon = True
+        thread.start()
+
+    return {'started': bool(videos), 'total': len(videos), 'skipped': skipped}
+
+
+@app.route('/admin/migrate-to-s3', methods=['POST'])
+@admin_required
+def migrate_to_s3():
+    """Start a background migration of external videos to S3/B2."""
+    if not USE_S3 or not s3_client:
+        return jsonify({'error': 'S3 is not configured'}), 400
+
+    data = request.get_json(silent=True) or {}
+    limit = data.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limit must be an integer'}), 400
+        if limit < 1:
+            return jsonify({'error': 'limit must be at least 1'}), 400
+    result = start_migration_to_s3(limit=limit)
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 400
+    if not result['started']:
+        return jsonify({'success': True, 'message': 'No videos to migrate', **result})
+    return jsonify({
+        'success': True,
+        'message': f"Migration started for {result['total']} videos",
+        'background': True,
+        **result
+    })
+
+
+@app.route('/admin/migrate-to-s3/status')
+@admin_required
+def migrate_to_s3_status():
+    """Progress and throughput of the background migration."""
+    return jsonify(get_migration_status())
+
+
+@app.route('/admin/scan-durations', methods=['POST'])
 @admin_required
 def scan_video_durations():
     """Start background scan of all videos to update their durations."""
@@ -5648,7 +6766,7 @@ def scan_video_durations():
 @admin_required
 def scan_video_durations_status():
     """Get status of background duration scan."""
-    return jsonify(duration_scan_status)
+    return jsonify(get_backfill_status('durations'))
 
 
 @app.route('/admin/import-folder', methods=['POST'])
@@ -5781,143 +6899,262 @@ def import_folder():
     })
 
 
-@app.route('/admin/auto-categorize', methods=['POST'])
-@admin_required
-def auto_categorize_videos():
-    """Auto-categorize uncategorized videos based on their filenames."""
-    data = request.json or {}
-    only_uncategorized = data.get('only_uncategorized', True)
-    admin_pin = data.get('admin_pin', '')
+# Batch auto-categorization. Videos are classified in chunks against the
+# precompiled detection rules, producing a diff that can be previewed and is
+# applied with a single UPDATE ... FROM (VALUES ...) statement. Progress is
+# shared through Redis (auto_categorize:status) so any worker can report it.
+AUTO_CATEGORIZE_CHUNK = int(os.environ.get('AUTO_CATEGORIZE_CHUNK', '500'))
+AUTO_CATEGORIZE_STATUS_KEY = 'auto_categorize:status'
+AUTO_CATEGORIZE_STALE = 300  # A running status not updated for this long belongs to a dead worker
+auto_categorize_lock = threading.Lock()
+auto_categorize_status = {
+    'running': False,
+    'phase': '',
+    'total': 0,
+    'current': 0,
+    'updated': 0,
+    'skipped': 0,
+    'skipped_manual': 0,
+    'message': '',
+    'error': None
+}
 
-    # Require PIN to process ALL files (not just uncategorized)
-    if not only_uncategorized:
-        if admin_pin != ADMIN_PIN:
-            return jsonify({'error': 'Invalid admin PIN. Required for processing all files.'}), 403
 
-    videos = get_all_videos()
-    updated = 0
-    skipped = 0
-    skipped_manual = 0
-    details = []
+def publish_auto_categorize_status(**updates):
+    """Update this worker's status and share it through Redis."""
+    with auto_categorize_lock:
+        auto_categorize_status.update(updates, updated_at=time.time())
+        snapshot = dict(auto_categorize_status)
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.set(AUTO_CATEGORIZE_STATUS_KEY, json.dumps(snapshot), ex=24 * 3600)
+        except Exception as e:
+            print(f"[AUTO-CATEGORIZE] Redis status write error: {e}", flush=True)
+    return snapshot
 
-    for video in videos:
-        current_cat = video.get('category', 'uncategorized')
-        is_uncategorized = current_cat in ('uncategorized', '', None)
-        was_auto_categorized = video.get('category_auto', True)  # Default True for backwards compat
-
-        # Skip logic:
-        # - If only_uncategorized: skip anything that's not uncategorized
-        # - If processing all: skip manually categorized videos (category_auto = False)
-        if only_uncategorized:
-            if not is_uncategorized:
-                continue
-        else:
-            # Processing all files - but skip manually categorized ones
-            if not is_uncategorized and not was_auto_categorized:
-                skipped_manual += 1
-                continue
 
-        # Get filename from title or local_file
-        filename = video.get('local_file') or video.get('title') or ''
+def get_auto_categorize_status():
+    if not auto_categorize_status['running'] and REDIS_AVAILABLE and redis_client:
+        try:
+            data = redis_client.get(AUTO_CATEGORIZE_STATUS_KEY)
+            if data:
+                status = json.loads(data)
+                if status.get('running') and time.time() - status.get('updated_at', 0) > AUTO_CATEGORIZE_STALE:
+                    status.update(running=False, phase='done', error='Worker stopped mid-run')
+                return status
+        except Exception as e:
+            print(f"[AUTO-CATEGORIZE] Redis status read error: {e}", flush=True)
+    return dict(auto_categorize_status)
 
-        if not filename:
-            skipped += 1
-            continue
 
-        # Detect category, subcategory, and event
-        detected_cat, detected_sub, detected_event = detect_category_from_filename(filename)
+def classify_video_category(video, only_uncategorized=True):
+    """Work out the auto-categorize changes for one video.
+
+    Returns (outcome, changes, change_desc) where outcome is one of 'changed',
+    'unchanged', 'undetected', 'manual' (manually categorized, preserved) or
+    'excluded' (outside the requested scope).
+    """
+    current_cat = video.get('category', 'uncategorized')
+    is_uncategorized = current_cat in ('uncategorized', '', None)
+    was_auto_categorized = video.get('category_auto', True)  # Default True for backwards compat
+
+    # Skip logic:
+    # - If only_uncategorized: skip anything that's not uncategorized
+    # - If processing all: skip manually categorized videos (category_auto = False)
+    if only_uncategorized:
+        if not is_uncategorized:
+            return 'excluded', {}, []
+    elif not is_uncategorized and not was_auto_categorized:
+        return 'manual', {}, []
 
-        # Also try the title if local_file didn't give results
-        if not detected_cat and video.get('title'):
-            detected_cat, detected_sub, detected_event = detect_category_from_filename(video.get('title'))
+    # Get filename from title or local_file
+    filename = video.get('local_file') or video.get('title') or ''
+    if not filename:
+        return 'undetected', {}, []
 
-        changes = {}
-        change_desc = []
+    # Detect category, subcategory, and event
+    detected_cat, detected_sub, detected_event = detect_category_from_filename(filename)
 
-        # Update category if detected and different
-        if detected_cat and detected_cat in CATEGORIES:
-            if is_uncategorized or (not only_uncategorized and was_auto_categorized):
-                if detected_cat != current_cat:
-                    changes['category'] = detected_cat
-                    changes['category_auto'] = True  # Mark as auto-categorized
-                    change_desc.append(f"category: {current_cat} → {detected_cat}")
-
-        # Update subcategory if detected and not already set
-        if detected_sub and not video.get('subcategory'):
-            changes['subcategory'] = detected_sub
-            change_desc.append(f"subcategory: {detected_sub}")
-
-        # Update event if detected and not already set
-        if detected_event and not video.get('event'):
-            changes['event'] = detected_event
-            change_desc.append(f"event: {detected_event}")
-
-        if changes:
-            # Update the video
-            video_id = video.get('id')
-            supabase.table('videos').update(changes).eq('id', video_id).execute()
-            updated += 1
-            details.append({
-                'id': video_id,
-                'title': video.get('title', filename),
-                'changes': change_desc
-            })
-        else:
-            skipped += 1
+    # Also try the title if local_file didn't give results
+    if not detected_cat and video.get('title') and video.get('title') != filename:
+        detected_cat, detected_sub, detected_event = detect_category_from_filename(video.get('title'))
+
+    changes = {}
+    change_desc = []
 
+    # Update category if detected and different
+    if detected_cat and detected_cat in CATEGORIES:
+        if detected_cat != current_cat:
+            changes['category'] = detected_cat
+            changes['category_auto'] = True  # Mark as auto-categorized
+            change_desc.append(f"category: {current_cat} → {detected_cat}")
+
+    # Update subcategory if detected and not already set
+    if detected_sub and not video.get('subcategory'):
+        changes['subcategory'] = detected_sub
+        change_desc.append(f"subcategory: {detected_sub}")
+
+    # Update event if detected and not already set
+    if detected_event and not video.get('event'):
+        changes['event'] = detected_event
+        change_desc.append(f"event: {detected_event}")
+
+    if changes:
+        return 'changed', changes, change_desc
+    return ('undetected' if not detected_cat else 'unchanged'), {}, []
+
+
+def plan_auto_categorize(videos, only_uncategorized=True, progress_callback=None):
+    """Classify videos in chunks and return the diff without writing anything."""
+    plan = {'changes': [], 'skipped': 0, 'skipped_manual': 0, 'undetected': []}
+
+    for start in range(0, len(videos), AUTO_CATEGORIZE_CHUNK):
+        for video in videos[start:start + AUTO_CATEGORIZE_CHUNK]:
+            outcome, changes, change_desc = classify_video_category(video, only_uncategorized)
+            if outcome == 'changed':
+                plan['changes'].append({
+                    'id': video.get('id'),
+                    'title': video.get('title', ''),
+                    'set': changes,
+                    'changes': change_desc
+                })
+            elif outcome == 'manual':
+                plan['skipped_manual'] += 1
+            elif outcome != 'excluded':
+                plan['skipped'] += 1
+
+            # Uncategorized videos no rule could place, for the preview
+            filename = video.get('local_file') or video.get('title') or ''
+            if (filename and outcome in ('changed', 'undetected') and 'category' not in changes
+                    and video.get('category', 'uncategorized') in ('uncategorized', '', None)):
+                plan['undetected'].append({
+                    'id': video.get('id'),
+                    'title': video.get('title', ''),
+                    'filename': filename,
+                    'current_category': video.get('category', 'uncategorized')
+                })
+        if progress_callback:
+            progress_callback(min(start + AUTO_CATEGORIZE_CHUNK, len(videos)))
+
+    return plan
+
+
+def apply_auto_categorize_plan(plan):
+    """Write the planned changes with one set-based UPDATE. Returns rows updated."""
+    if not plan['changes']:
+        return 0
+    rows = [{
+        'id': change['id'],
+        'category': change['set'].get('category'),
+        'category_auto': change['set'].get('category_auto'),
+        'subcategory': change['set'].get('subcategory'),
+        'event': change['set'].get('event')
+    } for change in plan['changes']]
+    result = supabase.table('videos').update_many(rows, types={'category_auto': 'boolean'}).execute()
+    return len(result.data)
+
+
+def auto_categorize_message(updated, skipped, skipped_manual):
     msg = f"Updated {updated} video(s), skipped {skipped}"
     if skipped_manual > 0:
         msg += f", preserved {skipped_manual} manually categorized"
+    return msg
 
-    return jsonify({
-        'success': True,
-        'message': msg,
-        'updated': updated,
-        'skipped': skipped,
-        'skipped_manual': skipped_manual,
-        'details': details[:50]  # Limit details to first 50
-    })
 
+def auto_categorize_background(only_uncategorized):
+    """Re-categorize the library in the background, reporting progress."""
+    try:
+        publish_auto_categorize_status(phase='loading')
+        videos = get_all_videos()
+        publish_auto_categorize_status(phase='classifying', total=len(videos))
+
+        plan = plan_auto_categorize(videos, only_uncategorized,
+                                    progress_callback=lambda done: publish_auto_categorize_status(current=done))
 
-@app.route('/admin/auto-categorize-preview', methods=['GET'])
+        publish_auto_categorize_status(phase='writing')
+        updated = apply_auto_categorize_plan(plan)
+        message = auto_categorize_message(updated, plan['skipped'], plan['skipped_manual'])
+        publish_auto_categorize_status(updated=updated, skipped=plan['skipped'],
+                                       skipped_manual=plan['skipped_manual'], message=message)
+        print(f"[AUTO-CATEGORIZE] {message}", flush=True)
+    except Exception as e:
+        publish_auto_categorize_status(error=str(e))
+        print(f"[AUTO-CATEGORIZE] Failed: {e}", flush=True)
+    finally:
+        publish_auto_categorize_status(phase='done', running=False)
+
+
+@app.route('/admin/auto-categorize', methods=['POST'])
 @admin_required
-def auto_categorize_preview():
-    """Preview which videos would be skipped by auto-categorize."""
-    videos = get_all_videos()
-    skipped_videos = []
+def auto_categorize_videos():
+    """Auto-categorize videos based on their filenames.
 
-    for video in videos:
-        current_cat = video.get('category', 'uncategorized')
-        is_uncategorized = current_cat in ('uncategorized', '', None)
+    With video_ids the selected videos are categorized immediately; otherwise
+    the whole library is processed as a background job (poll
+    /admin/auto-categorize/status).
+    """
+    data = request.json or {}
+    only_uncategorized = data.get('only_uncategorized', True)
+    admin_pin = data.get('admin_pin', '')
+    video_ids = data.get('video_ids')
 
-        if not is_uncategorized:
-            continue
+    # Require PIN to process ALL files (not just uncategorized)
+    if not only_uncategorized:
+        if admin_pin != ADMIN_PIN:
+            return jsonify({'error': 'Invalid admin PIN. Required for processing all files.'}), 403
 
-        filename = video.get('local_file') or video.get('title') or ''
-        if not filename:
-            continue
+    if video_ids:
+        videos = supabase.table('videos').select('*').in_('id', video_ids).execute().data or []
+        plan = plan_auto_categorize(videos, only_uncategorized)
+        updated = apply_auto_categorize_plan(plan)
+        return jsonify({
+            'success': True,
+            'message': auto_categorize_message(updated, plan['skipped'], plan['skipped_manual']),
+            'updated': updated,
+            'categorized': updated,
+            'skipped': plan['skipped'],
+            'skipped_manual': plan['skipped_manual'],
+            'details': [{'id': c['id'], 'title': c['title'], 'changes': c['changes']} for c in plan['changes'][:50]]
+        })
 
-        # Try to detect category
-        detected_cat, detected_sub, detected_event = detect_category_from_filename(filename)
+    if get_auto_categorize_status()['running']:
+        return jsonify({'success': False, 'error': 'Auto-categorize already running'}), 400
 
-        # Also try the title
-        if not detected_cat and video.get('title'):
-            detected_cat, detected_sub, detected_event = detect_category_from_filename(video.get('title'))
+    with auto_categorize_lock:
+        if auto_categorize_status['running']:
+            return jsonify({'success': False, 'error': 'Auto-categorize already running'}), 400
+        auto_categorize_status['running'] = True
+    publish_auto_categorize_status(phase='starting', total=0, current=0, updated=0,
+                                   skipped=0, skipped_manual=0, message='', error=None)
+    thread = threading.Thread(target=auto_categorize_background, args=(only_uncategorized,))
+    thread.daemon = True
+    thread.start()
 
-        # If no category detected, add to skipped list
-        if not detected_cat:
-            skipped_videos.append({
-                'id': video.get('id'),
-                'title': video.get('title', ''),
-                'filename': filename,
-                'current_category': current_cat
-            })
+    return jsonify({'success': True, 'message': 'Auto-categorize started', 'background': True})
+
+
+@app.route('/admin/auto-categorize/status')
+@admin_required
+def auto_categorize_status_route():
+    """Get status of the background auto-categorize job."""
+    return jsonify(get_auto_categorize_status())
+
+
+@app.route('/admin/auto-categorize-preview', methods=['GET'])
+@admin_required
+def auto_categorize_preview():
+    """Preview what auto-categorize would change, and which videos it can't categorize."""
+    only_uncategorized = request.args.get('only_uncategorized', 'true').lower() != 'false'
+    plan = plan_auto_categorize(get_all_videos(), only_uncategorized)
 
     return jsonify({
         'success': True,
-        'skipped_count': len(skipped_videos),
-        'skipped_videos': skipped_videos[:100],  # Limit to first 100
-        'total_skipped': len(skipped_videos)
+        'change_count': len(plan['changes']),
+        'changes': [{'id': c['id'], 'title': c['title'], 'changes': c['changes']} for c in plan['changes'][:100]],
+        'skipped_manual': plan['skipped_manual'],
+        'skipped_count': len(plan['undetected']),
+        'skipped_videos': plan['undetected'][:100],  # Limit to first 100
+        'total_skipped': len(plan['undetected'])
     })
 
 
@@ -5946,6 +7183,7 @@ def add_category_mapping():
     except Exception as e:
         # Table might not exist, try to provide helpful error
         return jsonify({'error': f'Could not save mapping: {str(e)}. Table may need to be created.'}), 500
+    bump_category_mappings_version()
     return jsonify({
         'success': True,
         'message': f'Added mapping: "{pattern}" → {category}/{subcategory or "none"}'
@@ -5970,6 +7208,7 @@ def get_category_mappings():
 def delete_category_mapping(pattern):
     """Delete a custom category mapping."""
     supabase.table('category_mappings').delete().eq('pattern', pattern).execute()
+    bump_category_mappings_version()
     return jsonify({'success': True, 'message': f'Deleted mapping for "{pattern}"'})
 
 
@@ -6637,36 +7876,106 @@ def learn_category_pattern(title, category, subcategory=None, event=None):
             except Exception as e:
                 print(f"Failed to save learned pattern: {e}")
 
+    if learned_count:
+        bump_category_mappings_version()
     return learned_count
 
 
-def match_learned_patterns(title):
-    """Match a video title against learned patterns.
+# Learned category mappings are compiled once into a prioritized matcher and
+# cached per worker. Any change to category_mappings bumps a shared version key
+# in Redis, and each worker rebuilds its matcher when it sees a new version.
+MAPPINGS_VERSION_KEY = 'category_mappings:version'
+MAPPINGS_VERSION_CHECK = 2  # Seconds between version checks
+MAPPINGS_LOCAL_TTL = int(os.environ.get('MAPPINGS_LOCAL_TTL', '60'))  # Rebuild interval without Redis
+TEMPLATE_FIELD_RE = re.compile(r'\{([A-Za-z]+)-([^}]+)\}')
+learned_matcher_cache = {'version': None, 'matcher': None, 'checked_at': 0, 'built_at': 0}
+learned_matcher_lock = threading.Lock()
 
-    Returns the best matching category info or None.
-    """
-    if not title:
-        return None
 
-    normalized = title.lower().strip()
+def bump_category_mappings_version():
+    """Mark the compiled matcher stale on every worker after a mapping change."""
+    learned_matcher_cache['matcher'] = None
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.incr(MAPPINGS_VERSION_KEY)
+        except Exception as e:
+            print(f"[PATTERNS] Redis version bump error: {e}", flush=True)
 
-    # Get all learned patterns
-    mappings = []
-    try:
-        result = supabase.table('category_mappings').select('*').execute()
-        mappings = result.data or []
-    except:
-        pass
 
-    if not mappings:
-        return None
+def get_category_mappings_version():
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            return redis_client.get(MAPPINGS_VERSION_KEY) or '0'
+        except Exception as e:
+            print(f"[PATTERNS] Redis version read error: {e}", flush=True)
+    return None
 
-    # Try to match patterns (prioritize by type: template > full > team > event > discipline)
-    pattern_priority = {'template': 5, 'full': 4, 'team': 3, 'event': 2, 'discipline': 1}
 
-    best_match = None
-    best_score = 0
-    extracted_fields = {}
+def template_to_regex(pattern):
+    """Turn a template like "{COMPETITION-nats}_{ROUND-3}" into (regex, field_names)."""
+    field_matches = list(TEMPLATE_FIELD_RE.finditer(pattern))
+    regex_pattern = pattern
+    field_names = []
+
+    for i, m in enumerate(field_matches):
+        abbrev = m.group(1)
+        example_value = m.group(2)
+        field_names.append(abbrev)
+
+        # Look at what comes after this field
+        end_pos = m.end()
+        next_char = pattern[end_pos] if end_pos < len(pattern) else ''
+
+        # Generate appropriate regex based on value type and context
+        if re.match(r'^\d+$', example_value):
+            value_regex = r'\d+'
+        elif re.match(r'^[A-Z]+$', example_value):
+            # Uppercase letters - use lookahead if followed by digit
+            if next_char.isdigit() or (i + 1 < len(field_matches) and re.match(r'^\d', field_matches[i+1].group(2))):
+                value_regex = r'[A-Z]+(?=\d)'
+            else:
+                value_regex = r'[A-Z]+'
+        elif re.match(r'^[a-z]+$', example_value):
+            value_regex = r'[a-z]+'
+        elif re.match(r'^[A-Za-z]+$', example_value):
+            value_regex = r'[A-Za-z]+'
+        elif re.match(r'^[A-Za-z0-9]+$', example_value):
+            value_regex = r'[A-Za-z0-9]+'
+        elif re.match(r'^[A-Za-z0-9-]+$', example_value):
+            value_regex = r'[A-Za-z0-9-]+'
+        else:
+            value_regex = r'.+?'
+
+        # Replace the placeholder with a capturing group
+        placeholder = '{' + abbrev + '-' + example_value + '}'
+        regex_pattern = regex_pattern.replace(placeholder, f'({value_regex})', 1)
+
+    # Make spaces flexible
+    return regex_pattern.replace(' ', r'\s+'), field_names
+
+
+def required_literal(text):
+    """Longest alphanumeric run that any match must contain, or '' if unknown.
+
+    Used as a cheap substring prefilter before running the full regex. Text
+    with regex operators outside placeholders gets no prefilter.
+    """
+    if re.search(r'[|?*+(){}\[\]\\^$]', text):
+        return ''
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    return max(words, key=len) if words else ''
+
+
+def compile_learned_matcher(mappings):
+    """Compile category_mappings rows into a matcher.
+
+    Entries are sorted by the match_learned_patterns score (templates first,
+    then full > team > event > discipline, longer patterns first), so the first
+    entry that matches is the best match.
+    """
+    pattern_priority = {'template': 5, 'full': 4, 'team': 3, 'event': 2, 'discipline': 1}
+    entries = []
+    substrings = []
 
     for mapping in mappings:
         pattern = mapping.get('pattern', '')
@@ -6678,88 +7987,98 @@ def match_learned_patterns(title):
         # Detect template patterns by their format (contains {X-...} placeholders)
         is_template = bool(re.search(r'\{[A-Za-z]+-', pattern))
 
-        # Handle template patterns differently
-        if is_template or pattern_type == 'template':
-            # Generate regex from template pattern on-the-fly
-            try:
-                # Extract field definitions from template with their positions
-                field_pattern = r'\{([A-Za-z]+)-([^}]+)\}'
-                fields = re.findall(field_pattern, pattern)
-
-                if fields:
-                    # Build regex by replacing each field with a capturing group
-                    regex_pattern = pattern
-                    field_names = []
-
-                    # Find all field matches with positions
-                    field_matches = list(re.finditer(field_pattern, pattern))
-
-                    for i, m in enumerate(field_matches):
-                        abbrev = m.group(1)
-                        example_value = m.group(2)
-                        field_names.append(abbrev)
-
-                        # Look at what comes after this field
-                        end_pos = m.end()
-                        next_char = pattern[end_pos] if end_pos < len(pattern) else ''
-
-                        # Generate appropriate regex based on value type and context
-                        if re.match(r'^\d+$', example_value):
-                            value_regex = r'\d+'
-                        elif re.match(r'^[A-Z]+$', example_value):
-                            # Uppercase letters - use lookahead if followed by digit
-                            if next_char.isdigit() or (i + 1 < len(field_matches) and re.match(r'^\d', field_matches[i+1].group(2))):
-                                value_regex = r'[A-Z]+(?=\d)'
-                            else:
-                                value_regex = r'[A-Z]+'
-                        elif re.match(r'^[a-z]+$', example_value):
-                            value_regex = r'[a-z]+'
-                        elif re.match(r'^[A-Za-z]+$', example_value):
-                            value_regex = r'[A-Za-z]+'
-                        elif re.match(r'^[A-Za-z0-9]+$', example_value):
-                            value_regex = r'[A-Za-z0-9]+'
-                        elif re.match(r'^[A-Za-z0-9-]+$', example_value):
-                            value_regex = r'[A-Za-z0-9-]+'
-                        else:
-                            value_regex = r'.+?'
-
-                        # Replace the placeholder with a capturing group
-                        placeholder = '{' + abbrev + '-' + example_value + '}'
-                        regex_pattern = regex_pattern.replace(placeholder, f'({value_regex})', 1)
-
-                    # Make spaces flexible
-                    regex_pattern = regex_pattern.replace(' ', r'\s+')
-
-                    match = re.match(regex_pattern, normalized, re.IGNORECASE)
-                    if match:
-                        score = 500 + len(pattern)  # High priority for templates
-                        if score > best_score:
-                            best_score = score
-                            best_match = mapping
-                            # Extract field values
-                            extracted_fields = {}
-                            for i, field_name in enumerate(field_names):
-                                try:
-                                    extracted_fields[field_name] = match.group(i + 1)
-                                except:
-                                    pass
-            except Exception as e:
-                continue
-        else:
-            # Convert pattern back to regex
-            regex_pattern = re.escape(pattern)
-            regex_pattern = regex_pattern.replace(r'\{N\}', r'\d+')
-            regex_pattern = regex_pattern.replace(r'\{YEAR\}', r'20\d{2}')
+        try:
+            if is_template or pattern_type == 'template':
+                regex_pattern, field_names = template_to_regex(pattern)
+                if not field_names:
+                    continue
+                entries.append({
+                    'score': 500 + len(pattern),  # High priority for templates
+                    'regex': re.compile(regex_pattern, re.IGNORECASE),
+                    'anchored': True,
+                    'literal': required_literal(TEMPLATE_FIELD_RE.sub(' ', pattern)),
+                    'fields': field_names,
+                    'mapping': mapping
+                })
+            else:
+                # Convert pattern back to regex
+                regex_pattern = re.escape(pattern)
+                regex_pattern = regex_pattern.replace(r'\{N\}', r'\d+')
+                regex_pattern = regex_pattern.replace(r'\{YEAR\}', r'20\d{2}')
+                entries.append({
+                    'score': pattern_priority.get(pattern_type, 0) * 10 + len(pattern),
+                    'regex': re.compile(regex_pattern, re.IGNORECASE),
+                    'anchored': False,
+                    'literal': max(re.split(r'\{N\}|\{YEAR\}', pattern), key=len).lower(),
+                    'fields': [],
+                    'mapping': mapping
+                })
+        except re.error:
+            continue
+
+        # Plain substring mappings used by detect_category_from_filename
+        lowered = pattern.lower()
+        if '{N}' not in pattern and '{YEAR}' not in pattern and not re.search(r'\{[a-z]+-', lowered):
+            substrings.append((lowered, mapping))
 
+    entries.sort(key=lambda e: -e['score'])
+    return {'entries': entries, 'substrings': substrings}
+
+
+def get_learned_matcher():
+    """Return the compiled matcher, rebuilding it if the mappings changed."""
+    cache = learned_matcher_cache
+    now = time.time()
+    if cache['matcher'] is not None and now - cache['checked_at'] < MAPPINGS_VERSION_CHECK:
+        return cache['matcher']
+
+    with learned_matcher_lock:
+        version = get_category_mappings_version()
+        stale = (cache['matcher'] is None or version != cache['version'] or
+                 (version is None and now - cache['built_at'] > MAPPINGS_LOCAL_TTL))
+        if stale:
+            mappings = []
             try:
-                if re.search(regex_pattern, normalized, re.IGNORECASE):
-                    score = pattern_priority.get(pattern_type, 0) * 10 + len(pattern)
-                    if score > best_score:
-                        best_score = score
-                        best_match = mapping
-                        extracted_fields = {}
-            except re.error:
-                continue
+                result = supabase.table('category_mappings').select('*').execute()
+                mappings = result.data or []
+            except:
+                pass
+            cache['matcher'] = compile_learned_matcher(mappings)
+            cache['version'] = version
+            cache['built_at'] = now
+        cache['checked_at'] = now
+        return cache['matcher']
+
+
+def match_learned_patterns(title):
+    """Match a video title against learned patterns.
+
+    Returns the best matching category info or None.
+    """
+    if not title:
+        return None
+
+    normalized = title.lower().strip()
+
+    best_match = None
+    extracted_fields = {}
+
+    for entry in get_learned_matcher()['entries']:
+        if entry['literal'] and entry['literal'] not in normalized:
+            continue
+        if entry['anchored']:
+            match = entry['regex'].match(normalized)
+        else:
+            match = entry['regex'].search(normalized)
+        if match:
+            best_match = entry['mapping']
+            # Extract field values
+            for i, field_name in enumerate(entry['fields']):
+                try:
+                    extracted_fields[field_name] = match.group(i + 1)
+                except:
+                    pass
+            break
 
     if best_match:
         result = {
@@ -7037,6 +8356,7 @@ def save_pattern_template(template, example, category, subcategory=None):
             supabase.table('category_mappings').update(mapping_data).eq('pattern', template).execute()
         else:
             supabase.table('category_mappings').insert(mapping_data).execute()
+        bump_category_mappings_version()
         return True, {'extracted': extracted, 'regex': regex_pattern}
     except Exception as e:
         return False, f"Database error: {e}"
@@ -7045,27 +8365,48 @@ def save_pattern_template(template, example, category, subcategory=None):
 
 
 def find_similar_uncategorized_videos(title, exclude_id=None):
-    """Find uncategorized videos with similar title patterns."""
+    """Find uncategorized videos with similar title patterns.
+
+    Uses the indexed title_pattern column, so rows written before it existed
+    need /admin/backfill-title-patterns to be found.
+    """
     pattern = extract_title_pattern(title)
     if not pattern or pattern == title.lower():
         return []
 
-    all_videos = get_all_videos()
-    similar = []
+    result = supabase.table('videos').select('*').eq('title_pattern', pattern).eq('category', 'uncategorized').execute()
+    return [v for v in (result.data or []) if not exclude_id or v.get('id') != exclude_id]
 
-    for video in all_videos:
-        # Skip if not uncategorized or is the same video
-        if video.get('category') != 'uncategorized':
-            continue
-        if exclude_id and video.get('id') == exclude_id:
-            continue
 
-        # Check if this video's title matches the pattern
-        video_pattern = extract_title_pattern(video.get('title', ''))
-        if video_pattern == pattern:
-            similar.append(video)
+def select_videos_missing_title_pattern(after_id, limit):
+    """Videos saved before title_pattern existed, in id order after after_id."""
+    result = supabase.table('videos').select('id, title').eq('title_pattern', None) \
+        .gt('id', after_id).order('id').limit(limit).execute()
+    return result.data or []
+
+
+def backfill_title_pattern(video):
+    """Backfill step: store the title pattern used to find similar videos."""
+    pattern = extract_title_pattern(video.get('title') or '')
+    supabase.table('videos').update({'title_pattern': pattern}).eq('id', video['id']).execute()
+    return True
+
+
+@app.route('/admin/backfill-title-patterns', methods=['POST'])
+@admin_required
+def backfill_title_patterns():
+    """Fill title_pattern for rows saved before the column existed (runs as the 'title_patterns' backfill)."""
+    result = start_backfill('title_patterns')
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 400
+    return jsonify({'success': True, 'message': 'Title pattern backfill started', 'background': True, **result})
+
 
-    return similar
+@app.route('/admin/backfill-title-patterns/status')
+@admin_required
+def backfill_title_patterns_status():
+    """Get status of the title pattern backfill."""
+    return jsonify(get_backfill_status('title_patterns'))
 
 
 @app.route('/admin/edit-video/<video_id>', methods=['POST'])
@@ -7462,92 +8803,127 @@ def bulk_set_label_format():
     })
 
 
+# Titles left by uploads that had nothing better to go on: empty, "Unknown",
+# "uncategorized - <hash>" or a bare hash. BAD_TITLE_FILTER is the same test
+# as a PostgREST filter so the database only returns candidates.
+BAD_TITLE_UNCATEGORIZED_RE = re.compile(r'^uncategorized\s*[-–]\s*[a-f0-9]+$', re.IGNORECASE)
+BAD_TITLE_HASH_RE = re.compile(r'^[a-f0-9]{6,8}$')
+BAD_TITLE_FILTER = ('title.is.null,title.eq.,title.ilike.unknown,'
+                    r'title.imatch.^uncategorized\s*[-–]\s*[a-f0-9]+$,'
+                    'title.match.^[a-f0-9]{6}[a-f0-9]?[a-f0-9]?$')
+
+
+def title_needs_fix(title):
+    title = (title or '').strip()
+    return (not title or title.lower() == 'unknown'
+            or bool(BAD_TITLE_UNCATEGORIZED_RE.match(title))
+            or bool(BAD_TITLE_HASH_RE.match(title)))
+
+
+def select_bad_title_videos(after_id, limit):
+    """Videos whose title needs fixing, in id order after after_id."""
+    result = supabase.table('videos').select('id, title, url, event').or_(BAD_TITLE_FILTER) \
+        .gt('id', after_id).order('id').limit(limit).execute()
+    return result.data or []
+
+
+def derive_video_title(video):
+    """A better title from the S3 key or the event, or None if there is nothing to go on."""
+    url = video.get('url') or ''
+    video_id = video.get('id', '')
+    new_title = None
+    s3_key = ''
+
+    if url:
+        # Extract S3 key from URL
+        if '.amazonaws.com/' in url:
+            s3_key = url.split('.amazonaws.com/')[-1]
+        elif 'backblaze' in url.lower() and '/file/' in url:
+            parts = url.split('/file/')
+            if len(parts) > 1:
+                s3_key = '/'.join(parts[1].split('/')[1:])
+
+        if s3_key:
+            # Get filename from key
+            filename = s3_key.split('/')[-1]
+            name_without_ext = os.path.splitext(filename)[0]
+
+            # Skip if filename is also just a hash
+            if BAD_TITLE_HASH_RE.match(name_without_ext):
+                # Try folder name instead
+                folder_parts = s3_key.split('/')
+                if len(folder_parts) > 1:
+                    folder = folder_parts[0].replace('_', ' ').replace('-', ' ')
+                    if folder.lower() != 'uncategorized' and folder.lower() != 'videos':
+                        new_title = f"{folder} - {name_without_ext}"
+            else:
+                # Use the parsed metadata for a clean title
+                try:
+                    folder = s3_key.split('/')[0] if '/' in s3_key else ''
+                    meta = parse_filename_metadata(filename, folder)
+                    if meta.get('title') and meta['title'].lower() != 'unknown':
+                        new_title = meta['title']
+                    else:
+                        new_title = name_without_ext.replace('_', ' ').replace('-', ' ')
+                except:
+                    new_title = name_without_ext.replace('_', ' ').replace('-', ' ')
+
+    # If still no title, try event + video_id
+    if not new_title:
+        event = (video.get('event') or '').strip()
+        if event:
+            new_title = f"{event} - {video_id}"
+    return new_title
+
+
+def backfill_video_title(video):
+    """Backfill step: replace a bad title if a better one can be derived."""
+    if not title_needs_fix(video.get('title')):
+        return False
+    new_title = derive_video_title(video)
+    if not new_title:
+        return False
+    save_video({'id': video['id'], 'title': new_title})
+    return True
+
+
 @app.route('/admin/bulk-fix-titles', methods=['POST'])
 @admin_required
 def bulk_fix_titles():
-    """Fix videos with bad titles (uncategorized-hash, Unknown) by extracting from S3 URL or filename."""
-    import re as fix_re
+    """Fix videos with bad titles (uncategorized-hash, Unknown) by extracting from S3 URL or filename.
 
+    dry_run returns a preview; otherwise the fix runs as the 'titles' backfill.
+    """
     data = request.json or {}
     dry_run = data.get('dry_run', False)
 
-    # Get all videos
-    videos = get_all_videos()
+    if not dry_run:
+        result = start_backfill('titles')
+        if 'error' in result:
+            return jsonify({'success': False, 'error': result['error']}), 400
+        return jsonify({'success': True, 'background': True,
+                        'message': f"Fixing titles for {result['total']} videos in the background", **result})
 
     fixed = []
     skipped = []
-
-    for video in videos:
-        title = (video.get('title') or '').strip()
-        url = video.get('url') or ''
-        video_id = video.get('id', '')
-
-        # Check if title needs fixing
-        needs_fix = False
-        if not title or title.lower() == 'unknown':
-            needs_fix = True
-        elif fix_re.match(r'^uncategorized\s*[-–]\s*[a-f0-9]+$', title, fix_re.IGNORECASE):
-            needs_fix = True
-        elif fix_re.match(r'^[a-f0-9]{6,8}$', title):
-            # Title is just a UUID/hash
-            needs_fix = True
-
-        if not needs_fix:
-            continue
-
-        # Try to extract a better title from the S3 URL
-        new_title = None
-        s3_key = ''
-
-        if url:
-            # Extract S3 key from URL
-            if '.amazonaws.com/' in url:
-                s3_key = url.split('.amazonaws.com/')[-1]
-            elif 'backblaze' in url.lower() and '/file/' in url:
-                parts = url.split('/file/')
-                if len(parts) > 1:
-                    s3_key = '/'.join(parts[1].split('/')[1:])
-
-            if s3_key:
-                # Get filename from key
-                filename = s3_key.split('/')[-1]
-                name_without_ext = os.path.splitext(filename)[0]
-
-                # Skip if filename is also just a hash
-                if fix_re.match(r'^[a-f0-9]{6,8}$', name_without_ext):
-                    # Try folder name instead
-                    folder_parts = s3_key.split('/')
-                    if len(folder_parts) > 1:
-                        folder = folder_parts[0].replace('_', ' ').replace('-', ' ')
-                        if folder.lower() != 'uncategorized' and folder.lower() != 'videos':
-                            new_title = f"{folder} - {name_without_ext}"
-                else:
-                    # Use the parsed metadata for a clean title
-                    try:
-                        folder = s3_key.split('/')[0] if '/' in s3_key else ''
-                        meta = parse_filename_metadata(filename, folder)
-                        if meta.get('title') and meta['title'].lower() != 'unknown':
-                            new_title = meta['title']
-                        else:
-                            new_title = name_without_ext.replace('_', ' ').replace('-', ' ')
-                    except:
-                        new_title = name_without_ext.replace('_', ' ').replace('-', ' ')
-
-        # If still no title, try event + video_id
-        if not new_title:
-            event = video.get('event', '').strip()
-            if event:
-                new_title = f"{event} - {video_id}"
+    last_id = ''
+    while True:
+        videos = select_bad_title_videos(last_id, 500)
+        if not videos:
+            break
+        last_id = videos[-1]['id']
+        for video in videos:
+            title = (video.get('title') or '').strip()
+            if not title_needs_fix(title):
+                continue
+            new_title = derive_video_title(video)
+            if new_title:
+                fixed.append({'id': video['id'], 'old_title': title, 'new_title': new_title})
             else:
                 # Can't determine a better title
-                skipped.append({'id': video_id, 'old_title': title, 'reason': 'no URL or event to derive title from'})
-                continue
-
-        if not dry_run:
-            video['title'] = new_title
-            save_video(video)
-
-        fixed.append({'id': video_id, 'old_title': title, 'new_title': new_title})
+                skipped.append({'id': video['id'], 'old_title': title, 'reason': 'no URL or event to derive title from'})
+        if len(videos) < 500:
+            break
 
     return jsonify({
         'success': True,
@@ -7556,7 +8932,7 @@ def bulk_fix_titles():
         'skipped_count': len(skipped),
         'fixed': fixed[:50],  # Show first 50
         'skipped': skipped[:20],
-        'message': f'{"Would fix" if dry_run else "Fixed"} {len(fixed)} video titles, skipped {len(skipped)}'
+        'message': f'Would fix {len(fixed)} video titles, skipped {len(skipped)}'
     })
 
 
@@ -7578,6 +8954,21 @@ def get_ffmpeg_path():
     return 'ffmpeg'  # Last resort fallback
 
 
+def ffmpeg_input_args(source, start=None):
+    """Build ffmpeg input args for a local path or URL.
+
+    URLs are read directly: ffmpeg seeks with HTTP range requests, so an
+    input-side -ss only fetches the bytes it needs instead of the whole file.
+    """
+    args = []
+    if start:
+        args += ['-ss', str(start)]
+    if source.startswith(('http://', 'https://')):
+        args += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5',
+                 '-user_agent', 'Mozilla/5.0']
+    return args + ['-i', source]
+
+
 def generate_thumbnail_from_s3_video(video_url, video_id):
     """Generate thumbnail from S3 video URL using ffmpeg (streams directly, no full download).
     Returns (thumbnail_url, error_message) tuple."""
@@ -7663,20 +9054,8 @@ def test_thumbnail():
     """Test thumbnail generation with a single video - returns full debug info."""
     ffmpeg = get_ffmpeg_path()
 
-    # Get one video without thumbnail (cursor-based)
-    videos = []
-    last_id = ''
-    while True:
-        result = supabase.table('videos').select('id, url, thumbnail').order('id').gt('id', last_id).limit(500).execute()
-        if not result.data:
-            break
-        videos.extend([v for v in result.data if not v.get('thumbnail')])
-        if videos:  # Found at least one video without thumbnail
-            break
-        last_id = result.data[-1]['id']
-        if len(result.data) < 500:
-            break
-
+    # Get one video without thumbnail
+    videos = select_videos_missing_thumbnail('', 1)
     if not videos:
         return jsonify({'error': 'No videos without thumbnails'})
 
@@ -7724,145 +9103,392 @@ def test_thumbnail():
     })
 
 
-@app.route('/admin/refresh-thumbnails', methods=['POST'])
-@admin_required
-def refresh_thumbnails():
-    """Generate thumbnails for S3 videos that are missing them."""
-    if not USE_S3:
-        return jsonify({'error': 'This feature requires S3 to be configured'}), 400
+def select_videos_missing_thumbnail(after_id, limit):
+    """Videos without a thumbnail, in id order after after_id (partial index)."""
+    result = supabase.table('videos').select('id, title, url, thumbnail').or_('thumbnail.is.null,thumbnail.eq.') \
+        .gt('id', after_id).order('id').limit(limit).execute()
+    return result.data or []
+
+
+def select_videos_missing_duration(after_id, limit):
+    """Videos without a duration, in id order after after_id (partial index)."""
+    result = supabase.table('videos').select('id, title, url, local_file, duration').or_('duration.is.null,duration.eq.') \
+        .gt('id', after_id).order('id').limit(limit).execute()
+    return result.data or []
+
+
+def backfill_video_thumbnail(video):
+    """Backfill step: find or generate a thumbnail for one video and store it."""
+    url = video.get('url', '')
+    video_id = video.get('id')
+    if not url:
+        raise ValueError('No URL')
+
+    # S3/CloudFront videos - generate thumbnail
+    if 's3.' in url or 'cloudfront' in url or (AWS_S3_BUCKET and AWS_S3_BUCKET in url):
+        thumbnail, err_msg = generate_thumbnail_from_s3_video(url, video_id)
+        if not thumbnail:
+            raise RuntimeError(err_msg or 'Unknown error')
+    # Vimeo
+    elif 'vimeo.com' in url:
+        thumbnail = fetch_vimeo_metadata(url).get('thumbnail', '')
+    # YouTube
+    elif 'youtube.com' in url or 'youtu.be' in url:
+        thumbnail = fetch_youtube_metadata(url).get('thumbnail', '')
+    else:
+        raise ValueError(f'Unknown source - {url[:50]}')
+
+    if not thumbnail:
+        return False
+    supabase.table('videos').update({'thumbnail': thumbnail, 'thumbnail_variants': None}).eq('id', video_id).execute()
+    refresh_thumbnail_variants(video_id, thumbnail)
+    return True
+
+
+def select_videos_missing_thumbnail_variants(after_id, limit):
+    """Videos with a thumbnail but no resized variants, in id order after after_id (partial index)."""
+    result = supabase.table('videos').select('id, title, thumbnail').eq('thumbnail_variants', None) \
+        .gt('thumbnail', '').gt('id', after_id).order('id').limit(limit).execute()
+    return result.data or []
+
+
+def backfill_thumbnail_variants(video):
+    """Backfill step: build the resized variants of an existing thumbnail."""
+    if not refresh_thumbnail_variants(video['id'], video['thumbnail']):
+        raise RuntimeError('variant encode failed')
+    return True
 
-    # Check if ffmpeg is available
+
+def check_ffmpeg():
+    """Return an error message if ffmpeg cannot be run, else None."""
     ffmpeg = get_ffmpeg_path()
     try:
         result = subprocess.run([ffmpeg, '-version'], capture_output=True, timeout=5)
         if result.returncode != 0:
-            return jsonify({'error': f'ffmpeg not available at {ffmpeg}'}), 500
+            return f'ffmpeg not available at {ffmpeg}'
     except FileNotFoundError:
-        return jsonify({'error': f'ffmpeg not found at {ffmpeg}. Run build.sh first.'}), 500
+        return f'ffmpeg not found at {ffmpeg}. Run build.sh first.'
     except Exception as e:
-        return jsonify({'error': f'ffmpeg check failed: {str(e)}'}), 500
-
-    try:
-        # Get all videos with missing thumbnails (cursor-based)
-        videos = []
-        last_id = ''
-        while True:
-            result = supabase.table('videos').select('id, url, thumbnail').order('id').gt('id', last_id).limit(500).execute()
-            if not result.data:
-                break
-            videos.extend(result.data)
-            last_id = result.data[-1]['id']
-            if len(result.data) < 500:
-                break
+        return f'ffmpeg check failed: {str(e)}'
+    return None
 
-        missing_thumbs = [v for v in videos if not v.get('thumbnail')]
 
-        if not missing_thumbs:
-            return jsonify({'success': True, 'message': 'All videos already have thumbnails', 'updated': 0})
+# Backfills: maintenance jobs over the videos table run by backfill.run_backfill
+# in a thread pool (BACKFILL_WORKERS, BACKFILL_PER_HOST per source host). Each
+# job pages through an indexed query of the rows still needing work. The last
+# finished id is checkpointed in Redis (backfill:checkpoint) so a stopped or
+# crashed run resumes there, and status is shared through backfill:status:<name>.
+# The owning worker refreshes the status heartbeat while it runs, so a run whose
+# worker died stops counting as running; backfill:stop:<name> stops it from any worker.
+BACKFILL_JOBS = {
+    'thumbnails': {'select': select_videos_missing_thumbnail, 'process': backfill_video_thumbnail,
+                   'where': lambda q: q.or_('thumbnail.is.null,thumbnail.eq.')},
+    'durations': {'select': select_videos_missing_duration, 'process': backfill_video_duration,
+                  'where': lambda q: q.or_('duration.is.null,duration.eq.')},
+    'titles': {'select': select_bad_title_videos, 'process': backfill_video_title,
+               'where': lambda q: q.or_(BAD_TITLE_FILTER)},
+    'thumbnail_variants': {'select': select_videos_missing_thumbnail_variants, 'process': backfill_thumbnail_variants,
+                           'where': lambda q: q.eq('thumbnail_variants', None).gt('thumbnail', '')},
+    'title_patterns': {'select': select_videos_missing_title_pattern, 'process': backfill_title_pattern,
+                       'where': lambda q: q.eq('title_pattern', None)},
+}
+BACKFILL_CHECKPOINT_KEY = 'backfill:checkpoint'
+backfill_checkpoints = {}  # In-memory fallback when Redis is unavailable
+backfill_lock = threading.Lock()
+backfill_status = {}  # name -> status dict for runs started by this worker
+backfill_stop_requests = set()  # In-memory fallback for backfill:stop:<name>
+BACKFILL_HEARTBEAT = 15  # Seconds between status refreshes while a run is going
+BACKFILL_STALE = 90  # A running status whose heartbeat is older than this is dead
+BACKFILL_OWNER = f"{socket.gethostname()}:{os.getpid()}"
 
-        # Process 10 videos per request
-        batch = missing_thumbs[:10]
-        updated = 0
-        errors = []
 
-        for video in batch:
-            url = video.get('url', '')
-            video_id = video.get('id')
+def get_backfill_checkpoint(name):
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            return redis_client.hget(BACKFILL_CHECKPOINT_KEY, name) or ''
+        except Exception as e:
+            print(f"[BACKFILL] Redis checkpoint read error: {e}", flush=True)
+    return backfill_checkpoints.get(name, '')
 
-            if not url:
-                errors.append(f"{video_id}: No URL")
-                continue
 
-            thumbnail = None
-            err_msg = None
-
-            # S3/CloudFront videos - generate thumbnail
-            if 's3.' in url or 'cloudfront' in url or (AWS_S3_BUCKET and AWS_S3_BUCKET in url):
-                thumbnail, err_msg = generate_thumbnail_from_s3_video(url, video_id)
-                if not thumbnail:
-                    errors.append(f"{video_id}: {err_msg or 'Unknown error'}")
-            # Vimeo
-            elif 'vimeo.com' in url:
-                meta = fetch_vimeo_metadata(url)
-                thumbnail = meta.get('thumbnail', '')
-            # YouTube
-            elif 'youtube.com' in url or 'youtu.be' in url:
-                meta = fetch_youtube_metadata(url)
-                thumbnail = meta.get('thumbnail', '')
+def save_backfill_checkpoint(name, cursor):
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            if cursor:
+                redis_client.hset(BACKFILL_CHECKPOINT_KEY, name, cursor)
             else:
-                errors.append(f"{video_id}: Unknown source - {url[:50]}")
-                continue
+                redis_client.hdel(BACKFILL_CHECKPOINT_KEY, name)
+            return
+        except Exception as e:
+            print(f"[BACKFILL] Redis checkpoint write error: {e}", flush=True)
+    backfill_checkpoints[name] = cursor
 
-            if thumbnail:
-                try:
-                    supabase.table('videos').update({'thumbnail': thumbnail}).eq('id', video_id).execute()
-                    updated += 1
-                except Exception as e:
-                    errors.append(f"{video_id}: DB error - {str(e)}")
 
-        remaining = len(missing_thumbs) - len(batch)
-        msg = f'Generated {updated} thumbnails.'
-        if remaining > 0:
-            msg += f' {remaining} videos remaining - click again to continue.'
+def publish_backfill_status(status):
+    """Share progress (with this worker's heartbeat) through Redis so the status poll works on any worker."""
+    with backfill_lock:
+        status['owner'] = BACKFILL_OWNER
+        status['heartbeat'] = time.time()
+        snapshot = json.loads(json.dumps(status))
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.set(f"backfill:status:{status['name']}", json.dumps(snapshot), ex=24 * 3600)
+        except Exception as e:
+            print(f"[BACKFILL] Redis status write error: {e}", flush=True)
+    return snapshot
 
-        return jsonify({
-            'success': True,
-            'message': msg,
-            'updated': updated,
-            'processed': len(batch),
-            'total_missing': len(missing_thumbs),
-            'remaining': remaining,
-            'errors': errors[:10] if errors else []
-        })
-    except Exception as e:
-        import traceback
-        return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
 
+def get_backfill_status(name):
+    status = backfill_status.get(name)
+    if status and status['running']:
+        return publish_backfill_status(status)
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            data = redis_client.get(f'backfill:status:{name}')
+            if data:
+                remote = json.loads(data)
+                if remote.get('running') and time.time() - remote.get('heartbeat', 0) > BACKFILL_STALE:
+                    # Owning worker died mid-run; it can be started again
+                    remote['running'] = False
+                    remote['stale'] = True
+                return remote
+        except Exception as e:
+            print(f"[BACKFILL] Redis status read error: {e}", flush=True)
+    return status or {'name': name, 'running': False, 'checkpoint': get_backfill_checkpoint(name)}
 
-@app.route('/admin/rename-event-folder', methods=['POST'])
-@admin_required
-def rename_event_folder():
-    """Rename an event folder (updates all videos with that event name)."""
-    data = request.json
-    old_name = data.get('old_name', '').strip()
-    new_name = data.get('new_name', '').strip()
-    category = data.get('category', '')
-    subcategory = data.get('subcategory', '')
 
-    if not old_name or not new_name:
-        return jsonify({'error': 'Both old and new names are required'}), 400
+def count_backfill_rows(name, after_id=''):
+    query = BACKFILL_JOBS[name]['where'](supabase.table('videos').select('id', count='exact'))
+    result = query.gt('id', after_id).limit(1).execute()
+    return result.count or 0
 
-    if old_name == new_name:
-        return jsonify({'error': 'New name must be different'}), 400
 
-    # Get all videos in this category/subcategory with the old event name
-    if subcategory:
-        videos = get_videos_by_category(category, subcategory)
-    else:
-        videos = get_videos_by_category(category)
+def request_backfill_stop(name):
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.set(f'backfill:stop:{name}', BACKFILL_OWNER, ex=24 * 3600)
+            return
+        except Exception as e:
+            print(f"[BACKFILL] Redis stop write error: {e}", flush=True)
+    backfill_stop_requests.add(name)
 
-    # Filter to only videos with the old event name
-    videos_to_update = [v for v in videos if v.get('event', '') == old_name]
 
-    if not videos_to_update:
-        return jsonify({'error': f'No videos found with event "{old_name}"'}), 404
+def backfill_stop_requested(name):
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            return bool(redis_client.exists(f'backfill:stop:{name}'))
+        except Exception as e:
+            print(f"[BACKFILL] Redis stop read error: {e}", flush=True)
+    return name in backfill_stop_requests
 
-    # Update all matching videos
-    success_count = 0
-    for video in videos_to_update:
-        video['event'] = new_name
-        save_video(video)
-        success_count += 1
 
-    return jsonify({
-        'success': True,
-        'message': f'Renamed folder to "{new_name}" ({success_count} videos updated)',
-        'updated_count': success_count
-    })
+def clear_backfill_stop(name):
+    backfill_stop_requests.discard(name)
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            redis_client.delete(f'backfill:stop:{name}')
+        except Exception as e:
+            print(f"[BACKFILL] Redis stop clear error: {e}", flush=True)
 
 
-@app.route('/admin/merge-duplicate-events', methods=['POST'])
-@admin_required
+def acquire_backfill_lock(name):
+    """Take backfill:lock:<name> so only one worker runs a backfill. Without Redis only the local status guards."""
+    if not (REDIS_AVAILABLE and redis_client):
+        return True
+    try:
+        return bool(redis_client.set(f'backfill:lock:{name}', BACKFILL_OWNER, nx=True, ex=BACKFILL_STALE))
+    except Exception as e:
+        print(f"[BACKFILL] Redis lock error: {e}", flush=True)
+        return True
+
+
+def release_backfill_lock(name):
+    # Same owner-checked scripts as the migration lock
+    if _migrate_scripts:
+        try:
+            _migrate_scripts['release'](keys=[f'backfill:lock:{name}'], args=[BACKFILL_OWNER])
+        except Exception as e:
+            print(f"[BACKFILL] Redis lock release error: {e}", flush=True)
+
+
+def refresh_backfill_lock(name):
+    if _migrate_scripts:
+        try:
+            if not _migrate_scripts['refresh'](keys=[f'backfill:lock:{name}'], args=[BACKFILL_OWNER, BACKFILL_STALE]):
+                print(f"[BACKFILL] {name}: lost the backfill lock", flush=True)
+        except Exception as e:
+            print(f"[BACKFILL] Redis lock refresh error: {e}", flush=True)
+
+
+def backfill_heartbeat(status):
+    """Republish a running backfill's status and refresh its lock so other workers see its owner is alive."""
+    while status['running']:
+        time.sleep(BACKFILL_HEARTBEAT)
+        if status['running']:
+            refresh_backfill_lock(status['name'])
+            publish_backfill_status(status)
+
+
+def backfill_background(name, status):
+    job = BACKFILL_JOBS[name]
+    print(f"[BACKFILL] {name}: starting, {status['total']} rows from '{status['cursor']}'", flush=True)
+    heartbeat = threading.Thread(target=backfill_heartbeat, args=(status,))
+    heartbeat.daemon = True
+    heartbeat.start()
+    try:
+        run_backfill(job['select'], job['process'], status,
+                     checkpoint=status['cursor'],
+                     save_checkpoint=lambda cursor: save_backfill_checkpoint(name, cursor),
+                     host_of=url_host,
+                     on_progress=publish_backfill_status,
+                     should_stop=lambda: backfill_stop_requested(name))
+        if not status['stopping']:
+            save_backfill_checkpoint(name, '')  # Finished: the next run starts from the beginning
+    except Exception as e:
+        status['running'] = False
+        status['errors'] = (status['errors'] + [f'Run aborted: {e}'])[-20:]
+        publish_backfill_status(status)
+        print(f"[BACKFILL] {name}: aborted: {e}", flush=True)
+        return
+    finally:
+        clear_backfill_stop(name)
+        release_backfill_lock(name)
+    print(f"[BACKFILL] {name}: {status['updated']} updated, {status['skipped']} skipped, "
+          f"{status['failed']} failed at {status['rate']} rows/s", flush=True)
+
+
+def start_backfill(name, resume=True):
+    """Start a backfill in the background, resuming from its checkpoint unless resume is False."""
+    if name not in BACKFILL_JOBS:
+        return {'error': f'Unknown backfill: {name}'}
+    if get_backfill_status(name).get('running'):
+        return {'error': 'Backfill already running'}
+    # The status check above is only advisory; the lock decides between workers
+    if not acquire_backfill_lock(name):
+        return {'error': 'Backfill already running'}
+
+    try:
+        clear_backfill_stop(name)
+        cursor = get_backfill_checkpoint(name) if resume else ''
+        status = new_backfill_status(name, count_backfill_rows(name, cursor))
+        status['cursor'] = cursor
+    except Exception:
+        release_backfill_lock(name)
+        raise
+    with backfill_lock:
+        if (backfill_status.get(name) or {}).get('running'):
+            return {'error': 'Backfill already running'}
+        backfill_status[name] = status
+    publish_backfill_status(status)
+
+    thread = threading.Thread(target=backfill_background, args=(name, status))
+    thread.daemon = True
+    thread.start()
+    return {'started': True, 'total': status['total'], 'resumed_from': cursor}
+
+
+@app.route('/admin/backfill/<name>', methods=['POST'])
+@admin_required
+def start_backfill_route(name):
+    """Start a backfill (thumbnails, durations, titles, thumbnail_variants, title_patterns). Pass resume=false to start over."""
+    data = request.get_json(silent=True) or {}
+    result = start_backfill(name, resume=data.get('resume', True))
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 400
+    return jsonify({'success': True, **result})
+
+
+@app.route('/admin/backfill/<name>/status')
+@admin_required
+def backfill_status_route(name):
+    """Progress, throughput (rows/s) and ETA of a backfill."""
+    if name not in BACKFILL_JOBS:
+        return jsonify({'error': f'Unknown backfill: {name}'}), 404
+    return jsonify(get_backfill_status(name))
+
+
+@app.route('/admin/backfill/<name>/stop', methods=['POST'])
+@admin_required
+def stop_backfill_route(name):
+    """Stop a backfill after its current page; it resumes from the checkpoint next time."""
+    if name not in BACKFILL_JOBS:
+        return jsonify({'error': f'Unknown backfill: {name}'}), 404
+    if not get_backfill_status(name).get('running'):
+        return jsonify({'success': False, 'error': 'Backfill not running'}), 400
+    # The owning worker (possibly another process) picks this up before its next page
+    request_backfill_stop(name)
+    status = backfill_status.get(name)
+    if status and status['running']:
+        status['stopping'] = True
+    return jsonify({'success': True})
+
+
+@app.route('/admin/refresh-thumbnails', methods=['POST'])
+@admin_required
+def refresh_thumbnails():
+    """Generate thumbnails for videos that are missing them (runs as the 'thumbnails' backfill)."""
+    if not USE_S3:
+        return jsonify({'error': 'This feature requires S3 to be configured'}), 400
+
+    error = check_ffmpeg()
+    if error:
+        return jsonify({'error': error}), 500
+
+    result = start_backfill('thumbnails')
+    if 'error' in result:
+        return jsonify({'error': result['error']}), 400
+    return jsonify({
+        'success': True,
+        'background': True,
+        'message': f"Generating thumbnails for {result['total']} videos in the background",
+        **result
+    })
+
+
+@app.route('/admin/rename-event-folder', methods=['POST'])
+@admin_required
+def rename_event_folder():
+    """Rename an event folder (updates all videos with that event name)."""
+    data = request.json
+    old_name = data.get('old_name', '').strip()
+    new_name = data.get('new_name', '').strip()
+    category = data.get('category', '')
+    subcategory = data.get('subcategory', '')
+
+    if not old_name or not new_name:
+        return jsonify({'error': 'Both old and new names are required'}), 400
+
+    if old_name == new_name:
+        return jsonify({'error': 'New name must be different'}), 400
+
+    # Get all videos in this category/subcategory with the old event name
+    if subcategory:
+        videos = get_videos_by_category(category, subcategory)
+    else:
+        videos = get_videos_by_category(category)
+
+    # Filter to only videos with the old event name
+    videos_to_update = [v for v in videos if v.get('event', '') == old_name]
+
+    if not videos_to_update:
+        return jsonify({'error': f'No videos found with event "{old_name}"'}), 404
+
+    # Update all matching videos
+    success_count = 0
+    for video in videos_to_update:
+        video['event'] = new_name
+        save_video(video)
+        success_count += 1
+
+    return jsonify({
+        'success': True,
+        'message': f'Renamed folder to "{new_name}" ({success_count} videos updated)',
+        'updated_count': success_count
+    })
+
+
+@app.route('/admin/merge-duplicate-events', methods=['POST'])
+@admin_required
 def merge_duplicate_events():
     """Merge events with duplicate names (case-insensitive) into a single event."""
     data = request.json
@@ -7924,6 +9550,70 @@ def merge_duplicate_events():
     })
 
 
+@app.route('/cache/video/<video_id>')
+def edge_cached_video(video_id):
+    """Serve a B2/CDN video from the venue edge cache, fetching it upstream once."""
+    video = get_video(video_id)
+    if not video or not video.get('url'):
+        return "Video not found", 404
+    upstream = normalize_b2_url(video['url'])
+    if S3_PRIVATE_BUCKET and get_b2_key_from_url(upstream):
+        upstream = get_s3_presigned_url(get_b2_key_from_url(upstream)) or upstream
+    if not EDGE_CACHE_ENABLED or not upstream.startswith(('http://', 'https://')):
+        return redirect(upstream)
+
+    key = edge_cache_key(video)
+    path = get_cached_path(key)
+    if path:
+        response = send_file(path, conditional=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    # Not cached yet - start the fetch and serve ranges as they land
+    start_fetch(key, upstream)
+    file_size = partial_size(key)
+    if not file_size:
+        # Fetch failed or is slow to start - let the client go upstream directly
+        return redirect(upstream)
+
+    byte_start, byte_end, status = 0, file_size - 1, 200
+    match = re.match(r'bytes=(\d*)-(\d*)', request.headers.get('Range', ''))
+    if match and match.group(1):
+        byte_start = int(match.group(1))
+        if match.group(2):
+            byte_end = min(int(match.group(2)), file_size - 1)
+        status = 206
+    elif match and match.group(2):
+        byte_start = max(file_size - int(match.group(2)), 0)
+        status = 206
+    if byte_start > byte_end:
+        return Response(status=416, headers={'Content-Range': f'bytes */{file_size}'})
+
+    headers = {
+        'Content-Type': {'.webm': 'video/webm', '.mov': 'video/quicktime'}.get(os.path.splitext(key)[1], 'video/mp4'),
+        'Accept-Ranges': 'bytes',
+        'Content-Length': byte_end - byte_start + 1,
+        'Cache-Control': 'no-cache',
+    }
+    if status == 206:
+        headers['Content-Range'] = f'bytes {byte_start}-{byte_end}/{file_size}'
+    return Response(stream_with_context(read_partial(key, byte_start, byte_end)), status=status, headers=headers)
+
+
+@app.route('/admin/cdn-purge/status')
+@admin_required
+def cdn_purge_status():
+    """Cloudflare purge queue depth and counters (for this worker)."""
+    return jsonify(get_purge_queue_status())
+
+
+@app.route('/admin/edge-cache/status')
+@admin_required
+def edge_cache_status():
+    """Edge cache usage (files, bytes, in-flight fetches)."""
+    return jsonify(get_cache_stats())
+
+
 @app.route('/pcloud/stream/<path:pcloud_path>')
 def pcloud_stream(pcloud_path):
     """Stream a video from pCloud storage."""
@@ -7943,55 +9633,322 @@ def pcloud_stream(pcloud_path):
     }
     content_type = content_types.get(ext, 'video/mp4')
 
-    # Handle range requests for video seeking
+    # Handle range requests for video seeking - only the requested bytes are fetched
     range_header = request.headers.get('Range')
 
     if range_header and file_size:
-        # Parse range header
         byte_start = 0
         byte_end = file_size - 1
 
-        match = re.match(r'bytes=(\d+)-(\d*)', range_header)
-        if match:
+        match = re.match(r'bytes=(\d*)-(\d*)', range_header)
+        if match and match.group(1):
             byte_start = int(match.group(1))
             if match.group(2):
-                byte_end = int(match.group(2))
-
-        content_length = byte_end - byte_start + 1
+                byte_end = min(int(match.group(2)), file_size - 1)
+        elif match and match.group(2):
+            # Suffix range: the last N bytes
+            byte_start = max(file_size - int(match.group(2)), 0)
 
-        # For range requests, we need to use a different approach
-        # Stream the full file but return 206 Partial Content
-        def generate():
-            for chunk in get_pcloud_file_stream(pcloud_path):
-                yield chunk
+        if byte_start > byte_end:
+            return Response(status=416, headers={'Content-Range': f'bytes */{file_size}'})
 
         headers = {
             'Content-Type': content_type,
             'Accept-Ranges': 'bytes',
             'Content-Range': f'bytes {byte_start}-{byte_end}/{file_size}',
-            'Content-Length': content_length,
+            'Content-Length': byte_end - byte_start + 1,
         }
-        return Response(stream_with_context(generate()), status=206, headers=headers)
-
-    # Full file request
-    def generate():
-        for chunk in get_pcloud_file_stream(pcloud_path):
-            yield chunk
+        return Response(
+            stream_with_context(get_pcloud_range_stream(pcloud_path, byte_start, byte_end, file_size)),
+            status=206, headers=headers
+        )
 
     headers = {
         'Content-Type': content_type,
         'Accept-Ranges': 'bytes',
     }
     if file_size:
+        # Full file request through the block cache
         headers['Content-Length'] = file_size
+        return Response(
+            stream_with_context(get_pcloud_range_stream(pcloud_path, 0, file_size - 1, file_size)),
+            headers=headers
+        )
+
+    return Response(stream_with_context(get_pcloud_file_stream(pcloud_path)), headers=headers)
+
+
+# Trim jobs. ffmpeg reads the source over HTTP with range requests, so only the
+# bytes after the cut are fetched; the result is stream-copied (cut at the
+# keyframe) or, in "smart" mode, only the head GOP up to the first keyframe is
+# re-encoded. Jobs run on a bounded pool and are tracked like conversions.
+TRIM_CONCURRENCY = int(os.environ.get('TRIM_CONCURRENCY', '3'))
+TRIM_MODE = os.environ.get('TRIM_MODE', 'copy')  # 'copy' or 'smart'
+TRIM_TIMEOUT = int(os.environ.get('TRIM_TIMEOUT', '900'))
+trim_semaphore = threading.BoundedSemaphore(TRIM_CONCURRENCY)
+
+
+def resolve_trim_source(video):
+    """Return (source, s3_key) for trimming: an S3/B2 URL with its key, or a local path."""
+    url = video.get('url', '') or ''
+    if url.startswith('/static/videos/'):
+        return os.path.join(VIDEOS_FOLDER, os.path.basename(url)), None
+    if not url and video.get('local_file'):
+        return os.path.join(VIDEOS_FOLDER, video['local_file']), None
+    if url and USE_S3 and s3_client:
+        s3_key = get_b2_key_from_url(url)
+        if s3_key:
+            return url, s3_key
+    return None, None
+
+
+def first_keyframe_after(source, t, window=10):
+    """Timestamp of the first video keyframe at or after t (None if not found in the window)."""
+    cmd = [
+        get_ffprobe_path(), '-v', 'error', '-select_streams', 'v:0',
+        '-read_intervals', f'{t}%+{window}',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', source
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or parts[0] in ('', 'N/A'):
+            continue
+        pts = float(parts[0])
+        if 'K' in parts[1] and pts >= t:
+            return pts
+    return None
+
+
+def probe_stream_params(source):
+    """Codec parameters of the first video and audio stream: {'video': {...}, 'audio': {...}}."""
+    cmd = [
+        get_ffprobe_path(), '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name,profile,level,pix_fmt,sample_rate,channels',
+        '-of', 'json', source
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        streams = json.loads(result.stdout or '{}').get('streams', [])
+    except (subprocess.SubprocessError, OSError, ValueError):
+        return {}
+    params = {}
+    for stream in streams:
+        params.setdefault(stream.get('codec_type'), stream)
+    return params
+
+
+# ffprobe H.264 profile names -> libx264 -profile:v values
+X264_PROFILES = {
+    'constrained baseline': 'baseline',
+    'baseline': 'baseline',
+    'main': 'main',
+    'high': 'high',
+    'high 10': 'high10',
+    'high 4:2:2': 'high422',
+    'high 4:4:4 predictive': 'high444',
+}
+
+
+def smart_cut_head_args(params):
+    """Encode args for a smart-cut head that can be concatenated with the
+    stream-copied body, or None if the source codecs can't be matched."""
+    video = params.get('video') or {}
+    audio = params.get('audio')
+    profile = X264_PROFILES.get((video.get('profile') or '').lower())
+    if video.get('codec_name') != 'h264' or not profile or not video.get('pix_fmt'):
+        return None
+    if audio and audio.get('codec_name') != 'aac':
+        return None
+    args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
+            '-profile:v', profile, '-pix_fmt', video['pix_fmt']]
+    if video.get('level') and video['level'] > 0:
+        args += ['-level', f"{video['level'] / 10:.1f}"]  # 31 -> 3.1
+    if audio:
+        args += ['-c:a', 'aac', '-b:a', '128k']
+        if audio.get('sample_rate'):
+            args += ['-ar', str(audio['sample_rate'])]
+        if audio.get('channels'):
+            args += ['-ac', str(audio['channels'])]
+    else:
+        args += ['-an']
+    return args
+
+
+def run_trim_ffmpeg(cmd):
+    result = subprocess.run(cmd, capture_output=True, timeout=TRIM_TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg trim failed: {result.stderr.decode(errors='replace')[-500:]}")
+
+
+def cut_video(source, output_path, start, end=None, mode='copy'):
+    """Cut [start, end) from source into output_path without a full download.
+
+    'copy' stream-copies from the keyframe at/before start. 'smart' re-encodes
+    only [start, next keyframe) and stream-copies the rest, then joins them;
+    it falls back to re-encoding the whole cut when the cut ends before that
+    keyframe or the source codecs can't be matched by the re-encoded head.
+    """
+    import tempfile
+    ffmpeg = get_ffmpeg_path()
+    duration_args = ['-t', str(end - start)] if end else []
+
+    keyframe = first_keyframe_after(source, start) if mode == 'smart' and start > 0 else None
+    if keyframe is None or keyframe - start < 0.01:
+        cmd = [ffmpeg, '-y'] + ffmpeg_input_args(source, start=start) + duration_args + [
+            '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+            '-movflags', '+faststart', output_path
+        ]
+        run_trim_ffmpeg(cmd)
+        return
+
+    if end and end <= keyframe:
+        head_args = None  # The whole cut lies before the next keyframe
+    else:
+        head_args = smart_cut_head_args(probe_stream_params(source))
+    if head_args is None:
+        # Nothing to stream-copy, or a re-encoded head would not concatenate with the copied body
+        run_trim_ffmpeg([ffmpeg, '-y'] + ffmpeg_input_args(source, start=start) + duration_args +
+                        get_encode_args() + [output_path])
+        return
+
+    work_dir = tempfile.mkdtemp(prefix='trim_')
+    try:
+        head = os.path.join(work_dir, 'head.mp4')
+        body = os.path.join(work_dir, 'body.mp4')
+        concat_list = os.path.join(work_dir, 'list.txt')
+
+        # Re-encode the partial GOP before the first keyframe
+        run_trim_ffmpeg([ffmpeg, '-y'] + ffmpeg_input_args(source, start=start) + [
+            '-t', str(keyframe - start)] + head_args + [head])
+        # Stream-copy everything from that keyframe on
+        body_duration = ['-t', str(end - keyframe)] if end else []
+        run_trim_ffmpeg([ffmpeg, '-y'] + ffmpeg_input_args(source, start=keyframe) + body_duration + [
+            '-c', 'copy', '-avoid_negative_ts', 'make_zero', body])
+
+        with open(concat_list, 'w') as f:
+            f.write(f"file '{head}'\nfile '{body}'\n")
+        run_trim_ffmpeg([ffmpeg, '-y', '-f', 'concat', '-safe', '0', '-i', concat_list,
+                         '-c', 'copy', '-movflags', '+faststart', output_path])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def background_trim_video(job_id, video_id, start, end=None, mode='copy'):
+    """Trim a video in the background and replace it in place (S3/B2 or local)."""
+    import tempfile
+    temp_output = None
+    purge_urls = []
+
+    with trim_semaphore:
+        try:
+            update_conversion_job(job_id, status='trimming', progress=10)
+
+            video = get_video(video_id)
+            if not video:
+                raise RuntimeError('Video not found')
+            source, s3_key = resolve_trim_source(video)
+            if not source:
+                raise RuntimeError('Can only trim local or S3 videos')
+
+            original_size = (s3_client.head_object(Bucket=AWS_S3_BUCKET, Key=s3_key)['ContentLength']
+                             if s3_key else os.path.getsize(source))
+
+            print(f"[TRIM] Job {job_id}: {video_id} {start}s-{end or 'end'} ({mode})", flush=True)
+            temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+            temp_output.close()
+            cut_video(source, temp_output.name, start, end, mode)
+
+            trimmed_size = os.path.getsize(temp_output.name)
+            if trimmed_size < 1000:
+                raise RuntimeError('Trimmed file too small, something went wrong')
+            update_conversion_job(job_id, progress=60)
+
+            # Rebuild the keyframe index and scrub previews - timestamps shift after the cut
+            old_previews = preview_sidecar_urls(video['preview_vtt']) if video.get('preview_vtt') else []
+            updates = {'start_time': 0, 'trimmed': True}
+            sidecar_urls = generate_video_sidecars(temp_output.name, video_id, updates)
+
+            if s3_key:
+                upload_to_s3_key(temp_output.name, s3_key)
+                purge_urls = [video['url']] + sidecar_urls
+                invalidate_cache(f"{video_id}.")
+            else:
+                shutil.move(temp_output.name, source)
+                temp_output = None
+            invalidate_frames(video_id)
+            keyframe_index_cache.pop(video_id, None)
+
+            supabase.table('videos').update(updates).eq('id', video_id).execute()
+
+            # The new track has new sheet names; drop the old track and all of its sheets
+            if updates.get('preview_vtt'):
+                for url in old_previews:
+                    if url not in sidecar_urls:
+                        delete_video_sidecar(url)
+                        if s3_key:
+                            purge_urls.append(url)
+
+            saved_bytes = original_size - trimmed_size
+            message = f'Video trimmed! Saved {saved_bytes / 1024 / 1024:.1f} MB'
+            print(f"[TRIM] Job {job_id} done: saved {saved_bytes} bytes", flush=True)
+            with conversion_lock:
+                if job_id in conversion_jobs:
+                    conversion_jobs[job_id].update({
+                        'message': message,
+                        'original_size': original_size,
+                        'trimmed_size': trimmed_size,
+                        'saved_bytes': saved_bytes
+                    })
+            update_conversion_job(job_id, status='completed', progress=100,
+                                  completed_at=datetime.now().isoformat())
+        except subprocess.TimeoutExpired:
+            print(f"[TRIM] Job {job_id} timed out", flush=True)
+            update_conversion_job(job_id, status='failed', error='FFmpeg trim timed out',
+                                  completed_at=datetime.now().isoformat())
+        except Exception as e:
+            print(f"[TRIM] Job {job_id} error: {e}", flush=True)
+            update_conversion_job(job_id, status='failed', error=f'Trim failed: {e}',
+                                  completed_at=datetime.now().isoformat())
+        finally:
+            if temp_output and os.path.exists(temp_output.name):
+                os.remove(temp_output.name)
 
-    return Response(stream_with_context(generate()), headers=headers)
+    # Queued - batched with other purges by the background worker
+    purge_cloudflare_cache(purge_urls)
+
+
+def queue_trim_job(video, start, end=None, mode=None):
+    """Register a trim job and start it; returns the job id."""
+    job_id = str(uuid.uuid4())[:8]
+    with conversion_lock:
+        conversion_jobs[job_id] = {
+            'job_id': job_id,
+            'video_id': video['id'],
+            'filename': os.path.basename(video.get('url', '') or video.get('local_file', '') or ''),
+            'title': video.get('title', ''),
+            'status': 'queued',
+            'progress': 0,
+            'session_id': session.get('_id', request.remote_addr),
+            'created_at': datetime.now().isoformat(),
+            'error': None
+        }
+        job = dict(conversion_jobs[job_id])
+    save_conversion_job(job)
+
+    mode = mode if mode in ('copy', 'smart') else TRIM_MODE
+    thread = threading.Thread(
+        target=background_trim_video,
+        args=(job_id, video['id'], start, end, mode)
+    )
+    thread.daemon = True
+    thread.start()
+    return job_id
 
 
 @app.route('/api/video/<video_id>/set-start-time', methods=['POST'])
 def set_video_start_time(video_id):
-    """Set the start time for a video. When start_time > 0, trims the video file on B2."""
-    import tempfile
+    """Set the start time for a video. When start_time > 0, queues a trim of the file on B2."""
     data = request.json
 
     video = get_video(video_id)
@@ -8004,79 +9961,21 @@ def set_video_start_time(video_id):
 
     # If start_time > 0, trim the actual video file
     if start_time > 0 and USE_S3 and s3_client:
-        video_url = video.get('url', '')
-        if not video_url:
+        if not video.get('url', ''):
             return jsonify({'error': 'Video has no URL'}), 400
-
-        s3_key = get_b2_key_from_url(video_url)
-        if not s3_key:
+        if not get_b2_key_from_url(video['url']):
             return jsonify({'error': 'Could not extract B2 key from video URL'}), 400
 
-        tmp_input = None
-        tmp_output = None
-        try:
-            # Download video to temp file
-            tmp_input = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-            tmp_input.close()
-            print(f"[TRIM] Downloading {video_url} for trim at {start_time}s...")
-            req = urllib.request.Request(video_url, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req) as resp, open(tmp_input.name, 'wb') as f:
-                f.write(resp.read())
-            original_size = os.path.getsize(tmp_input.name)
-
-            # FFmpeg trim (stream copy, no re-encode)
-            tmp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-            tmp_output.close()
-            ffmpeg = get_ffmpeg_path()
-            cmd = [
-                ffmpeg, '-y',
-                '-ss', str(start_time),
-                '-i', tmp_input.name,
-                '-c', 'copy',
-                '-movflags', '+faststart',
-                tmp_output.name
-            ]
-            result = subprocess.run(cmd, capture_output=True, timeout=120)
-            if result.returncode != 0:
-                stderr = result.stderr.decode()[-500:]
-                return jsonify({'error': f'FFmpeg trim failed: {stderr}'}), 500
-
-            trimmed_size = os.path.getsize(tmp_output.name)
-            if trimmed_size < 1000:
-                return jsonify({'error': 'Trimmed file too small, something went wrong'}), 500
-
-            # Re-upload to same B2 key
-            print(f"[TRIM] Uploading trimmed file ({trimmed_size} bytes) to {s3_key}...")
-            upload_to_s3_key(tmp_output.name, s3_key)
-
-            # Purge CDN cache
-            purge_cloudflare_cache(video_url)
-
-            # Update start_time to 0 and mark as trimmed
-            saved_bytes = original_size - trimmed_size
-            supabase.table('videos').update({'start_time': 0, 'trimmed': True}).eq('id', video_id).execute()
-            print(f"[TRIM] Done! Saved {saved_bytes} bytes ({saved_bytes / 1024 / 1024:.1f} MB)")
-            return jsonify({
-                'success': True,
-                'trimmed': True,
-                'message': f'Video trimmed! Saved {saved_bytes / 1024 / 1024:.1f} MB',
-                'start_time': 0,
-                'original_size': original_size,
-                'trimmed_size': trimmed_size,
-                'saved_bytes': saved_bytes
-            })
-        except subprocess.TimeoutExpired:
-            return jsonify({'error': 'FFmpeg trim timed out'}), 500
-        except Exception as e:
-            print(f"[TRIM] Error: {e}")
-            return jsonify({'error': f'Trim failed: {str(e)}'}), 500
-        finally:
-            for f in [tmp_input, tmp_output]:
-                if f:
-                    try:
-                        os.unlink(f.name)
-                    except:
-                        pass
+        # Keep the start time until the trimmed file replaces the original
+        supabase.table('videos').update({'start_time': start_time}).eq('id', video_id).execute()
+        job_id = queue_trim_job(video, start_time, mode=data.get('mode'))
+        return jsonify({
+            'success': True,
+            'queued': True,
+            'job_id': job_id,
+            'message': 'Trim queued',
+            'start_time': start_time
+        })
     else:
         # start_time == 0: just save it (clear start time)
         try:
@@ -8100,71 +9999,330 @@ def mark_video_trimmed(video_id):
     return jsonify({'success': True, 'message': 'Marked as trimmed'})
 
 
-@app.route('/api/video/<video_id>/capture-frame')
-def capture_video_frame(video_id):
-    """Capture a frame from a video at a given timestamp. Used for OCR on cross-origin videos."""
-    import tempfile
+def fetch_video_sidecar(sidecar_url):
+    """Raw bytes of a sidecar file (keyframe index, preview track) from local storage or S3/B2."""
+    if sidecar_url.startswith('/static/videos/'):
+        with open(os.path.join(VIDEOS_FOLDER, os.path.basename(sidecar_url)), 'rb') as f:
+            return f.read()
+    url = normalize_b2_url(sidecar_url)
+    if S3_PRIVATE_BUCKET and get_b2_key_from_url(url):
+        url = get_s3_presigned_url(get_b2_key_from_url(url)) or url
+    req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
+    with urllib.request.urlopen(req, timeout=15) as resp:
+        return resp.read()
+
+
+def preview_sidecar_urls(vtt_url):
+    """URLs of a stored preview track and every sprite sheet its cues point at."""
+    try:
+        body = fetch_video_sidecar(vtt_url).decode('utf-8')
+    except Exception as e:
+        print(f"[PREVIEW] Error reading track {vtt_url}: {e}")
+        return [vtt_url]
+    sheets = dict.fromkeys(line.split('#', 1)[0] for line in body.split('\n') if '#xywh=' in line)
+    return [vtt_url] + list(sheets)
+
+
+# Parsed keyframe indexes for frame capture, cached per process. A trim on
+# another worker can leave a stale index for up to KEYFRAME_INDEX_TTL seconds.
+KEYFRAME_INDEX_TTL = 300
+KEYFRAME_INDEX_CACHE_SIZE = 32
+keyframe_index_cache = {}  # video_id -> (expires_at, index or None)
+
+
+def get_keyframe_index(video):
+    """Parsed keyframe index of a video, or None if it has none."""
+    video_id = video['id']
+    cached = keyframe_index_cache.get(video_id)
+    if cached and cached[0] > time.time():
+        return cached[1]
+
+    index = None
+    if video.get('keyframe_index'):
+        try:
+            index = json.loads(fetch_video_sidecar(video['keyframe_index']))
+        except Exception as e:
+            print(f"[KEYFRAMES] Error loading index for {video_id}: {e}")
+    if len(keyframe_index_cache) >= KEYFRAME_INDEX_CACHE_SIZE:
+        keyframe_index_cache.pop(min(keyframe_index_cache, key=lambda k: keyframe_index_cache[k][0]), None)
+    keyframe_index_cache[video_id] = (time.time() + KEYFRAME_INDEX_TTL, index)
+    return index
 
+
+@app.route('/api/video/<video_id>/keyframes')
+def get_video_keyframes(video_id):
+    """Serve the keyframe/frame-timestamp index sidecar for a video (same-origin for the player)."""
     video = get_video(video_id)
-    if not video:
-        return jsonify({'error': 'Video not found'}), 404
+    if not video or not video.get('keyframe_index'):
+        return jsonify({'error': 'No keyframe index for this video'}), 404
+
+    try:
+        body = fetch_video_sidecar(video['keyframe_index'])
+    except Exception as e:
+        print(f"[KEYFRAMES] Error fetching index for {video_id}: {e}")
+        return jsonify({'error': 'Keyframe index unavailable'}), 502
+
+    # Trims rewrite the index in place, so clients revalidate against the ETag
+    response = Response(body, mimetype='application/json', headers={'Cache-Control': 'no-cache'})
+    response.add_etag()
+    return response.make_conditional(request)
 
-    t = request.args.get('t', '0')
 
-    # Determine video URL
+@app.route('/api/video/<video_id>/preview.vtt')
+def get_video_preview_track(video_id):
+    """Serve the scrub preview WebVTT track for a video (same-origin for the player)."""
+    video = get_video(video_id)
+    if not video or not video.get('preview_vtt'):
+        return jsonify({'error': 'No preview track for this video'}), 404
+
+    try:
+        body = fetch_video_sidecar(video['preview_vtt'])
+    except Exception as e:
+        print(f"[PREVIEW] Error fetching track for {video_id}: {e}")
+        return jsonify({'error': 'Preview track unavailable'}), 502
+
+    # Trims replace the track, so clients revalidate against the ETag
+    if not S3_PRIVATE_BUCKET:
+        response = Response(body, mimetype='text/vtt', headers={'Cache-Control': 'no-cache'})
+        response.add_etag()
+        return response.make_conditional(request)
+
+    # Private bucket: point the cues at presigned sheet URLs. Signatures are
+    # cached, so the rewritten track (and its ETag) is stable between refreshes.
+    lines = body.decode('utf-8').split('\n')
+    sheets = {}
+    for line in lines:
+        if '#xywh=' in line:
+            sheet = line.split('#', 1)[0]
+            key = get_b2_key_from_url(normalize_b2_url(sheet))
+            if key:
+                sheets[sheet] = key
+    signed = get_cached_presigned_urls(list(sheets.values()))
+    for i, line in enumerate(lines):
+        sheet, _, fragment = line.partition('#')
+        if fragment and sheets.get(sheet) in signed:
+            lines[i] = f"{signed[sheets[sheet]]}#{fragment}"
+    response = Response('\n'.join(lines), mimetype='text/vtt', headers={'Cache-Control': 'private, no-cache'})
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+# Frame capture for OCR on cross-origin videos. Requested times are snapped to
+# the presentation time of the frame shown at that moment (from the keyframe
+# index when there is one), so nearby requests share a cache entry. Misses are
+# extracted in one ffmpeg run per group of nearby times: the input is opened
+# once, seeked to the keyframe before the first time and decoded up to the
+# last, and a select filter keeps just the wanted frames.
+FRAME_BATCH_MAX = int(os.environ.get('FRAME_BATCH_MAX', '60'))
+FRAME_BATCH_SPAN = float(os.environ.get('FRAME_BATCH_SPAN', '20'))  # Max seconds decoded by one ffmpeg run
+FRAME_BATCH_GROUPS = int(os.environ.get('FRAME_BATCH_GROUPS', '3'))  # Max ffmpeg runs per batch request
+FRAME_CAPTURE_TIMEOUT = int(os.environ.get('FRAME_CAPTURE_TIMEOUT', '60'))
+FRAME_WIDTHS = (160, 320, 640, 1280, 1920)
+
+
+def frame_capture_source(video):
+    """URL or local path to capture frames from, or None."""
     url = video.get('url', '')
     if not url and video.get('local_file'):
-        url = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'videos', video['local_file'])
+        url = os.path.join(VIDEOS_FOLDER, video['local_file'])
+    elif url.startswith('/static/videos/'):
+        url = os.path.join(VIDEOS_FOLDER, os.path.basename(url))
+    return url or None
 
-    if not url:
-        return jsonify({'error': 'No video source'}), 400
 
-    try:
-        temp_out = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
-        temp_out.close()
-
-        ffmpeg_cmd = get_ffmpeg_path()
-        cmd = [
-            ffmpeg_cmd, '-y',
-            '-ss', str(t),
-            '-i', url,
-            '-frames:v', '1',
-            '-q:v', '2',
-            temp_out.name
-        ]
-        result = subprocess.run(cmd, capture_output=True, timeout=30)
+def snap_frame_time(index, t):
+    """Presentation time of the frame on screen at t (t itself, to the ms, without an index)."""
+    frames = (index or {}).get('frames')
+    if not frames:
+        return round(max(0.0, t), 3)
+    i = bisect.bisect_right(frames, t + 0.0005) - 1
+    return frames[max(0, i)]
 
-        if result.returncode != 0 or not os.path.exists(temp_out.name) or os.path.getsize(temp_out.name) == 0:
-            os.unlink(temp_out.name)
-            return jsonify({'error': 'Frame capture failed'}), 500
 
-        response = send_from_directory(
-            os.path.dirname(temp_out.name),
-            os.path.basename(temp_out.name),
-            mimetype='image/jpeg'
-        )
+def keyframe_before(index, t):
+    """Last keyframe at or before t, or None without an index."""
+    keyframes = (index or {}).get('keyframes')
+    if not keyframes:
+        return None
+    i = bisect.bisect_right(keyframes, t + 0.0005) - 1
+    return keyframes[max(0, i)]
 
-        @response.call_on_close
-        def cleanup():
-            try:
-                os.unlink(temp_out.name)
-            except:
-                pass
 
-        return response
+def extract_frames(source, times, out_dir, width=None, index=None):
+    """Capture the frames at sorted times into out_dir in one ffmpeg run. Returns {t: jpeg path}."""
+    keyframe = keyframe_before(index, times[0])
+    if keyframe is not None:
+        # Seek straight to the keyframe; the select filter skips to the exact frames
+        seek = ['-noaccurate_seek', '-ss', str(keyframe)]
+    else:
+        seek = ['-ss', str(times[0])]
+        keyframe = times[0]
+    # For each time, select the first frame at or after it
+    select = '+'.join(f'gte(t,{t - 0.0005:.4f})*(isnan(prev_pts)+lt(prev_pts*TB,{t - 0.0005:.4f}))'
+                      for t in times)
+    filters = f"select='{select}',showinfo" + (f',scale={width}:-2' if width else '')
+
+    cmd = ([get_ffmpeg_path(), '-hide_banner', '-y', '-copyts'] + seek
+           + ['-t', str(times[-1] - keyframe + 1)] + ffmpeg_input_args(source)
+           + ['-vf', filters, '-fps_mode', 'vfr', '-frames:v', str(len(times)), '-q:v', '2',
+              os.path.join(out_dir, 'frame_%04d.jpg')])
+    result = subprocess.run(cmd, capture_output=True, timeout=FRAME_CAPTURE_TIMEOUT)
+    stderr = result.stderr.decode(errors='replace')
+    if result.returncode != 0:
+        print(f"[FRAMES] ffmpeg failed: {stderr[-300:]}", flush=True)
+        return {}
+
+    # showinfo logs each selected frame in output order; a frame serves every
+    # requested time it is the first frame at or after
+    paths = {}
+    pending = list(times)
+    for n, m in enumerate(SHOWINFO_PTS_RE.finditer(stderr)):
+        pts = float(m.group(1))
+        path = os.path.join(out_dir, f'frame_{n + 1:04d}.jpg')
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            continue
+        while pending and pts >= pending[0] - 0.0005:
+            paths[pending.pop(0)] = path
+    return paths
+
+
+def capture_frames(video, times, width=None, max_groups=None):
+    """Return {snapped_t: cached jpeg path} for the requested times, extracting the misses.
+
+    Raises ValueError before extracting anything if the misses need more than
+    max_groups ffmpeg runs.
+    """
+    import tempfile
+
+    index = get_keyframe_index(video) if video.get('keyframe_index') else None
+    snapped = sorted({snap_frame_time(index, t) for t in times})
+    frames = {}
+    missing = []
+    for t in snapped:
+        path = get_cached_frame(frame_cache_key(video['id'], t, width))
+        if path:
+            frames[t] = path
+        else:
+            missing.append(t)
+    source = frame_capture_source(video) if missing else None
+    if not source:
+        return frames
+
+    # Group nearby times so each ffmpeg run decodes at most FRAME_BATCH_SPAN seconds
+    groups = [[missing[0]]]
+    for t in missing[1:]:
+        if t - groups[-1][0] > FRAME_BATCH_SPAN:
+            groups.append([t])
+        else:
+            groups[-1].append(t)
+    if max_groups and len(groups) > max_groups:
+        raise ValueError(f'Times span {len(groups)} capture runs (at most {max_groups}); '
+                         f'request frames within {FRAME_BATCH_SPAN:g}s of each other')
+
+    started = time.time()
+    os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+    for group in groups:
+        # Extract inside the cache dir so frames are moved into place, not copied
+        temp_dir = tempfile.mkdtemp(prefix='.capture-', dir=FRAME_CACHE_DIR)
+        try:
+            stored = {}
+            for t, path in extract_frames(source, group, temp_dir, width, index).items():
+                key = frame_cache_key(video['id'], t, width)
+                if path in stored:
+                    frames[t] = store_frame(stored[path], key, copy=True)
+                else:
+                    frames[t] = stored[path] = store_frame(path, key)
+        except Exception as e:
+            print(f"[FRAMES] Capture failed for {video['id']}: {e}", flush=True)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    print(f"[FRAMES] {video['id']}: {len(missing)} captured in {len(groups)} ffmpeg run(s) "
+          f"({time.time() - started:.1f}s), {len(snapped) - len(missing)} cached", flush=True)
+    evict_frame_cache()
+    return frames
+
+
+@app.route('/api/video/<video_id>/capture-frame')
+def capture_video_frame(video_id):
+    """Capture a frame from a video at a given timestamp. Used for OCR on cross-origin videos.
 
+    Query: t (seconds), optional w (output width). Frames are served from the
+    frame cache; X-Frame-Time is the presentation time of the returned frame.
+    """
+    video = get_video(video_id)
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    if not frame_capture_source(video):
+        return jsonify({'error': 'No video source'}), 400
+
+    try:
+        t = float(request.args.get('t', '0'))
+        width = int(request.args['w']) if request.args.get('w') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid t or w'}), 400
+    if width and width not in FRAME_WIDTHS:
+        return jsonify({'error': f'w must be one of {list(FRAME_WIDTHS)}'}), 400
+
+    try:
+        frames = capture_frames(video, [t], width)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    if not frames:
+        return jsonify({'error': 'Frame capture failed'}), 500
+
+    frame_time, path = next(iter(frames.items()))
+    response = send_from_directory(FRAME_CACHE_DIR, os.path.basename(path), mimetype='image/jpeg')
+    response.headers['X-Frame-Time'] = str(frame_time)
+    response.headers['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@app.route('/api/video/<video_id>/capture-frames', methods=['POST'])
+@login_required
+def capture_video_frames(video_id):
+    """Capture many frames at once (one ffmpeg run per group of nearby times).
+
+    Body: {"times": [seconds, ...], "width": optional}. Returns the frame time
+    and a capture-frame URL (served from the cache) for each requested time.
+    """
+    video = get_video(video_id)
+    if not video:
+        return jsonify({'error': 'Video not found'}), 404
+    if not frame_capture_source(video):
+        return jsonify({'error': 'No video source'}), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        times = [float(t) for t in data.get('times', [])]
+        width = int(data['width']) if data.get('width') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid times or width'}), 400
+    if not times:
+        return jsonify({'error': 'No times given'}), 400
+    if len(times) > FRAME_BATCH_MAX:
+        return jsonify({'error': f'At most {FRAME_BATCH_MAX} times per request'}), 400
+    if width and width not in FRAME_WIDTHS:
+        return jsonify({'error': f'width must be one of {list(FRAME_WIDTHS)}'}), 400
+
+    try:
+        frames = capture_frames(video, times, width, max_groups=FRAME_BATCH_GROUPS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    index = get_keyframe_index(video) if video.get('keyframe_index') else None
+    results = []
+    for t in times:
+        frame_time = snap_frame_time(index, t)
+        url = None
+        if frame_time in frames:
+            url = f'/api/video/{video_id}/capture-frame?t={frame_time}' + (f'&w={width}' if width else '')
+        results.append({'t': t, 'frame_time': frame_time, 'url': url})
+    return jsonify({'success': True, 'frames': results})
 
 
 @app.route('/api/video/<video_id>/trim', methods=['POST'])
 @chief_judge_required
 def trim_video(video_id):
-    """Trim a video to save storage space (chief judge/admin only)."""
-    import subprocess
-    import tempfile
-    import shutil
-
+    """Queue a trim of a video to save storage space (chief judge/admin only)."""
     data = request.json
     start = float(data.get('start', 0))
     end = float(data.get('end', 0))
@@ -8176,96 +10334,48 @@ def trim_video(video_id):
     if not video:
         return jsonify({'error': 'Video not found'}), 404
 
-    video_src = video.get('video_src', '')
-    if not video_src:
-        return jsonify({'error': 'No video source found'}), 400
-
-    # Only allow trimming local/S3 videos
-    if not (video.get('is_local') or video.get('is_direct_url')):
+    source, _ = resolve_trim_source(video)
+    if not source:
         return jsonify({'error': 'Can only trim local or S3 videos'}), 400
+    if not source.startswith(('http://', 'https://')) and not os.path.exists(source):
+        return jsonify({'error': 'Video file not found on server'}), 404
 
-    try:
-        # Determine the actual file path
-        if video_src.startswith('/static/videos/'):
-            # Local file
-            local_path = os.path.join(os.path.dirname(__file__), video_src.lstrip('/'))
-            is_s3 = False
-        elif 's3.amazonaws.com' in video_src or 's3.' in video_src:
-            # S3 file - download first
-            is_s3 = True
-            import urllib.request
-            temp_input = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-            req = urllib.request.Request(video_src, headers={'User-Agent': 'Mozilla/5.0'})
-            with urllib.request.urlopen(req) as resp, open(temp_input.name, 'wb') as f:
-                f.write(resp.read())
-            local_path = temp_input.name
-        else:
-            return jsonify({'error': 'Cannot trim this video type'}), 400
+    job_id = queue_trim_job(video, start, end, mode=data.get('mode'))
+    return jsonify({'success': True, 'queued': True, 'job_id': job_id, 'message': 'Trim queued'})
 
-        if not os.path.exists(local_path):
-            return jsonify({'error': 'Video file not found on server'}), 404
 
-        # Create temp output file
-        temp_output = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
-        temp_output.close()
-
-        # Calculate duration
-        duration = end - start
-
-        # Use FFmpeg to trim the video
-        cmd = [
-            'ffmpeg', '-y',
-            '-ss', str(start),
-            '-i', local_path,
-            '-t', str(duration),
-            '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-preset', 'fast',
-            '-movflags', '+faststart',
-            temp_output.name
-        ]
+@app.route('/api/videos/trim-batch', methods=['POST'])
+@chief_judge_required
+def trim_videos_batch():
+    """Queue trims for many videos at once.
 
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=600)
+    Body: {"items": [{"video_id": ..., "start": ..., "end": ...}], "mode": "copy"|"smart"}.
+    Items without a start use the video's saved start_time.
+    """
+    data = request.json or {}
+    items = data.get('items') or [{'video_id': vid} for vid in data.get('video_ids', [])]
 
-        if result.returncode != 0:
-            os.unlink(temp_output.name)
-            return jsonify({'error': f'FFmpeg error: {result.stderr[:200]}'}), 500
-
-        # Get new file size
-        new_size = os.path.getsize(temp_output.name)
-
-        if is_s3:
-            # Re-upload to S3
-            new_url = upload_to_s3_from_path(temp_output.name, folder='videos')
-            os.unlink(temp_input.name)  # Clean up downloaded file
-            os.unlink(temp_output.name)
-
-            if new_url:
-                # Update database with new URL
-                supabase.table('videos').update({
-                    'video_src': new_url,
-                    'start_time': 0  # Reset start time since video is trimmed
-                }).eq('id', video_id).execute()
-                return jsonify({'success': True, 'message': f'Video trimmed and re-uploaded. New size: {new_size // 1024}KB'})
-            else:
-                return jsonify({'error': 'Failed to upload trimmed video to S3'}), 500
-        else:
-            # Replace local file
-            original_size = os.path.getsize(local_path)
-            shutil.move(temp_output.name, local_path)
+    jobs = []
+    skipped = []
+    for item in items:
+        video = get_video(item.get('video_id', ''))
+        if not video:
+            skipped.append({'video_id': item.get('video_id'), 'error': 'Video not found'})
+            continue
+        start = float(item.get('start', video.get('start_time') or 0))
+        end = float(item['end']) if item.get('end') else None
+        if start <= 0 and not end:
+            skipped.append({'video_id': video['id'], 'error': 'Nothing to trim'})
+            continue
+        if not resolve_trim_source(video)[0]:
+            skipped.append({'video_id': video['id'], 'error': 'Can only trim local or S3 videos'})
+            continue
+        jobs.append((video, start, end))
 
-            # Reset start time in database
-            supabase.table('videos').update({'start_time': 0}).eq('id', video_id).execute()
-            saved = original_size - new_size
-            return jsonify({
-                'success': True,
-                'message': f'Video trimmed. Saved {saved // 1024}KB ({saved // 1024 // 1024}MB)'
-            })
+    job_ids = {video['id']: queue_trim_job(video, start, end, data.get('mode'))
+               for video, start, end in jobs}
 
-    except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Trimming timed out - video may be too large'}), 500
-    except Exception as e:
-        return jsonify({'error': f'Error trimming video: {str(e)}'}), 500
+    return jsonify({'success': True, 'queued': len(job_ids), 'jobs': job_ids, 'skipped': skipped})
 
 
 @app.route('/api/videos-by-event')
@@ -8355,6 +10465,7 @@ def search():
 
         videos.sort(key=lambda v: parse_team_round(v.get('title', '')))
 
+    sign_video_urls(videos)
     return render_template('search.html',
                          query=query,
                          videos=videos,
@@ -8376,6 +10487,7 @@ def event_page(event_name):
             videos_by_category[cat] = []
         videos_by_category[cat].append(video)
 
+    sign_video_urls(videos)
     return render_template('event.html',
                          event_name=event_name,
                          videos=videos,
@@ -10963,6 +13075,8 @@ def update_team(team_id):
         'display_order': data.get('display_order', team.get('display_order', 0)),
         'created_at': team['created_at']
     }
+    if team_data['photo'] != team.get('photo'):
+        team_data['photo_variants'] = None  # Variants were built from the old photo
 
     save_team(team_data)
     return jsonify({'success': True, 'message': 'Team updated'})
@@ -11008,13 +13122,16 @@ def upload_team_photo(team_id):
     photo_path = os.path.join(VIDEOS_FOLDER, photo_filename)
     file.save(photo_path)
 
-    # Update team with photo path
+    # Update team with photo path and its resized variants
     team['photo'] = f"/static/videos/{photo_filename}"
+    variants = store_image_variants(photo_path, f"team-{team_id}")
+    team['photo_variants'] = json.dumps(variants) if variants else None
     save_team(team)
 
     return jsonify({
         'success': True,
-        'photo_url': team['photo']
+        'photo_url': team['photo'],
+        'photo_variants': variants
     })
 
 
@@ -12337,7 +14454,7 @@ def create_sync_room():
         return jsonify({'error': 'Video not found'}), 404
 
     room_id = str(uuid.uuid4())[:8]
-    sync_rooms[room_id] = {
+    set_shared_state('sync_room', room_id, {
         'video_id': video_id,
         'video': video,
         'event_judge': session.get('username'),
@@ -12345,7 +14462,7 @@ def create_sync_room():
         'state': 'waiting',
         'play_time': None,
         'created_at': datetime.now().isoformat()
-    }
+    })
 
     return jsonify({'success': True, 'room_id': room_id})
 
@@ -12354,11 +14471,13 @@ def create_sync_room():
 @login_required
 def sync_room_page(room_id):
     """Join a sync viewing room."""
-    if room_id not in sync_rooms:
+    room = get_shared_state('sync_room', room_id)
+    if not room:
         return "Room not found", 404
 
-    room = sync_rooms[room_id]
     video = room.get('video') or get_video(room['video_id'])
+    if video:
+        resolve_video_src(video)
     is_event_judge = session.get('username') == room['event_judge']
 
     return render_template('sync_room.html',
@@ -12374,10 +14493,10 @@ def sync_room_page(room_id):
 @login_required
 def sync_room_status(room_id):
     """Get current room status."""
-    if room_id not in sync_rooms:
+    room = get_shared_state('sync_room', room_id)
+    if not room:
         return jsonify({'error': 'Room not found'}), 404
 
-    room = sync_rooms[room_id]
     return jsonify({
         'state': room['state'],
         'judges': room['judges'],
@@ -12438,6 +14557,123 @@ def generate_room_code():
             return code
     return ''.join(random.choices(chars, k=8))
 
+# Next-video prefetch for scoring rooms. When a video is attached, the room
+# works out what comes next (explicit queue, competition running order or the
+# assigned judges' pending assignments), warms the CDN/edge cache for those
+# videos and hints connected judges to preload them.
+PREFETCH_AHEAD = int(os.environ.get('PREFETCH_AHEAD', '3'))
+PREFETCH_BYTES = int(os.environ.get('PREFETCH_BYTES_MB', '4')) * 1024 * 1024
+PREFETCH_TTL = 600  # Don't re-warm the same URL within this many seconds
+_prefetch_recent = {}  # {url: last warmed timestamp}
+_prefetch_lock = threading.Lock()
+
+
+def _team_number_key(team):
+    num = str(team.get('team_number', ''))
+    return (0, int(num), '') if num.isdigit() else (1, 0, num)
+
+
+def get_upcoming_video_ids(room, video_id, explicit=None, limit=None):
+    """Video ids expected after video_id in this room, in playing order."""
+    limit = limit or PREFETCH_AHEAD
+    if explicit:
+        ids = [v for v in explicit if v and v != video_id]
+        return ids[:limit]
+
+    # Competition running order: later teams in this round, then the next round
+    try:
+        result = supabase.table('competition_scores').select('competition_id, team_id, round_num').eq('video_id', video_id).limit(1).execute()
+        if result.data:
+            current = result.data[0]
+            teams = get_competition_teams(current['competition_id'])
+            order = {t['id']: i for i, t in enumerate(sorted(teams, key=_team_number_key))}
+            rows = supabase.table('competition_scores').select('team_id, round_num, video_id').eq('competition_id', current['competition_id']).execute().data
+            rows = [r for r in rows if r.get('video_id') and r['team_id'] in order]
+            rows.sort(key=lambda r: (r['round_num'], order[r['team_id']]))
+            here = (current['round_num'], order.get(current['team_id'], -1))
+            ids = [r['video_id'] for r in rows
+                   if (r['round_num'], order[r['team_id']]) > here and r['video_id'] != video_id]
+            if ids:
+                return list(dict.fromkeys(ids))[:limit]
+    except Exception as e:
+        print(f"[PREFETCH] Competition lookup failed for {video_id}: {e}")
+
+    # Assignment list of the first assigned judge
+    for username in (room.get('assigned_judges') or {}).values():
+        try:
+            pending = [a for a in reversed(get_assignments_for_user(username)) if a.get('status') != 'completed']
+        except Exception as e:
+            print(f"[PREFETCH] Assignment lookup failed for {username}: {e}")
+            break
+        ids = [a['video_id'] for a in pending]
+        if video_id in ids:
+            ids = ids[ids.index(video_id) + 1:]
+        return [v for v in ids if v != video_id][:limit]
+    return []
+
+
+def warm_video(video):
+    """Pull a video into the venue edge cache, or its first bytes into the CDN edge."""
+    url = normalize_b2_url(video.get('url', '') or '')
+    if not url.startswith(('http://', 'https://')):
+        return
+    now = time.time()
+    with _prefetch_lock:
+        if now - _prefetch_recent.get(url, 0) < PREFETCH_TTL:
+            return
+        _prefetch_recent[url] = now
+
+    upstream = url
+    if S3_PRIVATE_BUCKET and get_b2_key_from_url(url):
+        upstream = get_s3_presigned_url(get_b2_key_from_url(url)) or url
+    try:
+        if EDGE_CACHE_ENABLED:
+            fetch_to_cache(edge_cache_key(video), upstream, wait_timeout=0)
+        else:
+            req = urllib.request.Request(upstream, headers={
+                'User-Agent': 'Mozilla/5.0', 'Range': f'bytes=0-{PREFETCH_BYTES - 1}'})
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                while resp.read(1024 * 1024):
+                    pass
+        print(f"[PREFETCH] Warmed {video['id']}")
+    except Exception as e:
+        with _prefetch_lock:
+            _prefetch_recent.pop(url, None)
+        print(f"[PREFETCH] Warm failed for {video['id']}: {e}")
+
+
+def prefetch_upcoming(room_code, room, video_id, explicit=None):
+    """Record the room's upcoming videos, hint connected judges and warm caches in the background.
+
+    The caller saves the room afterwards; returns the prefetch hint list.
+    """
+    upcoming = []
+    videos = []
+    for vid in get_upcoming_video_ids(room, video_id, explicit):
+        video = get_video(vid)
+        if not video:
+            continue
+        resolve_video_src(video)
+        if video.get('is_direct_url') and video.get('video_src'):
+            videos.append(video)
+            upcoming.append({'video_id': vid, 'video_src': video['video_src']})
+
+    room['upcoming'] = upcoming
+    if not upcoming:
+        return upcoming
+
+    if SOCKETIO_ENABLED and socketio:
+        socketio.emit('ws_scoring_prefetch', {'videos': upcoming}, room=room_code)
+
+    def run():
+        for video in videos:
+            warm_video(video)
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return upcoming
+
+
 @app.route('/scoring/create', methods=['POST'])
 @login_required
 def create_ws_scoring_room():
@@ -12466,20 +14702,10 @@ def create_ws_scoring_room():
         video = get_video(video_id)
         if video:
             # Prefer direct URL (B2/CDN) over server proxy for better performance
-            if video.get('url') and is_direct_video_url(video.get('url', '')):
-                video['video_src'] = video['url']
-                video['is_direct_url'] = True
-            elif video.get('video_type') == 'pcloud' and video.get('local_file'):
-                video['video_src'] = f'/pcloud/stream/{video["local_file"]}'
-                video['is_direct_url'] = True
-            elif video.get('video_type') == 'local' and video.get('local_file'):
-                video['video_src'] = f'/static/videos/{video["local_file"]}'
-                video['is_direct_url'] = True
-            elif video.get('url'):
-                video['embed_url'] = get_video_embed_url(video.get('url', ''))
-                video['is_direct_url'] = False
+            resolve_video_src(video)
         room['video_id'] = video_id
         room['video'] = video
+        prefetch_upcoming(room_code, room, video_id, data.get('upcoming'))
 
     _set_ws_room(room_code, room)
     return jsonify({'success': True, 'room_code': room_code})
@@ -12497,18 +14723,7 @@ def ws_scoring_join_page(room_code):
     if not video and room.get('video_id'):
         video = get_video(room['video_id'])
         if video:
-            if video.get('video_type') == 'pcloud' and video.get('local_file'):
-                video['video_src'] = f'/pcloud/stream/{video["local_file"]}'
-                video['is_direct_url'] = True
-            elif video.get('url') and is_direct_video_url(video.get('url', '')):
-                video['video_src'] = video['url']
-                video['is_direct_url'] = True
-            elif video.get('video_type') == 'local' and video.get('local_file'):
-                video['video_src'] = f'/static/videos/{video["local_file"]}'
-                video['is_direct_url'] = True
-            elif video.get('url'):
-                video['embed_url'] = get_video_embed_url(video.get('url', ''))
-                video['is_direct_url'] = False
+            resolve_video_src(video)
 
     return render_template('judge_scoring.html',
                          room_code=room_code,
@@ -12545,21 +14760,10 @@ def ws_scoring_attach_video():
     if video_id:
         video = get_video(video_id)
         if video:
-            if video.get('video_type') == 'pcloud' and video.get('local_file'):
-                video['video_src'] = f'/pcloud/stream/{video["local_file"]}'
-                video['is_direct_url'] = True
-            elif video.get('url') and is_direct_video_url(video.get('url', '')):
-                video['video_src'] = video['url']
-                video['is_direct_url'] = True
-            elif video.get('video_type') == 'local' and video.get('local_file'):
-                video['video_src'] = f'/static/videos/{video["local_file"]}'
-                video['is_direct_url'] = True
-            elif video.get('url'):
-                video['embed_url'] = get_video_embed_url(video.get('url', ''))
-                video['is_direct_url'] = False
+            resolve_video_src(video)
             room['video_id'] = video_id
             room['video'] = video
-            _set_ws_room(room_code, room)
+            _update_ws_room_meta(room_code, video_id=video_id, video=video)
             # Notify connected judges about the new video
             if SOCKETIO_ENABLED and socketio:
                 video_info = {}
@@ -12568,6 +14772,9 @@ def ws_scoring_attach_video():
                 elif video.get('embed_url'):
                     video_info = {'embed_url': video['embed_url'], 'is_direct_url': False}
                 socketio.emit('ws_scoring_video_attached', video_info, room=room_code)
+            # Then get the next videos ready
+            prefetch_upcoming(room_code, room, video_id, data.get('upcoming'))
+            _update_ws_room_meta(room_code, upcoming=room.get('upcoming', []))
     return jsonify({'success': True})
 
 
@@ -12592,25 +14799,94 @@ def list_permanent_rooms():
 
 # SocketIO events for sync viewing
 if SOCKETIO_ENABLED:
+    # Clients estimate their clock offset from the server with NTP-style
+    # clock_ping/clock_pong exchanges and report {offset, rtt, jitter}, which
+    # is stored on their judge entry. X-press times are converted to server
+    # time with that offset, so the start tolerance only has to absorb the
+    # measured jitter, and playback starts at a scheduled server timestamp.
+    SYNC_START_TOLERANCE = 0.5  # seconds - sync room judges must press X within this time
+    CLOCK_JITTER_ALLOWANCE_MAX = float(os.environ.get('CLOCK_JITTER_ALLOWANCE_MAX', '0.25'))
+    SYNC_PLAY_LEAD = float(os.environ.get('SYNC_PLAY_LEAD', '0.5'))  # min seconds between sync_play and play_at
+
+    def _clock_stats(data):
+        """Validate a clock_report payload into {offset, rtt, jitter} (seconds)."""
+        try:
+            clock = {k: float(data.get(k)) for k in ('offset', 'rtt', 'jitter')}
+        except (TypeError, ValueError):
+            return None
+        if clock['rtt'] < 0 or clock['jitter'] < 0:
+            return None
+        return clock
+
+    def _to_server_time(press_time, judge):
+        return press_time + (judge.get('clock') or {}).get('offset', 0)
+
+    def _sync_tolerance(base, judges):
+        """Start tolerance widened by the worst measured jitter (capped)."""
+        jitter = max([(j.get('clock') or {}).get('jitter', 0) for j in judges] or [0])
+        return base + min(jitter, CLOCK_JITTER_ALLOWANCE_MAX)
+
+    def _play_at(judges):
+        """Server timestamp far enough ahead for every judge to receive the start."""
+        rtt = max([(j.get('clock') or {}).get('rtt', 0) for j in judges] or [0])
+        return time.time() + max(SYNC_PLAY_LEAD, 2 * rtt)
+
+    @socketio.on('clock_ping')
+    def on_clock_ping(data):
+        received = time.time()
+        emit('clock_pong', {'t0': data.get('t0'), 't1': received, 't2': time.time()})
+
+    @socketio.on('clock_report')
+    def on_clock_report(data):
+        """Store a judge's clock offset/latency estimate and show it to the room."""
+        clock = _clock_stats(data)
+        if not clock:
+            return
+
+        def store(judge_key):
+            def update(state):
+                judge = state['judges'].get(judge_key)
+                if judge:
+                    judge['clock'] = clock
+                return judge is not None
+            return update
+
+        if data.get('room_id'):
+            room_id = data['room_id']
+            room, found = update_shared_state('sync_room', room_id, store(data.get('username')))
+            if room and found:
+                emit('room_update', {'judges': room['judges'], 'state': room['state']}, room=room_id)
+        elif data.get('session_id'):
+            session_id = data['session_id']
+            session, found = update_shared_state('panel_session', session_id, store(str(data.get('judge_num'))))
+            if session and found:
+                emit('panel_update', {'judges': session['judges'], 'state': session['state']}, room=session_id)
+
+    def _reset_sync_judges(room):
+        for judge in room['judges'].values():
+            judge['ready'] = False
+            judge['start_time'] = None
+
     @socketio.on('join_sync_room')
     def on_join_sync_room(data):
         room_id = data.get('room_id')
         username = data.get('username')
         is_event_judge = data.get('is_event_judge', False)
 
-        if room_id not in sync_rooms:
+        def join(room):
+            if not is_event_judge:
+                room['judges'][username] = {
+                    'ready': False,
+                    'start_time': None,
+                    'joined_at': datetime.now().isoformat()
+                }
+
+        room, _ = update_shared_state('sync_room', room_id, join)
+        if not room:
             emit('error', {'message': 'Room not found'})
             return
 
         join_room(room_id)
-        room = sync_rooms[room_id]
-
-        if not is_event_judge:
-            room['judges'][username] = {
-                'ready': False,
-                'start_time': None,
-                'joined_at': datetime.now().isoformat()
-            }
 
         # Broadcast updated judge list to everyone in room
         emit('room_update', {
@@ -12623,13 +14899,13 @@ if SOCKETIO_ENABLED:
         room_id = data.get('room_id')
         username = data.get('username')
 
-        if room_id in sync_rooms:
+        room, _ = update_shared_state('sync_room', room_id,
+                                      lambda room: room['judges'].pop(username, None))
+        if room:
             leave_room(room_id)
-            if username in sync_rooms[room_id]['judges']:
-                del sync_rooms[room_id]['judges'][username]
             emit('room_update', {
-                'judges': sync_rooms[room_id]['judges'],
-                'state': sync_rooms[room_id]['state']
+                'judges': room['judges'],
+                'state': room['state']
             }, room=room_id)
 
     @socketio.on('event_judge_play')
@@ -12638,22 +14914,22 @@ if SOCKETIO_ENABLED:
         room_id = data.get('room_id')
         username = data.get('username')
 
-        if room_id not in sync_rooms:
-            return
+        def play(room):
+            if username != room['event_judge']:
+                return False
+            room['state'] = 'syncing'
+            room['play_time'] = time.time()
+            # Reset all judge ready states
+            _reset_sync_judges(room)
+            return True
 
-        room = sync_rooms[room_id]
-        if username != room['event_judge']:
+        room, allowed = update_shared_state('sync_room', room_id, play)
+        if not room:
+            return
+        if not allowed:
             emit('error', {'message': 'Only event judge can control playback'})
             return
 
-        import time
-        room['state'] = 'syncing'
-        room['play_time'] = time.time()
-        # Reset all judge ready states
-        for judge in room['judges']:
-            room['judges'][judge]['ready'] = False
-            room['judges'][judge]['start_time'] = None
-
         # Tell all judges to prepare and press X
         emit('prepare_to_start', {
             'play_time': room['play_time'],
@@ -12667,168 +14943,571 @@ if SOCKETIO_ENABLED:
         username = data.get('username')
         press_time = data.get('press_time')
 
-        if room_id not in sync_rooms:
-            return
-
-        room = sync_rooms[room_id]
-        if username not in room['judges']:
-            return
-
-        import time
-        room['judges'][username]['ready'] = True
-        room['judges'][username]['start_time'] = press_time
+        def press(room):
+            if username not in room['judges']:
+                return None
+            room['judges'][username]['ready'] = True
+            room['judges'][username]['start_time'] = press_time
 
-        # Check if all judges have pressed X
-        all_ready = all(j['ready'] for j in room['judges'].values())
+            # Check if all judges have pressed X
+            if not all(j['ready'] for j in room['judges'].values()):
+                return 'waiting'
 
-        if all_ready and len(room['judges']) > 0:
-            # Check timing tolerance (0.5 seconds)
-            start_times = [j['start_time'] for j in room['judges'].values()]
+            # Check timing tolerance on server-clock press times
+            judges = list(room['judges'].values())
+            start_times = [_to_server_time(j['start_time'], j) for j in judges]
             time_spread = max(start_times) - min(start_times)
-
-            if time_spread <= 0.5:
-                # All within tolerance - play video
+            tolerance = _sync_tolerance(SYNC_START_TOLERANCE, judges)
+            if time_spread <= tolerance:
                 room['state'] = 'playing'
-                emit('sync_play', {
-                    'message': 'All judges synchronized! Playing video.',
-                    'sync_successful': True
-                }, room=room_id)
-            else:
-                # Outside tolerance - reset
-                room['state'] = 'waiting'
-                for judge in room['judges']:
-                    room['judges'][judge]['ready'] = False
-                    room['judges'][judge]['start_time'] = None
-
-                emit('sync_failed', {
-                    'message': f'Timing spread was {time_spread:.2f}s (max 0.5s). Video reset. Event judge must press Play again.',
-                    'time_spread': time_spread
-                }, room=room_id)
-        else:
+                room['play_at'] = _play_at(judges)
+                return 'play'
+            room['state'] = 'waiting'
+            _reset_sync_judges(room)
+            return time_spread, tolerance
+
+        room, outcome = update_shared_state('sync_room', room_id, press)
+        if not room or outcome is None:
+            return
+
+        if outcome == 'play':
+            # All within tolerance - every client starts at the same server time
+            emit('sync_play', {
+                'message': 'All judges synchronized! Playing video.',
+                'sync_successful': True,
+                'play_at': room['play_at'],
+                'server_time': time.time()
+            }, room=room_id)
+        elif outcome == 'waiting':
             # Update room status - waiting for other judges
             emit('room_update', {
                 'judges': room['judges'],
                 'state': room['state'],
                 'waiting_for': [j for j, d in room['judges'].items() if not d['ready']]
             }, room=room_id)
+        else:
+            # Outside tolerance - reset
+            time_spread, tolerance = outcome
+            emit('sync_failed', {
+                'message': f'Timing spread was {time_spread:.2f}s (max {tolerance:.2f}s). Video reset. Event judge must press Play again.',
+                'time_spread': time_spread,
+                'tolerance': tolerance
+            }, room=room_id)
 
     @socketio.on('video_ended')
     def on_video_ended(data):
         """Video playback ended."""
         room_id = data.get('room_id')
 
-        if room_id in sync_rooms:
-            room = sync_rooms[room_id]
+        def ended(room):
             room['state'] = 'waiting'
-            for judge in room['judges']:
-                room['judges'][judge]['ready'] = False
-                room['judges'][judge]['start_time'] = None
+            _reset_sync_judges(room)
 
+        room, _ = update_shared_state('sync_room', room_id, ended)
+        if room:
             emit('room_update', {
                 'judges': room['judges'],
                 'state': room['state']
             }, room=room_id)
 
-    # WS real-time multi-judge scoring rooms — Redis-backed with file fallback
+    # WS real-time multi-judge scoring rooms — Redis-backed with file fallback.
+    # In Redis each room is a set of hashes so judges can update their own
+    # fields without rewriting the whole room:
+    #   ws_room:<code>:meta    field -> JSON value (state, scoring_type, panel_size, ...)
+    #   ws_room:<code>:judges  judge_num -> JSON {name, connected, sid, confirmed}
+    #   ws_room:<code>:scores  "<judge_num>:<field>" -> JSON value
+    #   ws_room:<code>:marks   judge_num -> working-time start mark
+    # plus the set ws_rooms of all room codes. Confirm and finalize run as Lua
+    # scripts so they are atomic across gunicorn workers.
     WS_ROOMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ws_scoring_rooms.json')
+    WS_ROOMS_SET = 'ws_rooms'
+    # username -> JSON {room_code, judge_num} for assigned judges, so a judge's
+    # presence ping finds their room with one HGET instead of reading every room
+    WS_JUDGE_INDEX = 'ws_judge_rooms'
+    WS_PRESENCE_KEY = 'ws_judge_presence'  # username -> socket sid, shared across workers
+    _WS_ROOM_PARTS = ('meta', 'judges', 'scores', 'marks')
+    _WS_NON_META = ('judges', 'scores', 'video', 'start_marks')
     _ws_rooms_memory = {}
 
+    # Without Redis, room changes are appended to a journal (WS_ROOMS_FILE.journal)
+    # and fsynced by a background task every WS_JOURNAL_FLUSH seconds, so a
+    # score keystroke only costs an in-memory append. Once the journal grows
+    # past WS_JOURNAL_COMPACT_BYTES it is folded into a fresh snapshot.
+    WS_JOURNAL_FILE = WS_ROOMS_FILE + '.journal'
+    WS_JOURNAL_FLUSH = float(os.environ.get('WS_JOURNAL_FLUSH', '0.5'))
+    WS_JOURNAL_COMPACT_BYTES = int(os.environ.get('WS_JOURNAL_COMPACT_KB', '1024')) * 1024
+    _ws_journal_pending = []
+    _ws_journal_state = {'started': False}
+
+    def _ws_saveable_judge(info):
+        """A judge as persisted: sockets do not survive a restart, so no sid and not connected."""
+        return {'name': info.get('name', ''), 'connected': False}
+
+    def _ws_saveable_room(room):
+        r = dict(room)
+        r['judges'] = {str(k): _ws_saveable_judge(v) for k, v in r.get('judges', {}).items()}
+        r.pop('video', None)
+        r['scores'] = {str(k): v for k, v in r.get('scores', {}).items()}
+        return r
+
     def _save_ws_rooms():
-        """Persist in-memory rooms to disk (fallback mode)."""
+        """Write a full snapshot of the in-memory rooms (fallback mode)."""
         try:
-            saveable = {}
-            for code, room in _ws_rooms_memory.items():
-                r = dict(room)
-                r['judges'] = {str(k): {'name': v.get('name', ''), 'connected': False}
-                               for k, v in r.get('judges', {}).items()}
-                r.pop('video', None)
-                r['scores'] = {str(k): v for k, v in r.get('scores', {}).items()}
-                saveable[code] = r
-            with open(WS_ROOMS_FILE, 'w') as f:
+            saveable = {code: _ws_saveable_room(room) for code, room in _ws_rooms_memory.items()}
+            tmp_path = WS_ROOMS_FILE + '.tmp'
+            with open(tmp_path, 'w') as f:
                 json.dump(saveable, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, WS_ROOMS_FILE)
         except Exception as e:
             print(f"[WS_ROOMS] Error saving rooms to file: {e}")
 
+    def _ws_journal(entry):
+        """Queue a room mutation for the journal."""
+        _ws_journal_pending.append(entry)
+        if not _ws_journal_state['started']:
+            _ws_journal_state['started'] = True
+            socketio.start_background_task(_ws_journal_writer)
+
+    def _ws_journal_room(code):
+        room = _ws_rooms_memory.get(code)
+        if room is not None:
+            _ws_journal({'op': 'room', 'code': code, 'room': _ws_saveable_room(room)})
+
+    def _ws_flush_journal():
+        """Append queued mutations to the journal and fsync; compact when large."""
+        if not _ws_journal_pending:
+            return
+        entries = _ws_journal_pending[:]
+        del _ws_journal_pending[:len(entries)]
+        try:
+            with open(WS_JOURNAL_FILE, 'a') as f:
+                f.write(''.join(json.dumps(e) + '\n' for e in entries))
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.getsize(WS_JOURNAL_FILE) > WS_JOURNAL_COMPACT_BYTES:
+                # Snapshot first: replaying the journal over a newer snapshot is harmless
+                _save_ws_rooms()
+                open(WS_JOURNAL_FILE, 'w').close()
+        except Exception as e:
+            print(f"[WS_ROOMS] Error writing journal: {e}")
+
+    def _ws_journal_writer():
+        while True:
+            socketio.sleep(WS_JOURNAL_FLUSH)
+            _ws_flush_journal()
+
+    def _ws_apply_journal_entry(rooms, entry):
+        op, code = entry.get('op'), entry.get('code')
+        if op == 'room':
+            rooms[code] = entry['room']
+        elif op == 'del':
+            rooms.pop(code, None)
+        elif code in rooms:
+            room = rooms[code]
+            if op == 'meta':
+                room.update(entry['fields'])
+            elif op == 'score':
+                room.setdefault('scores', {}).setdefault(str(entry['judge']), {})[entry['field']] = entry['value']
+            elif op == 'judge':
+                room.setdefault('judges', {})[str(entry['judge'])] = _ws_saveable_judge(entry['data'])
+            elif op == 'mark':
+                room.setdefault('start_marks', {})[entry['judge']] = entry['value']
+
     def _load_ws_rooms():
-        """Load rooms from disk."""
+        """Load the rooms snapshot from disk and replay the journal on top."""
+        rooms = {}
         try:
             if os.path.exists(WS_ROOMS_FILE):
                 with open(WS_ROOMS_FILE, 'r') as f:
                     rooms = json.load(f)
-                for code, room in rooms.items():
-                    room['scores'] = {int(k): v for k, v in room.get('scores', {}).items()}
-                    room['judges'] = {int(k) if str(k).isdigit() else k: v
-                                      for k, v in room.get('judges', {}).items()}
-                return rooms
         except Exception as e:
             print(f"[WS_ROOMS] Error loading rooms from file: {e}")
-        return {}
+        try:
+            if os.path.exists(WS_JOURNAL_FILE):
+                replayed = 0
+                with open(WS_JOURNAL_FILE, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            break  # Torn write at the tail from a crash
+                        _ws_apply_journal_entry(rooms, entry)
+                        replayed += 1
+                if replayed:
+                    print(f"[WS_ROOMS] Replayed {replayed} journal entries")
+        except Exception as e:
+            print(f"[WS_ROOMS] Error replaying journal: {e}")
+        for code, room in rooms.items():
+            room['scores'] = {int(k): v for k, v in room.get('scores', {}).items()}
+            room['judges'] = {int(k) if str(k).isdigit() else k: v
+                              for k, v in room.get('judges', {}).items()}
+        return rooms
+
+    def _ws_keys(code):
+        return [f'ws_room:{code}:{part}' for part in _WS_ROOM_PARTS]
+
+    def _ws_judge_key(k):
+        return int(k) if str(k).isdigit() else k
+
+    def _ws_decode_scores(flat, panel_size):
+        """Turn the scores hash back into {judge_num: {field: value}}."""
+        scores = {j: {} for j in range(1, panel_size + 1)}
+        for key, val in flat.items():
+            judge, _, field = key.partition(':')
+            scores.setdefault(_ws_judge_key(judge), {})[field] = json.loads(val)
+        return scores
+
+    def _ws_decode_room(meta, judges, scores, marks):
+        room = {k: json.loads(v) for k, v in meta.items()}
+        room['judges'] = {_ws_judge_key(k): json.loads(v) for k, v in judges.items()}
+        room['scores'] = _ws_decode_scores(scores, room.get('panel_size', 3))
+        if marks:
+            room['start_marks'] = {k: json.loads(v) for k, v in marks.items()}
+        return room
+
+    def _ws_encode_scores(scores):
+        return {f'{j}:{field}': json.dumps(val)
+                for j, fields in scores.items() for field, val in fields.items()}
+
+    # Shared Lua: clear the round's scores and confirmations
+    _WS_LUA_RESET = """
+    local function reset_round(meta, judges, scores, clear_video)
+        redis.call('DEL', scores)
+        local jall = redis.call('HGETALL', judges)
+        for i = 1, #jall, 2 do
+            local info = cjson.decode(jall[i + 1])
+            if info['confirmed'] then
+                info['confirmed'] = false
+                redis.call('HSET', judges, jall[i], cjson.encode(info))
+            end
+        end
+        redis.call('HSET', meta, 'state', '"scoring"')
+        if clear_video then
+            redis.call('HDEL', meta, 'video_id')
+        end
+    end
+    local function panel_size(meta)
+        local raw = redis.call('HGET', meta, 'panel_size')
+        return raw and tonumber(cjson.decode(raw)) or 3
+    end
+    """
+
+    # KEYS: meta, judges, scores. ARGV: judge_num, then field/JSON value pairs.
+    # Returns {'err', message} or {'ok', all_confirmed, judges, scores}; the
+    # round is reset in the same call when every panel slot has confirmed.
+    _WS_LUA_CONFIRM = _WS_LUA_RESET + """
+    local meta, judges, scores = KEYS[1], KEYS[2], KEYS[3]
+    local judge = ARGV[1]
+    local state = redis.call('HGET', meta, 'state')
+    if not state or cjson.decode(state) ~= 'scoring' then
+        return {'err', 'Cannot confirm - scoring not active'}
+    end
+    local raw = redis.call('HGET', judges, judge)
+    if not raw then
+        return {'err', 'Judge not found in room'}
+    end
+    local prefix = judge .. ':'
+    for _, f in ipairs(redis.call('HKEYS', scores)) do
+        if string.sub(f, 1, #prefix) == prefix then
+            redis.call('HDEL', scores, f)
+        end
+    end
+    for i = 2, #ARGV, 2 do
+        redis.call('HSET', scores, prefix .. ARGV[i], ARGV[i + 1])
+    end
+    local info = cjson.decode(raw)
+    info['confirmed'] = true
+    redis.call('HSET', judges, judge, cjson.encode(info))
+
+    local size = panel_size(meta)
+    local confirmed = 0
+    local jall = redis.call('HGETALL', judges)
+    for i = 1, #jall, 2 do
+        local n = tonumber(jall[i])
+        local j = cjson.decode(jall[i + 1])
+        if n and n >= 1 and n <= size and j['connected'] == true and j['confirmed'] == true then
+            confirmed = confirmed + 1
+        end
+    end
+    local sall = redis.call('HGETALL', scores)
+    local all_confirmed = confirmed == size
+    if all_confirmed then
+        reset_round(meta, judges, scores, true)
+    end
+    return {'ok', all_confirmed and 1 or 0, jall, sall}
+    """
+
+    # KEYS: meta, judges, scores. Returns {'err', message} or {'ok', judges, scores}.
+    _WS_LUA_FINALIZE = _WS_LUA_RESET + """
+    local meta, judges, scores = KEYS[1], KEYS[2], KEYS[3]
+    local size = panel_size(meta)
+    local jall = redis.call('HGETALL', judges)
+    local missing = nil
+    for i = 1, #jall, 2 do
+        local n = tonumber(jall[i])
+        local j = cjson.decode(jall[i + 1])
+        if n and n >= 1 and n <= size and j['connected'] == true and j['confirmed'] ~= true then
+            if not missing or n < missing then
+                missing = n
+            end
+        end
+    end
+    if missing then
+        return {'err', 'J' .. missing .. ' has not confirmed their score'}
+    end
+    local sall = redis.call('HGETALL', scores)
+    reset_round(meta, judges, scores, true)
+    return {'ok', jall, sall}
+    """
+
+    # KEYS: meta, judges, scores. ARGV: clear_video (0/1).
+    _WS_LUA_RESET_ROUND = _WS_LUA_RESET + """
+    reset_round(KEYS[1], KEYS[2], KEYS[3], ARGV[1] == '1')
+    return 1
+    """
+
+    # KEYS: meta, judges, scores. ARGV: JSON scoring type, minimum panel size.
+    # Switches the scoring type and starts a fresh round; returns the panel size.
+    _WS_LUA_SET_TYPE = _WS_LUA_RESET + """
+    local size = math.max(panel_size(KEYS[1]), tonumber(ARGV[2]))
+    redis.call('HSET', KEYS[1], 'scoring_type', ARGV[1], 'panel_size', cjson.encode(size))
+    reset_round(KEYS[1], KEYS[2], KEYS[3], false)
+    return size
+    """
+
+    # KEYS: meta, judges, scores. ARGV: panel size. Drops scores of judges beyond
+    # the panel and clears confirmations; returns the remaining scores (flat).
+    _WS_LUA_SET_PANEL_SIZE = """
+    local size = tonumber(ARGV[1])
+    redis.call('HSET', KEYS[1], 'panel_size', cjson.encode(size))
+    for _, f in ipairs(redis.call('HKEYS', KEYS[3])) do
+        local n = tonumber(string.match(f, '^(%d+):'))
+        if n and n > size then
+            redis.call('HDEL', KEYS[3], f)
+        end
+    end
+    local jall = redis.call('HGETALL', KEYS[2])
+    for i = 1, #jall, 2 do
+        local info = cjson.decode(jall[i + 1])
+        if info['confirmed'] then
+            info['confirmed'] = false
+            redis.call('HSET', KEYS[2], jall[i], cjson.encode(info))
+        end
+    end
+    return redis.call('HGETALL', KEYS[3])
+    """
+
+    # KEYS: judges. ARGV: judge_num, JSON fields to merge, required sid ('' = any).
+    # Returns the merged judge JSON, or nil if the judge is missing or the sid differs.
+    _WS_LUA_UPDATE_JUDGE = """
+    local raw = redis.call('HGET', KEYS[1], ARGV[1])
+    if not raw then
+        return nil
+    end
+    local info = cjson.decode(raw)
+    if ARGV[3] ~= '' and info['sid'] ~= ARGV[3] then
+        return nil
+    end
+    for k, v in pairs(cjson.decode(ARGV[2])) do
+        info[k] = v
+    end
+    local encoded = cjson.encode(info)
+    redis.call('HSET', KEYS[1], ARGV[1], encoded)
+    return encoded
+    """
+
+    _ws_scripts = {}
+    if REDIS_AVAILABLE and redis_client:
+        _ws_scripts = {
+            'confirm': redis_client.register_script(_WS_LUA_CONFIRM),
+            'finalize': redis_client.register_script(_WS_LUA_FINALIZE),
+            'reset_round': redis_client.register_script(_WS_LUA_RESET_ROUND),
+            'update_judge': redis_client.register_script(_WS_LUA_UPDATE_JUDGE),
+            'set_type': redis_client.register_script(_WS_LUA_SET_TYPE),
+            'set_panel_size': redis_client.register_script(_WS_LUA_SET_PANEL_SIZE),
+        }
+
+    def _ws_pairs(flat):
+        """Redis HGETALL reply from Lua (flat list) as a dict."""
+        return dict(zip(flat[::2], flat[1::2])) if flat else {}
+
+    def _get_ws_room(code):
+        """Get a room by code. Redis-backed with in-memory fallback."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                pipe = redis_client.pipeline(transaction=False)
+                for key in _ws_keys(code):
+                    pipe.hgetall(key)
+                meta, judges, scores, marks = pipe.execute()
+                if not meta:
+                    return None
+                return _ws_decode_room(meta, judges, scores, marks)
+            except Exception as e:
+                print(f"[REDIS] Error getting room {code}: {e}")
+        return _ws_rooms_memory.get(code)
 
-    def _get_ws_room(code):
-        """Get a room by code. Redis-backed with in-memory fallback."""
+    def _get_ws_room_meta(code):
+        """Room settings and state without judges or scores (one HGETALL)."""
         if REDIS_AVAILABLE and redis_client:
             try:
-                data = redis_client.get(f'ws_room:{code}')
-                if data:
-                    room = json.loads(data)
-                    room['scores'] = {int(k): v for k, v in room.get('scores', {}).items()}
-                    room['judges'] = {int(k) if str(k).isdigit() else k: v
-                                      for k, v in room.get('judges', {}).items()}
-                    return room
-                return None
+                meta = redis_client.hgetall(f'ws_room:{code}:meta')
+                return {k: json.loads(v) for k, v in meta.items()} if meta else None
             except Exception as e:
-                print(f"[REDIS] Error getting room {code}: {e}")
+                print(f"[REDIS] Error getting room meta {code}: {e}")
         return _ws_rooms_memory.get(code)
 
     def _set_ws_room(code, room):
-        """Save a room. Redis-backed with in-memory fallback."""
+        """Replace a whole room. Use the field-level helpers for judge activity."""
         if REDIS_AVAILABLE and redis_client:
             try:
-                saveable = dict(room)
-                saveable['judges'] = {str(k): v for k, v in saveable.get('judges', {}).items()}
-                saveable['scores'] = {str(k): v for k, v in saveable.get('scores', {}).items()}
-                saveable.pop('video', None)
-                redis_client.set(f'ws_room:{code}', json.dumps(saveable))
+                meta_key, judges_key, scores_key, marks_key = _ws_keys(code)
+                meta = {k: json.dumps(v) for k, v in room.items() if k not in _WS_NON_META}
+                judges = {str(k): json.dumps(v) for k, v in room.get('judges', {}).items()}
+                scores = _ws_encode_scores(room.get('scores', {}))
+                marks = {str(k): json.dumps(v) for k, v in room.get('start_marks', {}).items()}
+                pipe = redis_client.pipeline()
+                pipe.delete(meta_key, judges_key, scores_key, marks_key)
+                pipe.hset(meta_key, mapping=meta)
+                if judges:
+                    pipe.hset(judges_key, mapping=judges)
+                if scores:
+                    pipe.hset(scores_key, mapping=scores)
+                if marks:
+                    pipe.hset(marks_key, mapping=marks)
+                pipe.sadd(WS_ROOMS_SET, code)
+                pipe.execute()
                 return
             except Exception as e:
                 print(f"[REDIS] Error saving room {code}: {e}")
         _ws_rooms_memory[code] = room
-        _save_ws_rooms()
+        _ws_journal_room(code)
+
+    def _update_ws_room_meta(code, **fields):
+        """Set room settings (state, video_id, ...) without touching judges or scores."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                meta = {k: json.dumps(v) for k, v in fields.items() if k not in _WS_NON_META}
+                if meta:
+                    redis_client.hset(f'ws_room:{code}:meta', mapping=meta)
+                return
+            except Exception as e:
+                print(f"[REDIS] Error updating room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is not None:
+            room.update(fields)
+            _ws_journal({'op': 'meta', 'code': code,
+                         'fields': {k: v for k, v in fields.items() if k != 'video'}})
 
     def _del_ws_room(code):
         """Delete a room."""
+        meta = _get_ws_room_meta(code)
+        if meta and meta.get('assigned_judges'):
+            _ws_index_judges(code, {}, meta['assigned_judges'])
         if REDIS_AVAILABLE and redis_client:
             try:
-                redis_client.delete(f'ws_room:{code}')
+                pipe = redis_client.pipeline()
+                pipe.delete(*_ws_keys(code))
+                pipe.srem(WS_ROOMS_SET, code)
+                pipe.execute()
                 return
             except Exception as e:
                 print(f"[REDIS] Error deleting room {code}: {e}")
         _ws_rooms_memory.pop(code, None)
-        _save_ws_rooms()
+        _ws_journal({'op': 'del', 'code': code})
+
+    def _ws_index_judges(code, judges, previous=None):
+        """Point each assigned username at this room, dropping users no longer assigned here."""
+        entries = {username: {'room_code': code, 'judge_num': int(num)}
+                   for num, username in (judges or {}).items() if username}
+        stale = [u for u in (previous or {}).values() if u and u not in entries]
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                if stale:
+                    current = redis_client.hmget(WS_JUDGE_INDEX, stale)
+                    stale = [u for u, v in zip(stale, current)
+                             if v and json.loads(v).get('room_code') == code]
+                pipe = redis_client.pipeline()
+                if stale:
+                    pipe.hdel(WS_JUDGE_INDEX, *stale)
+                if entries:
+                    pipe.hset(WS_JUDGE_INDEX, mapping={u: json.dumps(e) for u, e in entries.items()})
+                pipe.execute()
+                return
+            except Exception as e:
+                print(f"[REDIS] Error indexing judges for room {code}: {e}")
+        for username in stale:
+            if (_ws_judge_index.get(username) or {}).get('room_code') == code:
+                del _ws_judge_index[username]
+        _ws_judge_index.update(entries)
+
+    def _ws_unindex_judge(username, code):
+        """Remove a user's assignment if it still points at this room."""
+        _ws_index_judges(code, {}, {'0': username})
+
+    def _ws_lookup_judge(username):
+        """Return {room_code, judge_num} for an assigned judge, or None."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                value = redis_client.hget(WS_JUDGE_INDEX, username)
+                return json.loads(value) if value else None
+            except Exception as e:
+                print(f"[REDIS] Error looking up judge {username}: {e}")
+        return _ws_judge_index.get(username)
+
+    def _ws_set_presence(username, sid):
+        _ws_presence_map[username] = sid
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                redis_client.hset(WS_PRESENCE_KEY, username, sid)
+            except Exception as e:
+                print(f"[REDIS] Error setting presence for {username}: {e}")
+
+    def _ws_get_presence(username):
+        """Socket sid of an online judge on any worker, or None."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                return redis_client.hget(WS_PRESENCE_KEY, username)
+            except Exception as e:
+                print(f"[REDIS] Error getting presence for {username}: {e}")
+        return _ws_presence_map.get(username)
+
+    def _ws_clear_presence(sid):
+        """Drop presence for a disconnected socket (always one of this worker's)."""
+        for username, psid in list(_ws_presence_map.items()):
+            if psid != sid:
+                continue
+            del _ws_presence_map[username]
+            if REDIS_AVAILABLE and redis_client:
+                try:
+                    if redis_client.hget(WS_PRESENCE_KEY, username) == sid:
+                        redis_client.hdel(WS_PRESENCE_KEY, username)
+                except Exception as e:
+                    print(f"[REDIS] Error clearing presence for {username}: {e}")
+            break
+
+    def _ws_rebuild_judge_index(rooms):
+        """Rebuild the username index from the rooms' assigned_judges."""
+        for code, room in rooms.items():
+            if room.get('assigned_judges'):
+                _ws_index_judges(code, room['assigned_judges'])
 
     def _get_all_ws_rooms():
         """Get all rooms as a dict."""
         if REDIS_AVAILABLE and redis_client:
             try:
+                codes = sorted(redis_client.smembers(WS_ROOMS_SET))
+                pipe = redis_client.pipeline(transaction=False)
+                for code in codes:
+                    for key in _ws_keys(code):
+                        pipe.hgetall(key)
+                values = pipe.execute()
                 rooms = {}
-                cursor = 0
-                while True:
-                    cursor, keys = redis_client.scan(cursor, match='ws_room:*', count=100)
-                    if keys:
-                        pipe = redis_client.pipeline()
-                        for key in keys:
-                            pipe.get(key)
-                        values = pipe.execute()
-                        for key, val in zip(keys, values):
-                            if val:
-                                c = key.replace('ws_room:', '', 1)
-                                room = json.loads(val)
-                                room['scores'] = {int(k): v for k, v in room.get('scores', {}).items()}
-                                room['judges'] = {int(k) if str(k).isdigit() else k: v
-                                                  for k, v in room.get('judges', {}).items()}
-                                rooms[c] = room
-                    if cursor == 0:
-                        break
+                for i, code in enumerate(codes):
+                    meta, judges, scores, marks = values[i * 4:i * 4 + 4]
+                    if meta:
+                        rooms[code] = _ws_decode_room(meta, judges, scores, marks)
                 return rooms
             except Exception as e:
                 print(f"[REDIS] Error getting all rooms: {e}")
@@ -12838,24 +15517,296 @@ if SOCKETIO_ENABLED:
         """Check if a room exists."""
         if REDIS_AVAILABLE and redis_client:
             try:
-                return redis_client.exists(f'ws_room:{code}') > 0
+                return redis_client.exists(f'ws_room:{code}:meta') > 0
             except Exception as e:
                 print(f"[REDIS] Error checking room {code}: {e}")
         return code in _ws_rooms_memory
 
+    # Per-process cache of rooms known to exist, for the video sync relays that
+    # fire many times a second. Only hits are cached; a deleted room may keep
+    # relaying for up to WS_ROOM_EXISTS_TTL seconds, which is harmless.
+    WS_ROOM_EXISTS_TTL = 5
+    _ws_room_exists_cache = {}  # code -> expires_at
+
+    def _ws_room_exists_cached(code):
+        if not code:
+            return False
+        now = time.time()
+        if _ws_room_exists_cache.get(code, 0) > now:
+            return True
+        if _ws_room_exists(code):
+            _ws_room_exists_cache[code] = now + WS_ROOM_EXISTS_TTL
+            return True
+        _ws_room_exists_cache.pop(code, None)
+        return False
+
+    def _ws_set_score(code, judge_num, field, value):
+        """Set one judge's score field. Returns the room's scores afterwards."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                scores_key = f'ws_room:{code}:scores'
+                pipe = redis_client.pipeline()
+                pipe.hset(scores_key, f'{judge_num}:{field}', json.dumps(value))
+                pipe.hgetall(scores_key)
+                return pipe.execute()[1]
+            except Exception as e:
+                print(f"[REDIS] Error setting score in room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is None:
+            return {}
+        room['scores'].setdefault(judge_num, {})[field] = value
+        _ws_journal({'op': 'score', 'code': code, 'judge': judge_num, 'field': field, 'value': value})
+        return _ws_encode_scores(room['scores'])
+
+    def _ws_get_judge(code, judge_num):
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                raw = redis_client.hget(f'ws_room:{code}:judges', str(judge_num))
+                return json.loads(raw) if raw else None
+            except Exception as e:
+                print(f"[REDIS] Error getting judge in room {code}: {e}")
+        room = _ws_rooms_memory.get(code) or {}
+        return room.get('judges', {}).get(judge_num)
+
+    def _ws_set_judge(code, judge_num, judge):
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                redis_client.hset(f'ws_room:{code}:judges', str(judge_num), json.dumps(judge))
+                return
+            except Exception as e:
+                print(f"[REDIS] Error setting judge in room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is not None:
+            room.setdefault('judges', {})[judge_num] = judge
+            _ws_journal({'op': 'judge', 'code': code, 'judge': judge_num, 'data': judge})
+
+    def _ws_update_judge(code, judge_num, fields, sid=None):
+        """Atomically merge fields into a judge. If sid is given, only while that
+        socket still owns the slot. Returns the updated judge or None."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                raw = _ws_scripts['update_judge'](keys=[f'ws_room:{code}:judges'],
+                                                  args=[str(judge_num), json.dumps(fields), sid or ''])
+                return json.loads(raw) if raw else None
+            except Exception as e:
+                print(f"[REDIS] Error updating judge in room {code}: {e}")
+        judge = (_ws_rooms_memory.get(code) or {}).get('judges', {}).get(judge_num)
+        if judge is None or (sid and judge.get('sid') != sid):
+            return None
+        judge.update(fields)
+        _ws_journal({'op': 'judge', 'code': code, 'judge': judge_num, 'data': judge})
+        return judge
+
+    def _ws_reset_round_memory(room, clear_video):
+        room['scores'] = {j: {} for j in range(1, room.get('panel_size', 3) + 1)}
+        room['state'] = 'scoring'
+        for j in room.get('judges', {}):
+            room['judges'][j]['confirmed'] = False
+        if clear_video:
+            room.pop('video', None)
+            room.pop('video_id', None)
+
+    def _ws_reset_round(code, clear_video=False):
+        """Clear scores and confirmations and go back to scoring."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                _ws_scripts['reset_round'](keys=_ws_keys(code)[:3], args=['1' if clear_video else '0'])
+                return
+            except Exception as e:
+                print(f"[REDIS] Error resetting room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is not None:
+            _ws_reset_round_memory(room, clear_video)
+            _ws_journal_room(code)
+
+    def _ws_set_scoring_type(code, scoring_type, min_panel_size):
+        """Switch scoring type (growing the panel to at least min_panel_size) and
+        start a fresh round. Returns the panel size."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                return int(_ws_scripts['set_type'](keys=_ws_keys(code)[:3],
+                                                   args=[json.dumps(scoring_type), min_panel_size]))
+            except Exception as e:
+                print(f"[REDIS] Error setting scoring type in room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is None:
+            return min_panel_size
+        room['scoring_type'] = scoring_type
+        room['panel_size'] = max(room.get('panel_size', min_panel_size), min_panel_size)
+        _ws_reset_round_memory(room, False)
+        _ws_journal_room(code)
+        return room['panel_size']
+
+    def _ws_set_panel_size(code, panel_size):
+        """Resize the panel, dropping scores of judges beyond it and clearing
+        confirmations. Returns the scores as {judge_num: {field: value}}."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                flat = _ws_scripts['set_panel_size'](keys=_ws_keys(code)[:3], args=[panel_size])
+                return _ws_decode_scores(_ws_pairs(flat), panel_size)
+            except Exception as e:
+                print(f"[REDIS] Error setting panel size in room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is None:
+            return {}
+        room['panel_size'] = panel_size
+        room['scores'] = {j: room.get('scores', {}).get(j, {}) for j in range(1, panel_size + 1)}
+        for j in room.get('judges', {}):
+            room['judges'][j]['confirmed'] = False
+        _ws_journal_room(code)
+        return room['scores']
+
+    def _ws_snapshot(judges, scores):
+        """Final scores/judges for the overlay, from decoded or raw hashes."""
+        return ({str(k): dict(v) for k, v in scores.items()},
+                {str(j): {'name': info.get('name', '?')} for j, info in judges.items()})
+
+    def _ws_confirm(code, judge_num, validated_scores):
+        """Store a judge's confirmed scores; finalize the round if every panel
+        slot has a connected, confirmed judge.
+
+        Returns {'error': msg} or {'all_confirmed', 'judges', 'scores'} where
+        judges/scores are the state at confirmation (before any reset).
+        """
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                args = [str(judge_num)]
+                for field, val in validated_scores.items():
+                    args += [field, json.dumps(val)]
+                result = _ws_scripts['confirm'](keys=_ws_keys(code)[:3], args=args)
+                if result[0] == 'err':
+                    return {'error': result[1]}
+                meta = _get_ws_room_meta(code) or {}
+                judges = {_ws_judge_key(k): json.loads(v) for k, v in _ws_pairs(result[2]).items()}
+                scores = _ws_decode_scores(_ws_pairs(result[3]), meta.get('panel_size', 3))
+                return {'all_confirmed': bool(result[1]), 'judges': judges, 'scores': scores}
+            except Exception as e:
+                print(f"[REDIS] Error confirming scores in room {code}: {e}")
+                return {'error': 'Could not save scores - please try again'}
+
+        room = _ws_rooms_memory.get(code)
+        if not room:
+            return {'error': 'Room not found'}
+        if room['state'] != 'scoring':
+            return {'error': 'Cannot confirm - scoring not active'}
+        if judge_num not in room.get('judges', {}):
+            return {'error': 'Judge not found in room'}
+        room['scores'][judge_num] = validated_scores
+        room['judges'][judge_num]['confirmed'] = True
+        panel_size = room.get('panel_size', 3)
+        confirmed_count = sum(
+            1 for j in range(1, panel_size + 1)
+            if j in room['judges'] and room['judges'][j].get('connected', False) and room['judges'][j].get('confirmed', False)
+        )
+        result = {
+            'all_confirmed': confirmed_count == panel_size,
+            'judges': {j: dict(info) for j, info in room['judges'].items()},
+            'scores': {j: dict(v) for j, v in room['scores'].items()}
+        }
+        if result['all_confirmed']:
+            _ws_reset_round_memory(room, clear_video=True)
+        _ws_journal_room(code)
+        return result
+
+    def _ws_finalize(code):
+        """Finalize the round if all connected judges confirmed.
+
+        Returns {'error': msg} or {'judges', 'scores'} as they were before the reset.
+        """
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                result = _ws_scripts['finalize'](keys=_ws_keys(code)[:3])
+                if result[0] == 'err':
+                    return {'error': result[1]}
+                meta = _get_ws_room_meta(code) or {}
+                judges = {_ws_judge_key(k): json.loads(v) for k, v in _ws_pairs(result[1]).items()}
+                scores = _ws_decode_scores(_ws_pairs(result[2]), meta.get('panel_size', 3))
+                return {'judges': judges, 'scores': scores}
+            except Exception as e:
+                print(f"[REDIS] Error finalizing room {code}: {e}")
+                return {'error': 'Could not finalize - please try again'}
+
+        room = _ws_rooms_memory.get(code)
+        if not room:
+            return {'error': 'Room not found'}
+        for j in range(1, room.get('panel_size', 3) + 1):
+            if j in room.get('judges', {}) and room['judges'][j].get('connected', False):
+                if not room['judges'][j].get('confirmed', False):
+                    return {'error': f'J{j} has not confirmed their score'}
+        result = {
+            'judges': {j: dict(info) for j, info in room['judges'].items()},
+            'scores': {j: dict(v) for j, v in room['scores'].items()}
+        }
+        _ws_reset_round_memory(room, clear_video=True)
+        _ws_journal_room(code)
+        return result
+
+    def _ws_add_start_mark(code, judge_num, video_time):
+        """Record a judge's working-time start mark. Returns all marks."""
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                marks_key = f'ws_room:{code}:marks'
+                pipe = redis_client.pipeline()
+                pipe.hset(marks_key, str(judge_num), json.dumps(video_time))
+                pipe.hgetall(marks_key)
+                return {k: json.loads(v) for k, v in pipe.execute()[1].items()}
+            except Exception as e:
+                print(f"[REDIS] Error saving start mark in room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is None:
+            return {}
+        room.setdefault('start_marks', {})[str(judge_num)] = video_time
+        _ws_journal({'op': 'mark', 'code': code, 'judge': str(judge_num), 'value': video_time})
+        return dict(room['start_marks'])
+
+    def _ws_clear_start_marks(code):
+        if REDIS_AVAILABLE and redis_client:
+            try:
+                redis_client.delete(f'ws_room:{code}:marks')
+                return
+            except Exception as e:
+                print(f"[REDIS] Error clearing start marks in room {code}: {e}")
+        room = _ws_rooms_memory.get(code)
+        if room is not None:
+            room['start_marks'] = {}
+            _ws_journal({'op': 'meta', 'code': code, 'fields': {'start_marks': {}}})
+
     # Track sid -> (room_code, judge_num) for disconnect handling
     _ws_sid_map = {}
 
-    # Track username -> socket_sid for judge presence/auto-connect
+    # Track username -> socket_sid for judges connected to this worker
+    # (mirrored to WS_PRESENCE_KEY in Redis)
     _ws_presence_map = {}
 
+    # Fallback for WS_JUDGE_INDEX when Redis is unavailable
+    _ws_judge_index = {}
+
     # --- Initialize rooms ---
     _ws_rooms_memory = _load_ws_rooms()
+    atexit.register(_ws_flush_journal)
+
+    # One-time migration of rooms stored as single JSON strings (ws_room:<code>)
+    if REDIS_AVAILABLE and redis_client:
+        try:
+            for key in redis_client.scan_iter(match='ws_room:*', count=100):
+                code = key.split(':', 1)[1]
+                if ':' in code or redis_client.type(key) != 'string':
+                    continue
+                data = redis_client.get(key)
+                if data:
+                    room = json.loads(data)
+                    room['scores'] = {int(k): v for k, v in room.get('scores', {}).items()}
+                    room['judges'] = {_ws_judge_key(k): v for k, v in room.get('judges', {}).items()}
+                    _set_ws_room(code, room)
+                redis_client.delete(key)
+                print(f"[REDIS] Migrated room {code} to hash storage")
+        except Exception as e:
+            print(f"[REDIS] Room hash migration error: {e}")
 
     # One-time migration from JSON file to Redis
     if REDIS_AVAILABLE and redis_client:
         try:
-            existing_keys = redis_client.keys('ws_room:*')
+            existing_keys = redis_client.scard(WS_ROOMS_SET)
             if not existing_keys and _ws_rooms_memory:
                 print(f"[REDIS] Migrating {len(_ws_rooms_memory)} rooms from JSON to Redis...")
                 for code, room in _ws_rooms_memory.items():
@@ -12863,10 +15814,20 @@ if SOCKETIO_ENABLED:
                 migrated_path = WS_ROOMS_FILE + '.migrated'
                 if os.path.exists(WS_ROOMS_FILE):
                     os.rename(WS_ROOMS_FILE, migrated_path)
+                if os.path.exists(WS_JOURNAL_FILE):
+                    os.rename(WS_JOURNAL_FILE, WS_JOURNAL_FILE + '.migrated')
                 print("[REDIS] Migration complete")
         except Exception as e:
             print(f"[REDIS] Migration error: {e}")
 
+    # Build the judge index from existing assignments (memory mode, or first
+    # start after the index was introduced)
+    try:
+        if not (REDIS_AVAILABLE and redis_client and redis_client.exists(WS_JUDGE_INDEX)):
+            _ws_rebuild_judge_index(_get_all_ws_rooms())
+    except Exception as e:
+        print(f"[REDIS] Judge index rebuild error: {e}")
+
     # PERMANENT_ROOMS defined at module level above
 
     def _ensure_permanent_rooms():
@@ -12887,15 +15848,13 @@ if SOCKETIO_ENABLED:
                 }
                 _set_ws_room(code, new_room)
             else:
-                changed = False
+                changes = {}
                 if not room.get('permanent'):
-                    room['permanent'] = True
-                    changed = True
+                    changes['permanent'] = True
                 if 'allowed_types' not in room and definition.get('allowed_types'):
-                    room['allowed_types'] = definition['allowed_types']
-                    changed = True
-                if changed:
-                    _set_ws_room(code, room)
+                    changes['allowed_types'] = definition['allowed_types']
+                if changes:
+                    _update_ws_room_meta(code, **changes)
 
     _ensure_permanent_rooms()
 
@@ -12903,18 +15862,15 @@ if SOCKETIO_ENABLED:
     def _reset_all_connected_flags():
         all_rooms = _get_all_ws_rooms()
         for code, room in all_rooms.items():
-            changed = False
             for judge_num, judge in room.get('judges', {}).items():
                 if judge.get('connected'):
-                    judge['connected'] = False
-                    changed = True
-            if changed:
-                _set_ws_room(code, room)
+                    _ws_update_judge(code, judge_num, {'connected': False})
 
     _reset_all_connected_flags()
 
-    # Panel judging sessions for synchronized multi-judge scoring
-    panel_sessions = {}
+    # Panel judging sessions for synchronized multi-judge scoring, kept in the
+    # shared state store (kind 'panel_session') so all workers see every judge.
+    # Judge numbers are stored as string keys since the state round-trips JSON.
     WORKING_TIME_TOLERANCE = 0.5  # seconds - all judges must press X within this time
 
     @socketio.on('create_panel_session')
@@ -12925,7 +15881,7 @@ if SOCKETIO_ENABLED:
         judge_name = data.get('judge_name')
 
         session_id = f"panel_{video_id}_{int(time.time())}"
-        panel_sessions[session_id] = {
+        set_shared_state('panel_session', session_id, {
             'video_id': video_id,
             'panel_size': panel_size,
             'event_judge': judge_name,
@@ -12936,7 +15892,7 @@ if SOCKETIO_ENABLED:
             'x_presses': {},  # {judge_num: timestamp}
             'timer_running': False,
             'timer_start': None
-        }
+        })
 
         join_room(session_id)
 
@@ -12953,25 +15909,34 @@ if SOCKETIO_ENABLED:
         session_id = data.get('session_id')
         judge_name = data.get('judge_name')
         judge_num = data.get('judge_num')
-
-        if session_id not in panel_sessions:
+        judge_key = str(judge_num)
+
+        def join(session):
+            # Check if judge number is already taken
+            if judge_key in session['judges'] and session['judges'][judge_key]['connected']:
+                return 'taken'
+            session['judges'][judge_key] = {
+                'name': judge_name,
+                'connected': True,
+                'ready': False,
+                'x_press_time': None
+            }
+            # Check if all judges have joined
+            connected_judges = sum(1 for j in session['judges'].values() if j['connected'])
+            if connected_judges >= session['panel_size']:
+                session['state'] = 'waiting_for_ready'
+                return 'full'
+            return 'joined'
+
+        session, outcome = update_shared_state('panel_session', session_id, join)
+        if not session:
             emit('panel_error', {'error': 'Session not found'})
             return
-
-        session = panel_sessions[session_id]
-
-        # Check if judge number is already taken
-        if judge_num in session['judges'] and session['judges'][judge_num]['connected']:
+        if outcome == 'taken':
             emit('panel_error', {'error': f'Judge {judge_num} position already taken'})
             return
 
         join_room(session_id)
-        session['judges'][judge_num] = {
-            'name': judge_name,
-            'connected': True,
-            'ready': False,
-            'x_press_time': None
-        }
 
         emit('panel_joined', {
             'session_id': session_id,
@@ -12988,10 +15953,7 @@ if SOCKETIO_ENABLED:
             'message': f'{judge_name} joined as Judge {judge_num}'
         }, room=session_id)
 
-        # Check if all judges have joined
-        connected_judges = sum(1 for j in session['judges'].values() if j['connected'])
-        if connected_judges >= session['panel_size']:
-            session['state'] = 'waiting_for_ready'
+        if outcome == 'full':
             emit('panel_state_change', {
                 'state': 'waiting_for_ready',
                 'message': 'All judges connected. Please confirm ready.'
@@ -13003,12 +15965,20 @@ if SOCKETIO_ENABLED:
         session_id = data.get('session_id')
         judge_num = data.get('judge_num')
 
-        if session_id not in panel_sessions:
-            return
+        def ready(session):
+            judge = session['judges'].get(str(judge_num))
+            if judge:
+                judge['ready'] = True
+            # Check if all judges are ready
+            ready_judges = sum(1 for j in session['judges'].values() if j.get('ready', False))
+            if ready_judges >= session['panel_size']:
+                session['state'] = 'all_ready'
+                return True
+            return False
 
-        session = panel_sessions[session_id]
-        if judge_num in session['judges']:
-            session['judges'][judge_num]['ready'] = True
+        session, all_ready = update_shared_state('panel_session', session_id, ready)
+        if not session:
+            return
 
         emit('panel_update', {
             'judges': session['judges'],
@@ -13016,10 +15986,7 @@ if SOCKETIO_ENABLED:
             'message': f'Judge {judge_num} is ready'
         }, room=session_id)
 
-        # Check if all judges are ready
-        ready_judges = sum(1 for j in session['judges'].values() if j.get('ready', False))
-        if ready_judges >= session['panel_size']:
-            session['state'] = 'all_ready'
+        if all_ready:
             emit('panel_state_change', {
                 'state': 'all_ready',
                 'message': 'All judges ready. Event judge can start video.'
@@ -13031,16 +15998,20 @@ if SOCKETIO_ENABLED:
         session_id = data.get('session_id')
         video_time = data.get('video_time', 0)
 
-        if session_id not in panel_sessions:
-            return
+        def start(session):
+            session['state'] = 'playing'
+            session['video_started'] = True
+            session['x_presses'] = {}  # Reset X presses
+            return _play_at(session['judges'].values())
 
-        session = panel_sessions[session_id]
-        session['state'] = 'playing'
-        session['video_started'] = True
-        session['x_presses'] = {}  # Reset X presses
+        session, start_at = update_shared_state('panel_session', session_id, start)
+        if not session:
+            return
 
         emit('panel_video_start', {
             'video_time': video_time,
+            'start_at': start_at,
+            'server_time': time.time(),
             'message': 'Video started. Press X when working time begins.'
         }, room=session_id)
 
@@ -13051,38 +16022,25 @@ if SOCKETIO_ENABLED:
         judge_num = data.get('judge_num')
         press_time = data.get('press_time')  # Client timestamp
 
-        if session_id not in panel_sessions:
-            return
-
-        session = panel_sessions[session_id]
-
-        if session['state'] != 'playing':
-            return
-
-        # Record this judge's X press time
-        session['x_presses'][judge_num] = press_time
-
-        emit('panel_x_received', {
-            'judge_num': judge_num,
-            'x_presses': list(session['x_presses'].keys())
-        }, room=session_id)
-
-        # Check if all judges have pressed X
-        if len(session['x_presses']) >= session['panel_size']:
-            # Calculate the spread
+        def x_press(session):
+            if session['state'] != 'playing':
+                return None
+            # Record this judge's X press, converted to server time
+            judge = session['judges'].get(str(judge_num)) or {}
+            session['x_presses'][str(judge_num)] = _to_server_time(press_time, judge)
+            pressed = list(session['x_presses'].keys())
+
+            # Check if all judges have pressed X
+            if len(session['x_presses']) < session['panel_size']:
+                return pressed, None, None
             times = list(session['x_presses'].values())
             spread = max(times) - min(times)
-
-            if spread <= WORKING_TIME_TOLERANCE:
+            tolerance = _sync_tolerance(WORKING_TIME_TOLERANCE, session['judges'].values())
+            if spread <= tolerance:
                 # All judges within tolerance - start scoring!
                 session['state'] = 'scoring'
                 session['timer_running'] = True
                 session['timer_start'] = time.time()
-
-                emit('panel_working_time_accepted', {
-                    'spread': spread,
-                    'message': f'Working time started! (spread: {spread:.2f}s)'
-                }, room=session_id)
             else:
                 # Spread too large - reset!
                 session['state'] = 'reset_required'
@@ -13090,33 +16048,52 @@ if SOCKETIO_ENABLED:
                 # Reset judge ready status
                 for j in session['judges'].values():
                     j['ready'] = False
+            return pressed, spread, tolerance
 
-                emit('panel_working_time_rejected', {
-                    'spread': spread,
-                    'tolerance': WORKING_TIME_TOLERANCE,
-                    'message': f'X press spread too large ({spread:.2f}s > {WORKING_TIME_TOLERANCE}s). Video will reset.'
-                }, room=session_id)
+        session, outcome = update_shared_state('panel_session', session_id, x_press)
+        if not session or outcome is None:
+            return
+        pressed, spread, tolerance = outcome
+
+        emit('panel_x_received', {
+            'judge_num': judge_num,
+            'x_presses': pressed
+        }, room=session_id)
+
+        if spread is None:
+            return
+        if spread <= tolerance:
+            emit('panel_working_time_accepted', {
+                'spread': spread,
+                'message': f'Working time started! (spread: {spread:.2f}s)'
+            }, room=session_id)
+        else:
+            emit('panel_working_time_rejected', {
+                'spread': spread,
+                'tolerance': tolerance,
+                'message': f'X press spread too large ({spread:.2f}s > {tolerance:.2f}s). Video will reset.'
+            }, room=session_id)
 
     @socketio.on('panel_reset')
     def on_panel_reset(data):
         """Event judge resets the session after failed X sync."""
         session_id = data.get('session_id')
 
-        if session_id not in panel_sessions:
+        def reset(session):
+            session['state'] = 'waiting_for_ready'
+            session['video_started'] = False
+            session['x_presses'] = {}
+            session['timer_running'] = False
+            session['timer_start'] = None
+            session['scores'] = []
+            # Reset judge ready status
+            for j in session['judges'].values():
+                j['ready'] = False
+
+        session, _ = update_shared_state('panel_session', session_id, reset)
+        if not session:
             return
 
-        session = panel_sessions[session_id]
-        session['state'] = 'waiting_for_ready'
-        session['video_started'] = False
-        session['x_presses'] = {}
-        session['timer_running'] = False
-        session['timer_start'] = None
-        session['scores'] = []
-
-        # Reset judge ready status
-        for j in session['judges'].values():
-            j['ready'] = False
-
         emit('panel_session_reset', {
             'state': 'waiting_for_ready',
             'message': 'Session reset. Judges please confirm ready.'
@@ -13131,36 +16108,37 @@ if SOCKETIO_ENABLED:
         position = data.get('position')
         timestamp = data.get('timestamp')
 
-        if session_id not in panel_sessions:
-            return
-
-        session = panel_sessions[session_id]
+        def score(session):
+            if session['state'] != 'scoring':
+                return None
 
-        if session['state'] != 'scoring':
-            return
+            # Find or create score entry for this position
+            score_entry = None
+            for s in session['scores']:
+                if s['position'] == position:
+                    score_entry = s
+                    break
 
-        # Find or create score entry for this position
-        score_entry = None
-        for s in session['scores']:
-            if s['position'] == position:
-                score_entry = s
-                break
+            if score_entry is None:
+                score_entry = {
+                    'position': position,
+                    'votes': {},
+                    'timestamp': timestamp
+                }
+                session['scores'].append(score_entry)
 
-        if score_entry is None:
-            score_entry = {
-                'position': position,
-                'votes': {},
-                'timestamp': timestamp
-            }
-            session['scores'].append(score_entry)
+            score_entry['votes'][str(judge_num)] = score_type
+            return score_entry['votes']
 
-        score_entry['votes'][judge_num] = score_type
+        session, votes = update_shared_state('panel_session', session_id, score)
+        if not session or votes is None:
+            return
 
         emit('panel_score_update', {
             'position': position,
             'judge_num': judge_num,
             'score_type': score_type,
-            'votes': score_entry['votes'],
+            'votes': votes,
             'timestamp': timestamp
         }, room=session_id)
 
@@ -13169,12 +16147,13 @@ if SOCKETIO_ENABLED:
         """Working time ended - stop scoring."""
         session_id = data.get('session_id')
 
-        if session_id not in panel_sessions:
-            return
+        def stop(session):
+            session['timer_running'] = False
+            session['state'] = 'review'
 
-        session = panel_sessions[session_id]
-        session['timer_running'] = False
-        session['state'] = 'review'
+        session, _ = update_shared_state('panel_session', session_id, stop)
+        if not session:
+            return
 
         emit('panel_timer_stopped', {
             'scores': session['scores'],
@@ -13187,22 +16166,26 @@ if SOCKETIO_ENABLED:
         session_id = data.get('session_id')
         judge_num = data.get('judge_num')
 
-        if session_id in panel_sessions:
-            session = panel_sessions[session_id]
-            if judge_num in session['judges']:
-                session['judges'][judge_num]['connected'] = False
+        def leave(session):
+            judge = session['judges'].get(str(judge_num))
+            if judge:
+                judge['connected'] = False
 
-            leave_room(session_id)
+        session, _ = update_shared_state('panel_session', session_id, leave)
+        if not session:
+            return
 
-            emit('panel_update', {
-                'judges': session['judges'],
-                'state': session['state'],
-                'message': f'Judge {judge_num} disconnected'
-            }, room=session_id)
+        leave_room(session_id)
+
+        emit('panel_update', {
+            'judges': session['judges'],
+            'state': session['state'],
+            'message': f'Judge {judge_num} disconnected'
+        }, room=session_id)
 
-            # Clean up empty sessions
-            if all(not j['connected'] for j in session['judges'].values()):
-                del panel_sessions[session_id]
+        # Clean up empty sessions
+        if all(not j['connected'] for j in session['judges'].values()):
+            delete_shared_state('panel_session', session_id)
 
     # WS real-time scoring SocketIO events (WS_SCORE_FIELDS, PANEL_SIZES defined at module level)
 
@@ -13246,7 +16229,7 @@ if SOCKETIO_ENABLED:
         }
         join_room(room_code)
         _ws_sid_map[request.sid] = (room_code, judge_num)
-        _set_ws_room(room_code, room)
+        _ws_set_judge(room_code, judge_num, room['judges'][judge_num])
 
         # Build video info for the joining judge
         video_info = None
@@ -13254,18 +16237,7 @@ if SOCKETIO_ENABLED:
         if not video and room.get('video_id'):
             video = get_video(room['video_id'])
             if video:
-                if video.get('video_type') == 'pcloud' and video.get('local_file'):
-                    video['video_src'] = f'/pcloud/stream/{video["local_file"]}'
-                    video['is_direct_url'] = True
-                elif video.get('url') and is_direct_video_url(video.get('url', '')):
-                    video['video_src'] = video['url']
-                    video['is_direct_url'] = True
-                elif video.get('video_type') == 'local' and video.get('local_file'):
-                    video['video_src'] = f'/static/videos/{video["local_file"]}'
-                    video['is_direct_url'] = True
-                elif video.get('url'):
-                    video['embed_url'] = get_video_embed_url(video.get('url', ''))
-                    video['is_direct_url'] = False
+                resolve_video_src(video)
         if video:
             if video.get('is_direct_url') and video.get('video_src'):
                 video_info = {'video_src': video['video_src'], 'is_direct_url': True}
@@ -13280,6 +16252,8 @@ if SOCKETIO_ENABLED:
             'completion': _ws_scoring_completion(room),
             'video': video_info
         })
+        if room.get('upcoming'):
+            emit('ws_scoring_prefetch', {'videos': room['upcoming']})
 
         emit('ws_scoring_room_update', {
             'judges': {k: {'name': v['name'], 'connected': v.get('connected', False), 'confirmed': v.get('confirmed', False)} for k, v in room['judges'].items()},
@@ -13343,7 +16317,7 @@ if SOCKETIO_ENABLED:
         room_code = data.get('room_code')
         new_type = data.get('scoring_type')
 
-        room = _get_ws_room(room_code)
+        room = _get_ws_room_meta(room_code)
         if not room:
             emit('ws_scoring_error', {'message': 'Room not found'})
             return
@@ -13357,20 +16331,16 @@ if SOCKETIO_ENABLED:
             emit('ws_scoring_error', {'message': 'Invalid scoring type'})
             return
 
-        new_panel = PANEL_SIZES.get(new_type, 5)
-        panel_size = max(room.get('panel_size', new_panel), new_panel)
-        room['scoring_type'] = new_type
-        room['panel_size'] = panel_size
-        room['scores'] = {j: {} for j in range(1, panel_size + 1)}
-        room['state'] = 'scoring'
-        _set_ws_room(room_code, room)
+        panel_size = _ws_set_scoring_type(room_code, new_type, PANEL_SIZES.get(new_type, 5))
+        scores = {j: {} for j in range(1, panel_size + 1)}
 
         emit('ws_scoring_type_changed', {
             'scoring_type': new_type,
             'panel_size': panel_size,
             'state': 'scoring',
-            'scores': room['scores'],
-            'completion': _ws_scoring_completion(room)
+            'scores': scores,
+            'completion': _ws_scoring_completion({'scoring_type': new_type, 'panel_size': panel_size,
+                                                  'scores': scores})
         }, room=room_code)
 
     @socketio.on('ws_scoring_set_panel_size')
@@ -13383,22 +16353,15 @@ if SOCKETIO_ENABLED:
             emit('ws_scoring_error', {'message': 'Panel size must be 2-5'})
             return
 
-        room = _get_ws_room(room_code)
-        if not room:
+        if not _ws_room_exists(room_code):
             emit('ws_scoring_error', {'message': 'Room not found'})
             return
 
-        room['panel_size'] = new_size
-        # Rebuild scores dict for new panel size
-        room['scores'] = {j: room.get('scores', {}).get(j, {}) for j in range(1, new_size + 1)}
-        # Clear confirmed flags
-        for j in room.get('judges', {}):
-            room['judges'][j]['confirmed'] = False
-        _set_ws_room(room_code, room)
+        scores = _ws_set_panel_size(room_code, new_size)
 
         emit('ws_scoring_panel_size_changed', {
             'panel_size': new_size,
-            'scores': room['scores']
+            'scores': scores
         }, room=room_code)
 
     @socketio.on('ws_scoring_submit')
@@ -13409,7 +16372,7 @@ if SOCKETIO_ENABLED:
         field = data.get('field')
         value = data.get('value')
 
-        room = _get_ws_room(room_code)
+        room = _get_ws_room_meta(room_code)
         if not room:
             emit('ws_scoring_error', {'message': 'Room not found'})
             return
@@ -13438,18 +16401,14 @@ if SOCKETIO_ENABLED:
             emit('ws_scoring_error', {'message': f'{field} must be between {min_val} and {max_val}'})
             return
 
-        if judge_num not in room['scores']:
-            room['scores'][judge_num] = {}
-        room['scores'][judge_num][field] = value
-        _set_ws_room(room_code, room)
-
-        completion = _ws_scoring_completion(room)
+        # Single-field write; only the changed field is broadcast
+        scores = _ws_decode_scores(_ws_set_score(room_code, judge_num, field, value), panel_size)
+        completion = _ws_scoring_completion(dict(room, scores=scores))
 
         emit('ws_scoring_score_update', {
             'judge_num': judge_num,
             'field': field,
             'value': value,
-            'all_scores': room['scores'],
             'completion': completion
         }, room=room_code)
 
@@ -13460,7 +16419,7 @@ if SOCKETIO_ENABLED:
         judge_num = int(data.get('judge_num', 0))
         scores = data.get('scores', {})
 
-        room = _get_ws_room(room_code)
+        room = _get_ws_room_meta(room_code)
         if not room:
             emit('ws_scoring_error', {'message': 'Room not found'})
             return
@@ -13474,10 +16433,6 @@ if SOCKETIO_ENABLED:
             emit('ws_scoring_error', {'message': 'Invalid judge position'})
             return
 
-        if judge_num not in room.get('judges', {}):
-            emit('ws_scoring_error', {'message': 'Judge not found in room'})
-            return
-
         # Validate all required fields
         valid_fields = WS_SCORE_FIELDS.get(room['scoring_type'], {})
         validated_scores = {}
@@ -13496,40 +16451,24 @@ if SOCKETIO_ENABLED:
                 return
             validated_scores[field] = val
 
-        # Store scores and mark confirmed
-        room['scores'][judge_num] = validated_scores
-        room['judges'][judge_num]['confirmed'] = True
-        _set_ws_room(room_code, room)
-
-        # Check if all panel slots have a connected, confirmed judge
-        confirmed_count = sum(
-            1 for j in range(1, panel_size + 1)
-            if j in room['judges'] and room['judges'][j].get('connected', False) and room['judges'][j].get('confirmed', False)
-        )
-        all_confirmed = confirmed_count == panel_size
+        # Store scores and mark confirmed; auto-finalizes atomically when all
+        # panel slots have a connected, confirmed judge
+        result = _ws_confirm(room_code, judge_num, validated_scores)
+        if 'error' in result:
+            emit('ws_scoring_error', {'message': result['error']})
+            return
+        judges = result['judges']
 
         emit('ws_scoring_score_confirmed', {
             'judge_num': judge_num,
-            'judge_name': room['judges'][judge_num]['name'],
+            'judge_name': judges[judge_num]['name'],
             'scores': validated_scores,
-            'all_scores': {str(k): v for k, v in room['scores'].items()},
-            'all_confirmed': all_confirmed,
-            'confirmed_judges': {str(j): room['judges'][j].get('confirmed', False) for j in room['judges']},
+            'all_confirmed': result['all_confirmed'],
+            'confirmed_judges': {str(j): judges[j].get('confirmed', False) for j in judges},
         }, room=room_code)
 
-        # Auto-finalize when all connected judges confirmed
-        if all_confirmed:
-            final_scores = {str(k): dict(v) for k, v in room['scores'].items()}
-            final_judges = {str(j): {'name': info.get('name', '?')} for j, info in room['judges'].items()}
-
-            room['scores'] = {j: {} for j in range(1, panel_size + 1)}
-            room['state'] = 'scoring'
-            for j in room['judges']:
-                room['judges'][j]['confirmed'] = False
-            room.pop('video', None)
-            room.pop('video_id', None)
-            _set_ws_room(room_code, room)
-
+        if result['all_confirmed']:
+            final_scores, final_judges = _ws_snapshot(judges, result['scores'])
             emit('ws_scoring_finalized', {
                 'scores': final_scores,
                 'judges': final_judges,
@@ -13541,32 +16480,18 @@ if SOCKETIO_ENABLED:
         """Event judge finalizes scores - shows overlay then resets for next video."""
         room_code = data.get('room_code')
 
-        room = _get_ws_room(room_code)
+        room = _get_ws_room_meta(room_code)
         if not room:
             emit('ws_scoring_error', {'message': 'Room not found'})
             return
 
-        panel_size = room.get('panel_size', 3)
-
-        # Validate all connected judges confirmed
-        for j in range(1, panel_size + 1):
-            if j in room.get('judges', {}) and room['judges'][j].get('connected', False):
-                if not room['judges'][j].get('confirmed', False):
-                    emit('ws_scoring_error', {'message': f'J{j} has not confirmed their score'})
-                    return
-
-        # Snapshot current scores + judges for overlay
-        final_scores = {str(k): dict(v) for k, v in room['scores'].items()}
-        final_judges = {str(j): {'name': info.get('name', '?')} for j, info in room['judges'].items()}
-
-        # Reset room for next video (preserve panel_size and judges)
-        room['scores'] = {j: {} for j in range(1, panel_size + 1)}
-        room['state'] = 'scoring'
-        for j in room['judges']:
-            room['judges'][j]['confirmed'] = False
-        room.pop('video', None)
-        room.pop('video_id', None)
-        _set_ws_room(room_code, room)
+        # Validate all connected judges confirmed, snapshot scores + judges for
+        # the overlay and reset the room for the next video in one atomic step
+        result = _ws_finalize(room_code)
+        if 'error' in result:
+            emit('ws_scoring_error', {'message': result['error']})
+            return
+        final_scores, final_judges = _ws_snapshot(result['judges'], result['scores'])
 
         emit('ws_scoring_finalized', {
             'scores': final_scores,
@@ -13598,7 +16523,7 @@ if SOCKETIO_ENABLED:
             return
 
         room['state'] = 'complete'
-        _set_ws_room(room_code, room)
+        _update_ws_room_meta(room_code, state='complete')
 
         emit('ws_scoring_state_change', {
             'state': 'complete',
@@ -13615,12 +16540,10 @@ if SOCKETIO_ENABLED:
             emit('ws_scoring_error', {'message': 'Room not found'})
             return
 
+        _ws_reset_round(room_code)
         panel_size = room.get('panel_size', 3)
         room['scores'] = {j: {} for j in range(1, panel_size + 1)}
         room['state'] = 'scoring'
-        for j in room.get('judges', {}):
-            room['judges'][j]['confirmed'] = False
-        _set_ws_room(room_code, room)
 
         emit('ws_scoring_reset_all', {
             'state': 'scoring',
@@ -13641,7 +16564,7 @@ if SOCKETIO_ENABLED:
 
         if judge_num in room.get('judges', {}):
             room['judges'][judge_num]['connected'] = False
-            _set_ws_room(room_code, room)
+            _ws_update_judge(room_code, judge_num, {'connected': False})
 
         leave_room(room_code)
 
@@ -13662,7 +16585,7 @@ if SOCKETIO_ENABLED:
             return
 
         room['judges'][judge_num]['connected'] = True
-        _set_ws_room(room_code, room)
+        _ws_update_judge(room_code, judge_num, {'connected': True})
 
         emit('ws_scoring_room_update', {
             'judges': {k: {'name': v['name'], 'connected': v.get('connected', False), 'confirmed': v.get('confirmed', False)} for k, v in room.get('judges', {}).items()},
@@ -13677,11 +16600,7 @@ if SOCKETIO_ENABLED:
         """Handle socket disconnect — mark judge as disconnected and clean up presence."""
         sid = request.sid
 
-        # Clean up presence map
-        for uname, psid in list(_ws_presence_map.items()):
-            if psid == sid:
-                del _ws_presence_map[uname]
-                break
+        _ws_clear_presence(sid)
 
         mapping = _ws_sid_map.pop(sid, None)
         if not mapping:
@@ -13690,16 +16609,10 @@ if SOCKETIO_ENABLED:
         if judge_num == 0:
             return  # Event judge disconnect, no judge status to update
 
-        room = _get_ws_room(room_code)
-        if not room:
-            return
-
-        if judge_num in room.get('judges', {}):
-            # Only mark disconnected if this sid is still the current one
-            if room['judges'][judge_num].get('sid') == sid:
-                room['judges'][judge_num]['connected'] = False
-                _set_ws_room(room_code, room)
-
+        # Only mark disconnected if this sid is still the current one
+        if _ws_update_judge(room_code, judge_num, {'connected': False}, sid=sid):
+            room = _get_ws_room(room_code)
+            if room:
                 emit('ws_scoring_room_update', {
                     'judges': {k: {'name': v['name'], 'connected': v.get('connected', False), 'confirmed': v.get('confirmed', False)} for k, v in room.get('judges', {}).items()},
                     'state': room['state'],
@@ -13708,24 +16621,43 @@ if SOCKETIO_ENABLED:
                     'completion': _ws_scoring_completion(room)
                 }, room=room_code)
 
-    # Video sync events — event judge broadcasts play/pause/seek to judges
+    # Video sync events — event judge broadcasts play/pause/seek to judges.
+    # Seeks are coalesced per room: the first one in a window schedules a
+    # flush WS_SEEK_COALESCE seconds later and later ones just replace the
+    # pending time, so scrubbing sends judges a few seeks a second at most.
+    # Play/pause carry the current time, so they drop any pending seek.
+    WS_SEEK_COALESCE = float(os.environ.get('WS_SEEK_COALESCE', '0.15'))
+    _ws_pending_seeks = {}  # room_code -> (time, sender sid)
+
+    def _ws_flush_seek(room_code):
+        socketio.sleep(WS_SEEK_COALESCE)
+        pending = _ws_pending_seeks.pop(room_code, None)
+        if pending:
+            socketio.emit('ws_scoring_video_seek', {'time': pending[0]}, room=room_code, skip_sid=pending[1])
+
     @socketio.on('ws_scoring_video_play')
     def on_ws_scoring_video_play(data):
         room_code = data.get('room_code')
-        if _ws_room_exists(room_code):
+        if _ws_room_exists_cached(room_code):
+            _ws_pending_seeks.pop(room_code, None)
             emit('ws_scoring_video_play', {'time': data.get('time', 0)}, room=room_code, include_self=False)
 
     @socketio.on('ws_scoring_video_pause')
     def on_ws_scoring_video_pause(data):
         room_code = data.get('room_code')
-        if _ws_room_exists(room_code):
+        if _ws_room_exists_cached(room_code):
+            _ws_pending_seeks.pop(room_code, None)
             emit('ws_scoring_video_pause', {'time': data.get('time', 0)}, room=room_code, include_self=False)
 
     @socketio.on('ws_scoring_video_seek')
     def on_ws_scoring_video_seek(data):
         room_code = data.get('room_code')
-        if _ws_room_exists(room_code):
-            emit('ws_scoring_video_seek', {'time': data.get('time', 0)}, room=room_code, include_self=False)
+        if not _ws_room_exists_cached(room_code):
+            return
+        flush_pending = room_code in _ws_pending_seeks
+        _ws_pending_seeks[room_code] = (data.get('time', 0), request.sid)
+        if not flush_pending:
+            socketio.start_background_task(_ws_flush_seek, room_code)
 
     # --- Judge presence for auto-connect ---
 
@@ -13735,22 +16667,21 @@ if SOCKETIO_ENABLED:
         username = data.get('username')
         if not username:
             return
-        _ws_presence_map[username] = request.sid
+        _ws_set_presence(username, request.sid)
         # Check if already assigned to a room
-        for code in list(_get_all_ws_rooms().keys()):
-            room = _get_ws_room(code)
-            if not room:
-                continue
-            assigned = room.get('assigned_judges', {})
-            for judge_num_str, assigned_username in assigned.items():
-                if assigned_username == username:
-                    emit('ws_scoring_auto_join', {
-                        'room_code': code,
-                        'judge_num': int(judge_num_str),
-                        'scoring_type': room.get('scoring_type'),
-                        'video_id': room.get('video_id')
-                    })
-                    return
+        assignment = _ws_lookup_judge(username)
+        if not assignment:
+            return
+        meta = _get_ws_room_meta(assignment['room_code'])
+        if not meta:
+            _ws_unindex_judge(username, assignment['room_code'])
+            return
+        emit('ws_scoring_auto_join', {
+            'room_code': assignment['room_code'],
+            'judge_num': assignment['judge_num'],
+            'scoring_type': meta.get('scoring_type'),
+            'video_id': meta.get('video_id')
+        })
 
     @socketio.on('ws_scoring_assign_judges')
     def on_ws_scoring_assign_judges(data):
@@ -13762,13 +16693,18 @@ if SOCKETIO_ENABLED:
         room = _get_ws_room(room_code)
         if not room:
             return
+        previous = room.get('assigned_judges')
         room['assigned_judges'] = judges
         room['video_id'] = video_id
         room['panel_size'] = panel_size
-        _set_ws_room(room_code, room)
+        if video_id:
+            prefetch_upcoming(room_code, room, video_id, data.get('upcoming'))
+        _update_ws_room_meta(room_code, assigned_judges=judges, video_id=video_id,
+                             panel_size=panel_size, upcoming=room.get('upcoming', []))
+        _ws_index_judges(room_code, judges, previous)
         # Notify any assigned judges who are already online
         for judge_num_str, username in judges.items():
-            sid = _ws_presence_map.get(username)
+            sid = _ws_get_presence(username)
             if sid:
                 emit('ws_scoring_auto_join', {
                     'room_code': room_code,
@@ -13783,18 +16719,13 @@ if SOCKETIO_ENABLED:
         room_code = data.get('room_code')
         judge_num = data.get('judge_num')
         video_time = data.get('video_time', 0)
-        room = _get_ws_room(room_code)
+        room = _get_ws_room_meta(room_code)
         if not room:
             return
 
         # Store this judge's mark
-        if 'start_marks' not in room:
-            room['start_marks'] = {}
-        room['start_marks'][str(judge_num)] = video_time
-        _set_ws_room(room_code, room)
-
+        marks = _ws_add_start_mark(room_code, judge_num, video_time)
         panel_size = room.get('panel_size', 5)
-        marks = room['start_marks']
 
         # Broadcast status update — show who has marked
         emit('ws_scoring_start_status', {
@@ -13810,8 +16741,7 @@ if SOCKETIO_ENABLED:
 
             if spread <= 0.3:  # Within 0.3s tolerance
                 # Consensus reached — start timer for everyone
-                room['start_marks'] = {}
-                _set_ws_room(room_code, room)
+                _ws_clear_start_marks(room_code)
                 emit('ws_scoring_timer_start', {
                     'video_time': avg_time,
                     'consensus': True,
@@ -13819,8 +16749,7 @@ if SOCKETIO_ENABLED:
                 }, room=room_code)
             else:
                 # No consensus — reset marks
-                room['start_marks'] = {}
-                _set_ws_room(room_code, room)
+                _ws_clear_start_marks(room_code)
                 emit('ws_scoring_start_rejected', {
                     'spread': round(spread, 3),
                     'marks': {str(k): round(v, 3) for k, v in marks.items()},
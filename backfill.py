@@ -0,0 +1,125 @@
+"""
+Backfill Runner
+
+Runs a maintenance job (thumbnails, durations, titles, ...) over the rows that
+need it. Rows are fetched a page at a time in primary-key order from a
+selector that only returns rows still needing work, and each page is
+processed in a bounded thread pool. Requests to the same host are capped so
+one CDN or bucket is not hammered by every worker at once.
+
+After each page the last id is passed to save_checkpoint, so a restarted run
+can resume from where the previous one stopped.
+"""
+
+import os
+import time
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# Configuration
+BACKFILL_WORKERS = max(1, int(os.environ.get('BACKFILL_WORKERS', '8')))
+BACKFILL_PER_HOST = max(1, int(os.environ.get('BACKFILL_PER_HOST', '4')))
+BACKFILL_PAGE = int(os.environ.get('BACKFILL_PAGE', '200'))
+
+
+def new_backfill_status(name, total=0):
+    return {
+        'name': name,
+        'running': True,
+        'stopping': False,
+        'total': total,
+        'processed': 0,
+        'updated': 0,
+        'skipped': 0,
+        'failed': 0,
+        'cursor': '',
+        'rate': 0,  # rows per second
+        'eta_seconds': None,
+        'started_at': time.time(),
+        'finished_at': None,
+        'current': '',
+        'errors': []
+    }
+
+
+def url_host(row):
+    """Host of a row's url, for per-host concurrency limits."""
+    return urlparse(row.get('url') or '').netloc or None
+
+
+def run_backfill(select, process, status, checkpoint='', save_checkpoint=None, host_of=url_host,
+                 workers=BACKFILL_WORKERS, per_host=BACKFILL_PER_HOST, page_size=BACKFILL_PAGE,
+                 on_progress=None, should_stop=None):
+    """Process every row select() returns, updating status in place.
+
+    select(after_id, limit) returns up to limit rows needing work with
+    id > after_id, ordered by id. process(row) returns True if it changed the
+    row, False if there was nothing to do, and raises on failure. Setting
+    status['stopping'] (or should_stop() returning True, checked before each
+    page) ends the run after the current page.
+    """
+    lock = threading.Lock()
+    host_slots = {}
+
+    def host_slot(row):
+        host = host_of(row) if host_of else None
+        if not host:
+            return nullcontext()
+        with lock:
+            if host not in host_slots:
+                host_slots[host] = threading.BoundedSemaphore(per_host)
+            return host_slots[host]
+
+    def handle(row):
+        with host_slot(row):
+            try:
+                changed = process(row)
+                error = None
+            except Exception as e:
+                changed, error = False, f"{row.get('title') or row.get('id')}: {e}"
+        with lock:
+            status['processed'] += 1
+            status['current'] = (row.get('title') or row.get('id') or '')[:50]
+            if error:
+                status['failed'] += 1
+                status['errors'] = (status['errors'] + [error])[-20:]
+            elif changed:
+                status['updated'] += 1
+            else:
+                status['skipped'] += 1
+
+    cursor = checkpoint or ''
+    status['cursor'] = cursor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            if should_stop and should_stop():
+                status['stopping'] = True
+            if status['stopping']:
+                break
+            rows = select(cursor, page_size)
+            if not rows:
+                break
+            list(pool.map(handle, rows))
+            cursor = rows[-1]['id']
+            if save_checkpoint:
+                save_checkpoint(cursor)
+
+            elapsed = time.time() - status['started_at']
+            with lock:
+                status['cursor'] = cursor
+                status['rate'] = round(status['processed'] / elapsed, 2) if elapsed > 0 else 0
+                remaining = max(0, status['total'] - status['processed'])
+                status['eta_seconds'] = round(remaining / status['rate']) if status['rate'] else None
+            if on_progress:
+                on_progress(status)
+            if len(rows) < page_size:
+                break
+
+    status['running'] = False
+    status['finished_at'] = time.time()
+    status['eta_seconds'] = 0 if not status['stopping'] else None
+    if on_progress:
+        on_progress(status)
+    return status
@@ -132,11 +132,9 @@ def upload_file(gdrive_folder, relative_path, event_name):
         s3_folder = f"{metadata['category']}/{metadata['subcategory']}" if metadata['subcategory'] else metadata['category']
         s3_filename = f"{video_id}.mp4"
 
-        # Read file and upload
+        # Stream file to S3 (multipart, constant memory)
         with open(local_path, 'rb') as f:
-            file_data = f.read()
-
-        video_url = upload_to_s3(file_data, s3_filename, 'video/mp4', s3_folder)
+            video_url = upload_to_s3(f, s3_filename, 'video/mp4', s3_folder)
 
         if not video_url:
             print(f"  S3 upload failed: {filename}")
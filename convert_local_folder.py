@@ -62,10 +62,9 @@ def convert_and_upload(input_path, event_name, category='uncategorized', delete_
             os.remove(output_path)
         return False
 
+    # Stream file to S3 (multipart, constant memory)
     with open(upload_file, 'rb') as f:
-        file_data = f.read()
-
-    video_url = upload_to_s3(file_data, s3_filename, 'video/mp4', s3_folder)
+        video_url = upload_to_s3(f, s3_filename, 'video/mp4', s3_folder)
 
     if not video_url:
         print("  S3 upload failed!")
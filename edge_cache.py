@@ -0,0 +1,259 @@
+"""
+Venue Edge Cache
+
+Read-through disk cache for B2/CDN videos, for running the app on a venue
+network so judges pull each video over the uplink once instead of once per
+judge. Files are fetched with the parallel range downloader, evicted LRU
+(by mtime) under a size cap, and served with Range support by Flask.
+
+Concurrent first requests share a single upstream fetch, coordinated through
+a lock file so it also works across gunicorn workers. While a fetch runs,
+ranges that have already landed are served from the partial file.
+"""
+
+import os
+import json
+import time
+import threading
+
+from s3_transfer import download_to_file
+
+# Configuration
+EDGE_CACHE_ENABLED = os.environ.get('EDGE_CACHE', 'false').lower() == 'true'
+EDGE_CACHE_DIR = os.environ.get('EDGE_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'edge_cache'))
+EDGE_CACHE_MAX_GB = float(os.environ.get('EDGE_CACHE_MAX_GB', '50'))
+EDGE_CACHE_WAIT = int(os.environ.get('EDGE_CACHE_WAIT', '120'))  # Max seconds a request waits for a fetch
+EDGE_CACHE_STALE_LOCK = 60  # A fetch lock not touched for this long is abandoned
+EDGE_CACHE_HEARTBEAT = 10  # Seconds between lock touches while a fetch runs
+_READ_CHUNK = 256 * 1024
+
+_TEMP_SUFFIXES = ('.part', '.lock', '.ranges')
+_evict_lock = threading.Lock()
+
+
+def _cache_path(key):
+    return os.path.join(EDGE_CACHE_DIR, key)
+
+
+def get_cached_path(key):
+    """Return the local path for a cached key (bumping its LRU time), or None."""
+    path = _cache_path(key)
+    try:
+        os.utime(path, None)
+        return path
+    except OSError:
+        return None
+
+
+def fetch_to_cache(key, url, wait_timeout=None):
+    """Return a local path for key, fetching url once if it is not cached.
+
+    Only one request (across all workers) downloads a given key; the others
+    poll until it lands. Returns None if the wait times out or the fetch fails,
+    in which case the caller should fall back to the upstream URL.
+    """
+    path = get_cached_path(key)
+    if path:
+        return path
+
+    os.makedirs(EDGE_CACHE_DIR, exist_ok=True)
+    path = _cache_path(key)
+    lock_path = path + '.lock'
+    deadline = time.time() + (EDGE_CACHE_WAIT if wait_timeout is None else wait_timeout)
+
+    while True:
+        if os.path.exists(path):
+            return get_cached_path(key)
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.write(fd, f"{os.getpid()}\n".encode())
+            os.close(fd)
+            break  # This request does the fetch
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > EDGE_CACHE_STALE_LOCK:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                return None
+            time.sleep(0.25)
+
+    # Keep the lock fresh for as long as the fetch runs, however slow the uplink
+    stop_heartbeat = threading.Event()
+
+    def heartbeat():
+        while not stop_heartbeat.wait(EDGE_CACHE_HEARTBEAT):
+            try:
+                os.utime(lock_path, None)
+            except OSError:
+                pass
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+
+    part_path = path + '.part'
+    try:
+        started = time.time()
+        result = download_to_file(url, part_path)
+        os.replace(part_path, path)
+        print(f"[EDGE CACHE] Cached {key} ({result['size'] / 1024 / 1024:.1f} MB in {time.time() - started:.1f}s)", flush=True)
+    except Exception as e:
+        # Leave the .part/.ranges files so the next attempt resumes
+        print(f"[EDGE CACHE] Fetch failed for {key}: {e}", flush=True)
+        return None
+    finally:
+        stop_heartbeat.set()
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+    evict_cache()
+    return path
+
+
+def start_fetch(key, url):
+    """Fetch key in a background thread unless it is cached (a fetch already running elsewhere is left alone)."""
+    if get_cached_path(key):
+        return
+    thread = threading.Thread(target=fetch_to_cache, args=(key, url, 0))
+    thread.daemon = True
+    thread.start()
+
+
+def _fetch_state(key):
+    try:
+        with open(_cache_path(key) + '.part.ranges') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def partial_size(key, wait_timeout=10):
+    """Size of key once its fetch has started (or it is cached), or None if that takes too long."""
+    path = _cache_path(key)
+    deadline = time.time() + wait_timeout
+    while True:
+        if os.path.exists(path):
+            return os.path.getsize(path)
+        state = _fetch_state(key)
+        if state and state.get('size'):
+            return state['size']
+        if time.time() > deadline:
+            return None
+        time.sleep(0.25)
+
+
+def _available_through(key, pos):
+    """Last byte index readable contiguously from pos, or None if pos has not landed yet."""
+    path = _cache_path(key)
+    if os.path.exists(path):
+        return os.path.getsize(path) - 1
+    state = _fetch_state(key)
+    if not state:
+        return None
+    range_size, done = state['range_size'], set(state['done'])
+    index = pos // range_size
+    if index not in done:
+        return None
+    while index + 1 in done:
+        index += 1
+    return min(state['size'], (index + 1) * range_size) - 1
+
+
+def read_partial(key, start, end, wait_timeout=None):
+    """Yield bytes start..end of key, reading each range as soon as its fetch lands.
+
+    Stops early (the client re-requests the rest) if no new bytes land within
+    wait_timeout or the fetch dies without completing the file.
+    """
+    path = _cache_path(key)
+    wait_timeout = EDGE_CACHE_WAIT if wait_timeout is None else wait_timeout
+    try:
+        # Unbuffered, so bytes read before their range landed are never reused
+        f = open(path if os.path.exists(path) else path + '.part', 'rb', buffering=0)
+    except OSError:
+        return
+    with f:
+        pos = start
+        while pos <= end:
+            deadline = time.time() + wait_timeout
+            available = _available_through(key, pos)
+            while available is None:
+                if time.time() > deadline or not (os.path.exists(path + '.lock') or os.path.exists(path)):
+                    return
+                time.sleep(0.25)
+                available = _available_through(key, pos)
+            f.seek(pos)
+            remaining = min(end, available) - pos + 1
+            while remaining > 0:
+                chunk = f.read(min(_READ_CHUNK, remaining))
+                if not chunk:
+                    return
+                yield chunk
+                pos += len(chunk)
+                remaining -= len(chunk)
+
+
+def invalidate_cache(prefix):
+    """Remove cached files whose key starts with prefix (e.g. after a video is trimmed)."""
+    try:
+        names = os.listdir(EDGE_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(prefix) and not name.endswith('.lock'):
+            try:
+                os.remove(os.path.join(EDGE_CACHE_DIR, name))
+            except OSError:
+                pass
+
+
+def evict_cache(max_bytes=None):
+    """Delete least-recently-used files until the cache fits under the size cap."""
+    max_bytes = max_bytes if max_bytes is not None else int(EDGE_CACHE_MAX_GB * 1024 ** 3)
+    with _evict_lock:
+        entries = []
+        for e in os.scandir(EDGE_CACHE_DIR):
+            if e.is_file() and not e.name.endswith(_TEMP_SUFFIXES):
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                print(f"[EDGE CACHE] Evicted {os.path.basename(path)}", flush=True)
+            except OSError:
+                pass
+        return total
+
+
+def get_cache_stats():
+    """Summary of the cache for the status endpoint."""
+    files = 0
+    total = 0
+    fetching = 0
+    try:
+        for e in os.scandir(EDGE_CACHE_DIR):
+            if e.name.endswith('.lock'):
+                fetching += 1
+            elif e.is_file() and not e.name.endswith(_TEMP_SUFFIXES):
+                files += 1
+                total += e.stat().st_size
+    except FileNotFoundError:
+        pass
+    return {
+        'enabled': EDGE_CACHE_ENABLED,
+        'files': files,
+        'bytes': total,
+        'max_bytes': int(EDGE_CACHE_MAX_GB * 1024 ** 3),
+        'fetching': fetching
+    }
+
+
+if EDGE_CACHE_ENABLED:
+    print(f"[STARTUP] Edge cache enabled: {EDGE_CACHE_DIR} (max {EDGE_CACHE_MAX_GB} GB)")
@@ -0,0 +1,112 @@
+"""
+Frame Capture Cache
+
+Disk cache of JPEG frames captured from videos for OCR on cross-origin videos.
+Frames are keyed by video, timestamp (milliseconds) and output width, so
+repeated scans of the same frame are served from disk instead of starting a
+remote decode. Files are evicted LRU (by mtime) under a size cap, like the
+venue edge cache.
+"""
+
+import os
+import shutil
+import threading
+
+# Configuration
+FRAME_CACHE_DIR = os.environ.get('FRAME_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'frame_cache'))
+FRAME_CACHE_MAX_MB = float(os.environ.get('FRAME_CACHE_MAX_MB', '500'))
+
+_evict_lock = threading.Lock()
+_cache_lock = threading.Lock()
+_cache_bytes = None  # Lazily initialised from the cache directory
+
+
+def frame_cache_key(video_id, t, width=None):
+    """Cache file name for a frame: <id>.<ms>.<width>.jpg (all frames of a video share the id prefix)."""
+    return f"{video_id}.{int(round(t * 1000))}.{width or 0}.jpg"
+
+
+def get_cached_frame(key):
+    """Return the local path for a cached frame (bumping its LRU time), or None."""
+    path = os.path.join(FRAME_CACHE_DIR, key)
+    try:
+        os.utime(path, None)
+        return path
+    except OSError:
+        return None
+
+
+def _track(delta):
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is not None:
+            _cache_bytes += delta
+
+
+def store_frame(src_path, key, copy=False):
+    """Move (or copy) a captured frame into the cache and return its path."""
+    os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+    path = os.path.join(FRAME_CACHE_DIR, key)
+    try:
+        replaced = os.path.getsize(path)
+    except OSError:
+        replaced = 0
+    if copy:
+        shutil.copyfile(src_path, path)
+    else:
+        os.replace(src_path, path)
+    _track(os.path.getsize(path) - replaced)
+    return path
+
+
+def invalidate_frames(video_id):
+    """Remove all cached frames of a video (e.g. after it is trimmed)."""
+    prefix = f"{video_id}."
+    try:
+        names = os.listdir(FRAME_CACHE_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(prefix):
+            path = os.path.join(FRAME_CACHE_DIR, name)
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            _track(-size)
+
+
+def evict_frame_cache(max_bytes=None):
+    """Delete least-recently-used frames until the cache fits under the size cap.
+
+    The directory is only scanned when the tracked size is unknown or over the cap.
+    """
+    global _cache_bytes
+    max_bytes = max_bytes if max_bytes is not None else int(FRAME_CACHE_MAX_MB * 1024 ** 2)
+    with _cache_lock:
+        if _cache_bytes is not None and _cache_bytes <= max_bytes:
+            return _cache_bytes
+    with _evict_lock:
+        entries = []
+        try:
+            for e in os.scandir(FRAME_CACHE_DIR):
+                if e.is_file():
+                    st = e.stat()
+                    entries.append((st.st_mtime, st.st_size, e.path))
+        except FileNotFoundError:
+            with _cache_lock:
+                _cache_bytes = 0
+            return 0
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with _cache_lock:
+            _cache_bytes = total
+        return total
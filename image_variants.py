@@ -0,0 +1,109 @@
+"""
+Responsive Image Variants
+
+Builds resized derivatives of an image (video thumbnails, team photos,
+formation drawings) in several formats and widths with ffmpeg, so pages can
+offer `srcset`/`<picture>` sources instead of the full-size original.
+Each file name carries a content hash, so the files can be served with
+immutable cache headers and a changed image always gets a new URL.
+
+A variants dict maps format -> [[width, url], ...] (ascending width) and is
+stored as JSON next to the image URL it was built from.
+"""
+
+import os
+import json
+import hashlib
+import subprocess
+import tempfile
+
+# Configuration
+IMAGE_WIDTHS = [int(w) for w in os.environ.get('IMAGE_WIDTHS', '160,320,640').split(',') if w.strip()]
+IMAGE_FORMATS = [f.strip() for f in os.environ.get('IMAGE_FORMATS', 'webp,jpg').split(',') if f.strip()]
+IMAGE_TIMEOUT = 60
+
+# Encoder args and MIME type per output format. AVIF needs an ffmpeg built
+# with libaom; a format that fails to encode is skipped.
+IMAGE_ENCODERS = {
+    'avif': (['-c:v', 'libaom-av1', '-still-picture', '1', '-crf', '32', '-cpu-used', '6'], 'image/avif'),
+    'webp': (['-c:v', 'libwebp', '-quality', '75'], 'image/webp'),
+    'jpg': (['-q:v', '4', '-update', '1'], 'image/jpeg'),
+    'png': (['-update', '1'], 'image/png'),
+}
+
+
+def image_content_type(fmt):
+    return IMAGE_ENCODERS[fmt][1]
+
+
+def probe_image_width(src, ffprobe='ffprobe'):
+    """Pixel width of an image (local path or URL), or None."""
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width',
+             '-of', 'default=noprint_wrappers=1:nokey=1', src],
+            capture_output=True, text=True, timeout=IMAGE_TIMEOUT
+        )
+        return int(result.stdout.strip().splitlines()[0])
+    except (ValueError, IndexError, subprocess.SubprocessError, OSError):
+        return None
+
+
+def build_image_variants(src, base_name, widths=None, formats=None, ffmpeg='ffmpeg', ffprobe='ffprobe'):
+    """Encode src at each width (never upscaled) and format, one ffmpeg run per format.
+
+    Returns (temp_dir, [(fmt, width, filename, path), ...]). File names are
+    `<base_name>-<width>w.<hash>.<ext>`. The caller stores the files and
+    removes temp_dir.
+    """
+    widths = widths or IMAGE_WIDTHS
+    formats = formats or IMAGE_FORMATS
+    source_width = probe_image_width(src, ffprobe)
+    if source_width:
+        widths = sorted({w for w in widths if w < source_width} | {min(max(widths), source_width)})
+    else:
+        widths = sorted(set(widths))
+
+    temp_dir = tempfile.mkdtemp(prefix='variants_')
+    outputs = []
+    for fmt in formats:
+        codec_args, _ = IMAGE_ENCODERS[fmt]
+        split = ''.join(f'[s{i}]' for i in range(len(widths)))
+        graph = f'[0:v]split={len(widths)}{split};' + ';'.join(
+            f"[s{i}]scale='min({w},iw)':-2[o{i}]" for i, w in enumerate(widths))
+        cmd = [ffmpeg, '-hide_banner', '-y', '-i', src, '-filter_complex', graph]
+        paths = []
+        for i, w in enumerate(widths):
+            path = os.path.join(temp_dir, f'{w}.{fmt}')
+            cmd += ['-map', f'[o{i}]', '-frames:v', '1'] + codec_args + [path]
+            paths.append((w, path))
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=IMAGE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            print(f"[IMAGES] {fmt} variants of {base_name} timed out")
+            continue
+        if result.returncode != 0:
+            print(f"[IMAGES] {fmt} variants of {base_name} failed: {result.stderr.decode(errors='replace')[-200:]}")
+            continue
+        for w, path in paths:
+            if not os.path.exists(path) or os.path.getsize(path) == 0:
+                continue
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:10]
+            outputs.append((fmt, w, f'{base_name}-{w}w.{digest}.{fmt}', path))
+    return temp_dir, outputs
+
+
+def parse_variants(value):
+    """Variants dict from its stored JSON (or a dict), {} if missing or invalid."""
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value) if value else {}
+    except (TypeError, ValueError):
+        return {}
+
+
+def variants_srcset(value, fmt):
+    """`srcset` string for one format of a variants dict ('' if it has none)."""
+    return ', '.join(f'{url} {width}w' for width, url in parse_variants(value).get(fmt, []))
@@ -2,17 +2,63 @@
 pCloud Storage Integration
 
 Uses rclone for file operations and provides streaming through Flask.
+Ranged reads use `rclone cat --offset/--count`; file sizes and links are kept
+in a short TTL cache, and hot byte ranges in an on-disk LRU block cache.
 """
 
 import os
+import time
+import hashlib
+import threading
 import subprocess
 import tempfile
-from functools import lru_cache
 
 # Configuration
 PCLOUD_REMOTE = os.environ.get('PCLOUD_REMOTE', 'pcloud')
 PCLOUD_BASE_FOLDER = os.environ.get('PCLOUD_BASE_FOLDER', 'video-library')
 USE_PCLOUD = os.environ.get('USE_PCLOUD', 'false').lower() == 'true'
+PCLOUD_META_TTL = int(os.environ.get('PCLOUD_META_TTL', '300'))
+PCLOUD_CACHE_DIR = os.environ.get('PCLOUD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'pcloud_cache'))
+PCLOUD_CACHE_MAX_MB = int(os.environ.get('PCLOUD_CACHE_MAX_MB', '2048'))
+PCLOUD_BLOCK_SIZE = int(os.environ.get('PCLOUD_BLOCK_SIZE_MB', '2')) * 1024 * 1024
+
+# {(kind, pcloud_path): (expires_at, value)}
+_meta_cache = {}
+_meta_lock = threading.Lock()
+_block_lock = threading.Lock()
+_block_cache_bytes = None  # Lazily initialised from the cache directory
+
+
+def _full_path(pcloud_path):
+    return f"{PCLOUD_REMOTE}:{PCLOUD_BASE_FOLDER}/{pcloud_path}"
+
+
+def _cached_meta(kind, pcloud_path, loader):
+    """Return a cached metadata value, calling loader() when missing or expired."""
+    now = time.time()
+    with _meta_lock:
+        hit = _meta_cache.get((kind, pcloud_path))
+        if hit and hit[0] > now:
+            return hit[1]
+    value = loader()
+    if value is not None:
+        with _meta_lock:
+            _meta_cache[(kind, pcloud_path)] = (now + PCLOUD_META_TTL, value)
+    return value
+
+
+def invalidate_pcloud_cache(pcloud_path):
+    """Drop cached metadata and byte ranges for a file that was replaced or deleted."""
+    with _meta_lock:
+        for key in [k for k in _meta_cache if k[1] == pcloud_path]:
+            del _meta_cache[key]
+    prefix = _block_prefix(pcloud_path)
+    try:
+        for name in os.listdir(PCLOUD_CACHE_DIR):
+            if name.startswith(prefix):
+                _remove_block(os.path.join(PCLOUD_CACHE_DIR, name))
+    except FileNotFoundError:
+        pass
 
 def check_pcloud_configured():
     """Check if pCloud is configured in rclone."""
@@ -64,6 +110,7 @@ def upload_to_pcloud(file_path, remote_path, folder='videos'):
             return None
 
         # Return the relative path for database storage
+        invalidate_pcloud_cache(f"{folder}/{remote_path}")
         return f"{folder}/{remote_path}"
 
     except Exception as e:
@@ -114,29 +161,31 @@ def delete_from_pcloud(pcloud_path):
             ['rclone', 'delete', full_path],
             capture_output=True, text=True, timeout=60
         )
+        invalidate_pcloud_cache(pcloud_path)
         return result.returncode == 0
     except Exception as e:
         print(f"pCloud delete error: {e}")
         return False
 
-def get_pcloud_file_stream(pcloud_path):
+def get_pcloud_file_stream(pcloud_path, offset=0, count=None):
     """
-    Get a file from pCloud as a stream for proxying.
+    Get a file (or a byte range of it) from pCloud as a stream for proxying.
 
-    Returns a generator that yields chunks of the file.
+    Returns a generator that yields chunks of the file. The rclone process is
+    killed if the consumer stops early (e.g. the client aborted a seek).
     """
     if not USE_PCLOUD:
         return None
 
-    try:
-        full_path = f"{PCLOUD_REMOTE}:{PCLOUD_BASE_FOLDER}/{pcloud_path}"
+    cmd = ['rclone', 'cat', _full_path(pcloud_path)]
+    if offset:
+        cmd += ['--offset', str(offset)]
+    if count is not None:
+        cmd += ['--count', str(count)]
 
-        # Use rclone cat to stream the file
-        process = subprocess.Popen(
-            ['rclone', 'cat', full_path],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+    process = None
+    try:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
 
         # Yield chunks
         chunk_size = 1024 * 1024  # 1MB chunks
@@ -150,28 +199,170 @@ def get_pcloud_file_stream(pcloud_path):
 
     except Exception as e:
         print(f"pCloud stream error: {e}")
+    finally:
+        if process and process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def _block_prefix(pcloud_path):
+    return hashlib.sha1(pcloud_path.encode()).hexdigest()[:16] + '_'
+
+
+def _block_path(pcloud_path, index):
+    return os.path.join(PCLOUD_CACHE_DIR, f"{_block_prefix(pcloud_path)}{index:08d}")
+
+
+def _remove_block(path):
+    global _block_cache_bytes
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except OSError:
+        return
+    with _block_lock:
+        if _block_cache_bytes is not None:
+            _block_cache_bytes -= size
+
+
+def _read_cached_block(pcloud_path, index):
+    path = _block_path(pcloud_path, index)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
         return None
+    # Bump mtime so eviction is least-recently-used (shared by all workers)
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return data
+
+
+def _store_block(pcloud_path, index, data):
+    """Write a block to the cache atomically, then evict old blocks if over the limit."""
+    global _block_cache_bytes
+    os.makedirs(PCLOUD_CACHE_DIR, exist_ok=True)
+    path = _block_path(pcloud_path, index)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"pCloud cache write error: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return
+
+    limit = PCLOUD_CACHE_MAX_MB * 1024 * 1024
+    with _block_lock:
+        if _block_cache_bytes is None:
+            _block_cache_bytes = sum(
+                e.stat().st_size for e in os.scandir(PCLOUD_CACHE_DIR) if e.is_file())
+        else:
+            _block_cache_bytes += len(data)
+        over = _block_cache_bytes > limit
+    if over:
+        _evict_blocks(int(limit * 0.9))
+
+
+def _evict_blocks(target_bytes):
+    """Delete least-recently-used blocks until the cache is under target_bytes."""
+    global _block_cache_bytes
+    entries = []
+    for e in os.scandir(PCLOUD_CACHE_DIR):
+        if e.is_file() and not e.name.endswith('.tmp'):
+            st = e.stat()
+            entries.append((st.st_mtime, st.st_size, e.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= target_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+    with _block_lock:
+        _block_cache_bytes = total
+
+
+def get_pcloud_range_stream(pcloud_path, start, end, file_size):
+    """
+    Stream bytes [start, end] (inclusive) of a pCloud file through the block cache.
 
-def get_pcloud_file_size(pcloud_path):
-    """Get the size of a file on pCloud."""
+    Cached blocks are served from disk; on the first miss a single ranged
+    `rclone cat` covers the rest of the request and fills the cache as it goes.
+    Raises IOError if rclone ends before the requested range is complete.
+    """
     if not USE_PCLOUD:
         return None
 
-    try:
-        full_path = f"{PCLOUD_REMOTE}:{PCLOUD_BASE_FOLDER}/{pcloud_path}"
-        result = subprocess.run(
-            ['rclone', 'size', full_path, '--json'],
-            capture_output=True, text=True, timeout=30
-        )
+    block = PCLOUD_BLOCK_SIZE
+    index = start // block
+    last = end // block
+
+    while index <= last:
+        data = _read_cached_block(pcloud_path, index)
+        if data is None:
+            break
+        lo = max(start - index * block, 0)
+        hi = min(end - index * block + 1, len(data))
+        yield data[lo:hi]
+        index += 1
+
+    if index > last:
+        return
+
+    # Fetch from the start of the first missing block to the end of the last needed block
+    fetch_start = index * block
+    fetch_end = min((last + 1) * block, file_size)
+    buf = bytearray()
+    pos = fetch_start
+    for chunk in get_pcloud_file_stream(pcloud_path, fetch_start, fetch_end - fetch_start):
+        buf.extend(chunk)
+        while len(buf) >= block or (pos + len(buf) >= fetch_end and buf):
+            data = bytes(buf[:block])
+            del buf[:block]
+            _store_block(pcloud_path, pos // block, data)
+            lo = max(start - pos, 0)
+            hi = min(end - pos + 1, len(data))
+            if hi > lo:
+                yield data[lo:hi]
+            pos += len(data)
+
+    if pos < fetch_end:
+        # rclone ended early: abort so the client sees a short response and retries,
+        # rather than a body that silently stops before its Content-Length
+        print(f"pCloud range stream ended early: {pcloud_path} at {pos} of {fetch_end}")
+        raise IOError(f"pCloud stream for {pcloud_path} ended at byte {pos} of {fetch_end}")
 
-        if result.returncode == 0:
-            import json
-            data = json.loads(result.stdout)
-            return data.get('bytes', 0)
-    except Exception as e:
-        print(f"pCloud size error: {e}")
 
-    return None
+def get_pcloud_file_size(pcloud_path):
+    """Get the size of a file on pCloud (cached for PCLOUD_META_TTL seconds)."""
+    if not USE_PCLOUD:
+        return None
+
+    def load():
+        try:
+            result = subprocess.run(
+                ['rclone', 'size', _full_path(pcloud_path), '--json'],
+                capture_output=True, text=True, timeout=30
+            )
+
+            if result.returncode == 0:
+                import json
+                data = json.loads(result.stdout)
+                return data.get('bytes', 0)
+        except Exception as e:
+            print(f"pCloud size error: {e}")
+        return None
+
+    return _cached_meta('size', pcloud_path, load)
 
 def list_pcloud_files(folder='videos'):
     """List files in a pCloud folder."""
@@ -195,26 +386,27 @@ def list_pcloud_files(folder='videos'):
 
 def get_pcloud_public_link(pcloud_path):
     """
-    Get a public link for a pCloud file.
+    Get a public link for a pCloud file (cached for PCLOUD_META_TTL seconds).
     Note: This requires the file to be in a public folder or uses pCloud's link API.
     For streaming through the app, use the proxy endpoint instead.
     """
     if not USE_PCLOUD:
         return None
 
-    try:
-        full_path = f"{PCLOUD_REMOTE}:{PCLOUD_BASE_FOLDER}/{pcloud_path}"
-        result = subprocess.run(
-            ['rclone', 'link', full_path],
-            capture_output=True, text=True, timeout=30
-        )
-
-        if result.returncode == 0:
-            return result.stdout.strip()
-    except Exception as e:
-        print(f"pCloud link error: {e}")
+    def load():
+        try:
+            result = subprocess.run(
+                ['rclone', 'link', _full_path(pcloud_path)],
+                capture_output=True, text=True, timeout=30
+            )
+
+            if result.returncode == 0:
+                return result.stdout.strip()
+        except Exception as e:
+            print(f"pCloud link error: {e}")
+        return None
 
-    return None
+    return _cached_meta('link', pcloud_path, load)
 
 
 # Initialize on import
@@ -111,6 +111,14 @@ class SelectQuery:
             elif op == 'lt':
                 parts.append(f'"{col}" < %s')
                 params.append(val)
+            elif op == 'is' and val == 'null':
+                parts.append(f'"{col}" IS NULL')
+            elif op == 'match':
+                parts.append(f'"{col}" ~ %s')
+                params.append(val)
+            elif op == 'imatch':
+                parts.append(f'"{col}" ~* %s')
+                params.append(val)
         return parts, params
 
     def execute(self):
@@ -241,6 +249,43 @@ class UpdateQuery:
         return QueryResult(data=rows)
 
 
+class UpdateManyQuery:
+    """Update many rows, each with its own values, in one statement.
+
+    Builds `UPDATE t SET col = COALESCE(v.col, t.col) FROM (VALUES ...) v
+    WHERE t.key = v.key`. A column set to None in a row is left unchanged.
+    """
+    def __init__(self, conn_factory, table, rows, key='id', types=None):
+        self._conn_factory = conn_factory
+        self._table = table
+        self._rows = rows
+        self._key = key
+        self._types = types or {}
+
+    def execute(self):
+        if not self._rows:
+            return QueryResult(data=[])
+
+        conn = self._conn_factory()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+        cols = [self._key] + sorted({c for row in self._rows for c in row if c != self._key})
+        set_cols = cols[1:]
+        # VALUES infers column types from the literals, so cast explicitly
+        template = '(' + ', '.join(f'%s::{self._types.get(c, "text")}' for c in cols) + ')'
+        col_str = ', '.join(f'"{c}"' for c in cols)
+        set_str = ', '.join(f'"{c}" = COALESCE(v."{c}", t."{c}")' for c in set_cols)
+
+        sql = (f'UPDATE "{self._table}" AS t SET {set_str} '
+               f'FROM (VALUES %s) AS v ({col_str}) '
+               f'WHERE t."{self._key}" = v."{self._key}" RETURNING t.*')
+        values = [[row.get(c) for c in cols] for row in self._rows]
+        rows = psycopg2.extras.execute_values(cur, sql, values, template=template,
+                                              page_size=len(values), fetch=True)
+        cur.close()
+        return QueryResult(data=[dict(r) for r in rows])
+
+
 class DeleteQuery:
     def __init__(self, conn_factory, table):
         self._conn_factory = conn_factory
@@ -295,6 +340,9 @@ class TableQuery:
     def update(self, data):
         return UpdateQuery(self._conn_factory, self._table, data)
 
+    def update_many(self, rows, key='id', types=None):
+        return UpdateManyQuery(self._conn_factory, self._table, rows, key, types)
+
     def delete(self):
         return DeleteQuery(self._conn_factory, self._table)
 
@@ -0,0 +1,344 @@
+"""
+S3/B2 Transfer Helpers
+
+Streaming multipart uploads with bounded memory, parallel parts and
+per-part retries. Works with any boto3 S3 client (Backblaze B2 or AWS S3).
+
+Also provides a streaming, resumable downloader that fetches large files
+over parallel HTTP range requests.
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import hashlib
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+# Configuration
+S3_PART_SIZE = int(os.environ.get('S3_PART_SIZE_MB', '16')) * 1024 * 1024
+S3_UPLOAD_CONCURRENCY = int(os.environ.get('S3_UPLOAD_CONCURRENCY', '4'))
+S3_PART_RETRIES = int(os.environ.get('S3_PART_RETRIES', '5'))
+# Also send x-amz-checksum-sha256 per part so the provider verifies each one on
+# receipt (AWS S3; enable only where the S3-compatible API supports it)
+S3_CHECKSUM_SHA256 = os.environ.get('S3_CHECKSUM_SHA256', 'false').lower() == 'true'
+
+DOWNLOAD_RANGE_SIZE = int(os.environ.get('DOWNLOAD_RANGE_SIZE_MB', '8')) * 1024 * 1024
+DOWNLOAD_CONCURRENCY = int(os.environ.get('DOWNLOAD_CONCURRENCY', '4'))
+DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', '5'))
+DOWNLOAD_TIMEOUT = int(os.environ.get('DOWNLOAD_TIMEOUT', '60'))
+
+USER_AGENT = 'Mozilla/5.0'
+_STREAM_CHUNK = 1024 * 1024  # 1MB reads when streaming to disk
+
+# S3 and B2 both reject non-final parts smaller than 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class IntegrityError(Exception):
+    """Raised when the storage provider's checksum does not match the uploaded bytes."""
+
+
+def _md5_b64(data):
+    return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
+
+
+def _sha256_b64(data):
+    return base64.b64encode(hashlib.sha256(data).digest()).decode('ascii')
+
+
+def _with_retries(fn, retries, label):
+    """Call fn(), retrying with exponential backoff. Re-raises the last error."""
+    for attempt in range(1, retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries:
+                raise
+            delay = min(30, 2 ** attempt)
+            print(f"[TRANSFER] {label} failed (attempt {attempt}/{retries}): {e} - retrying in {delay}s")
+            time.sleep(delay)
+
+
+def _read_part(fileobj, size):
+    """Read exactly `size` bytes unless EOF (handles short reads from sockets/pipes)."""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = fileobj.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def multipart_upload_fileobj(s3_client, bucket, key, fileobj, content_type='application/octet-stream',
+                             part_size=None, concurrency=None, retries=None, progress_callback=None):
+    """
+    Stream a file-like object to S3/B2 using a parallel multipart upload.
+
+    At most `concurrency` parts are in flight, so memory stays bounded at
+    roughly (concurrency + 1) * part_size regardless of the object size.
+    Every part is sent with Content-MD5 (and a SHA-256 checksum when
+    S3_CHECKSUM_SHA256 is set) and retried on its own. The final multipart
+    ETag is checked against the MD5s of the parts sent; on a mismatch the
+    object is deleted and IntegrityError raised.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket: Bucket name
+        key: Object key
+        fileobj: Readable binary file-like object (file, BytesIO, HTTP response)
+        content_type: Content-Type for the object
+        part_size: Bytes per part (default S3_PART_SIZE_MB)
+        concurrency: Parallel part uploads (default S3_UPLOAD_CONCURRENCY)
+        retries: Attempts per part (default S3_PART_RETRIES)
+        progress_callback: Optional callable(bytes_uploaded)
+
+    Returns:
+        dict with 'size', 'parts', 'sha256' and 'etag'
+    """
+    part_size = max(MIN_PART_SIZE, part_size or S3_PART_SIZE)
+    concurrency = max(1, concurrency or S3_UPLOAD_CONCURRENCY)
+    retries = max(1, retries or S3_PART_RETRIES)
+
+    sha256 = hashlib.sha256()
+    first = _read_part(fileobj, part_size)
+    sha256.update(first)
+
+    # Small objects: single PUT
+    if len(first) < part_size:
+        checksum = {'ChecksumSHA256': _sha256_b64(first)} if S3_CHECKSUM_SHA256 else {}
+        resp = _with_retries(lambda: s3_client.put_object(
+            Bucket=bucket, Key=key, Body=first, ContentType=content_type,
+            ContentMD5=_md5_b64(first), **checksum
+        ), retries, f"PUT {key}")
+        if progress_callback:
+            progress_callback(len(first))
+        return {'size': len(first), 'parts': 1, 'sha256': sha256.hexdigest(),
+                'etag': resp.get('ETag', '').strip('"')}
+
+    upload_id = s3_client.create_multipart_upload(
+        Bucket=bucket, Key=key, ContentType=content_type,
+        **({'ChecksumAlgorithm': 'SHA256'} if S3_CHECKSUM_SHA256 else {})
+    )['UploadId']
+
+    uploaded = {'bytes': 0}
+    part_md5s = {}
+
+    def upload_part(part_number, data):
+        md5 = hashlib.md5(data)
+        content_md5 = base64.b64encode(md5.digest()).decode('ascii')
+        checksum = {'ChecksumSHA256': _sha256_b64(data)} if S3_CHECKSUM_SHA256 else {}
+        resp = _with_retries(lambda: s3_client.upload_part(
+            Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
+            Body=data, ContentMD5=content_md5, **checksum
+        ), retries, f"part {part_number} of {key}")
+        part_md5s[part_number] = md5.digest()
+        return {'PartNumber': part_number, 'ETag': resp['ETag'], **checksum}, len(data)
+
+    parts = []
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = set()
+            part_number = 1
+            data = first
+            while data:
+                in_flight.add(pool.submit(upload_part, part_number, data))
+                # Keep memory bounded: wait for a slot before reading the next part
+                while len(in_flight) >= concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        part, size = future.result()
+                        parts.append(part)
+                        uploaded['bytes'] += size
+                        if progress_callback:
+                            progress_callback(uploaded['bytes'])
+                part_number += 1
+                data = _read_part(fileobj, part_size)
+                sha256.update(data)
+            for future in in_flight:
+                part, size = future.result()
+                parts.append(part)
+                uploaded['bytes'] += size
+                if progress_callback:
+                    progress_callback(uploaded['bytes'])
+
+        parts.sort(key=lambda p: p['PartNumber'])
+        resp = _with_retries(lambda: s3_client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+        ), retries, f"complete {key}")
+    except Exception:
+        try:
+            s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except Exception as abort_err:
+            print(f"[S3] Abort multipart upload error for {key}: {abort_err}")
+        raise
+
+    # Multipart ETag is md5(concat(part md5s))-N on S3 and B2
+    etag = resp.get('ETag', '').strip('"')
+    expected = hashlib.md5(b''.join(part_md5s[p['PartNumber']] for p in parts)).hexdigest()
+    if etag and '-' in etag and etag.split('-')[0] != expected:
+        # Don't leave an object whose bytes we can't vouch for
+        try:
+            s3_client.delete_object(Bucket=bucket, Key=key)
+        except Exception as delete_err:
+            print(f"[S3] Delete after ETag mismatch failed for {key}: {delete_err}")
+        raise IntegrityError(f"ETag mismatch for {key}: got {etag}, expected {expected}-{len(parts)}")
+
+    return {'size': uploaded['bytes'], 'parts': len(parts), 'sha256': sha256.hexdigest(), 'etag': etag}
+
+
+def multipart_upload_file(s3_client, bucket, key, file_path, content_type='application/octet-stream', **kwargs):
+    """Upload a file from disk with multipart_upload_fileobj()."""
+    with open(file_path, 'rb') as f:
+        return multipart_upload_fileobj(s3_client, bucket, key, f, content_type, **kwargs)
+
+
+def _http_get(url, byte_range=None, timeout=None):
+    headers = {'User-Agent': USER_AGENT}
+    if byte_range:
+        headers['Range'] = f'bytes={byte_range[0]}-{byte_range[1]}'
+    req = urllib.request.Request(url, headers=headers)
+    return urllib.request.urlopen(req, timeout=timeout or DOWNLOAD_TIMEOUT)
+
+
+def probe_url(url, timeout=None):
+    """
+    Probe a URL with a one-byte range request.
+
+    Returns:
+        dict with 'size' (int or None), 'ranges' (bool: server honours Range)
+        and 'content_type'
+    """
+    with _http_get(url, (0, 0), timeout) as resp:
+        content_type = resp.headers.get('Content-Type', '')
+        if resp.status == 206:
+            match = re.match(r'bytes \d+-\d+/(\d+)', resp.headers.get('Content-Range', ''))
+            size = int(match.group(1)) if match else None
+            return {'size': size, 'ranges': size is not None, 'content_type': content_type}
+        length = resp.headers.get('Content-Length')
+        return {'size': int(length) if length else None, 'ranges': False, 'content_type': content_type}
+
+
+def _stream_to(resp, f, expected=None):
+    written = 0
+    while True:
+        chunk = resp.read(_STREAM_CHUNK)
+        if not chunk:
+            break
+        f.write(chunk)
+        written += len(chunk)
+    if expected is not None and written != expected:
+        raise IOError(f"short read: got {written} of {expected} bytes")
+    return written
+
+
+def download_to_file(url, dest_path, range_size=None, concurrency=None, retries=None,
+                     timeout=None, progress_callback=None):
+    """
+    Stream a URL to disk using parallel HTTP range requests.
+
+    Memory stays at one read buffer per connection. Each range is retried on
+    its own, and completed ranges are checkpointed to `<dest_path>.ranges`
+    so an interrupted download resumes where it stopped - callers that want
+    this must pass the same dest_path on the retry (e.g. keyed by video id).
+    Servers that do not support Range fall back to a single streamed GET.
+
+    Args:
+        url: Source URL
+        dest_path: Local file to write
+        range_size: Bytes per range request (default DOWNLOAD_RANGE_SIZE_MB)
+        concurrency: Parallel connections (default DOWNLOAD_CONCURRENCY)
+        retries: Attempts per range (default DOWNLOAD_RETRIES)
+        timeout: Socket timeout per request in seconds
+        progress_callback: Optional callable(bytes_done, total_bytes)
+
+    Returns:
+        dict with 'size' and 'content_type'
+    """
+    range_size = max(_STREAM_CHUNK, range_size or DOWNLOAD_RANGE_SIZE)
+    concurrency = max(1, concurrency or DOWNLOAD_CONCURRENCY)
+    retries = max(1, retries or DOWNLOAD_RETRIES)
+    state_path = dest_path + '.ranges'
+
+    info = _with_retries(lambda: probe_url(url, timeout), retries, f"probe {url[:80]}")
+    size = info['size']
+
+    if not info['ranges'] or not size:
+        def fetch_all():
+            with _http_get(url, timeout=timeout) as resp, open(dest_path, 'wb') as f:
+                return _stream_to(resp, f, size)
+        size = _with_retries(fetch_all, retries, f"GET {url[:80]}")
+        if progress_callback:
+            progress_callback(size, size)
+        return {'size': size, 'content_type': info['content_type']}
+
+    ranges = [(start, min(start + range_size, size) - 1) for start in range(0, size, range_size)]
+
+    # Resume from checkpoint if it matches this URL and size
+    done = set()
+    if os.path.exists(state_path) and os.path.exists(dest_path):
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+            if state.get('url') == url and state.get('size') == size and state.get('range_size') == range_size:
+                done = set(state.get('done', []))
+        except (OSError, ValueError):
+            done = set()
+
+    def save_state():
+        tmp = state_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'url': url, 'size': size, 'range_size': range_size, 'done': sorted(done)}, f)
+        os.replace(tmp, state_path)
+
+    if not done:
+        with open(dest_path, 'wb') as f:
+            f.truncate(size)
+        # Checkpoint right away so readers of a partial file learn its size
+        save_state()
+
+    def fetch_range(index):
+        start, end = ranges[index]
+
+        def attempt():
+            with _http_get(url, (start, end), timeout) as resp:
+                if resp.status != 206:
+                    raise IOError(f"server ignored Range (HTTP {resp.status})")
+                with open(dest_path, 'r+b') as f:
+                    f.seek(start)
+                    _stream_to(resp, f, end - start + 1)
+        _with_retries(attempt, retries, f"range {start}-{end} of {url[:80]}")
+        return index
+
+    done_bytes = sum(ranges[i][1] - ranges[i][0] + 1 for i in done)
+    pending = [i for i in range(len(ranges)) if i not in done]
+    if done:
+        print(f"[DOWNLOAD] Resuming {url[:80]}: {len(done)}/{len(ranges)} ranges already on disk")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(fetch_range, i) for i in pending]
+        try:
+            # Checkpoint each range as soon as it lands, so a slow range does
+            # not hold back the record of the ones finished after it
+            for future in as_completed(futures):
+                index = future.result()
+                done.add(index)
+                done_bytes += ranges[index][1] - ranges[index][0] + 1
+                save_state()
+                if progress_callback:
+                    progress_callback(done_bytes, size)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    try:
+        os.remove(state_path)
+    except OSError:
+        pass
+    return {'size': size, 'content_type': info['content_type']}